@@ -0,0 +1,32 @@
+import hmac
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+
+from config import settings
+from core.gpt import llm_provider
+
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+def _require_admin(x_admin_token: Optional[str] = Header(default=None)) -> None:
+    """Admin routes need ADMIN_TOKEN configured and sent back as X-Admin-Token."""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(x_admin_token or "", settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@router.get("/llm", dependencies=[Depends(_require_admin)])
+async def llm_routing(limit: int = 50):
+    """Per-endpoint routing stats and the most recent routing decisions."""
+    llm = llm_provider.peek()
+    if llm is None:
+        # Not built yet (or no key): don't build it from an admin request
+        raise HTTPException(status_code=503, detail="LLM client not ready")
+    decisions = list(llm.decisions)
+    return {
+        "router": llm.stats(),
+        "decisions": decisions[-limit:] if limit > 0 else [],
+    }
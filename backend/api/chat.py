@@ -1,68 +1,273 @@
-from fastapi import APIRouter, UploadFile, File, Form
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
+import asyncio
+import hashlib
+import io
+import json
 import uuid
-from typing import Optional
+from typing import AsyncIterator, Literal, Optional
 
 from core.crisis import check_crisis
-from core.gpt import generate_reply
-from core.stt import transcribe_audio
-from core.tts import synthesize_speech
+from core import gpt
+from core.gpt import generate_reply_async, stream_reply
+from core.stt import LiveTranscriber, get_provider, transcribe_audio_async
+from core.tts import SentenceChunker, audio_media_type, synthesize_speech_async, synthesize_speech_bytes_async
+from config import settings
+from service.admission import Rejected, session_turns
+from service.audio_store import get_audio, put_audio
 from service.cache import get_history, append_message, session_exists, maybe_update_summary, get_summary
+from service.metrics import annotate, trace
 
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
+# "base64": audio inlined in the JSON body (default).
+# "url": raw audio served separately from /chat/audio/{id}.
+AudioFormat = Literal["base64", "url"]
+# Audio formats accepted by /chat/ws (see core.stt.LIVE_FORMATS)
+LiveFormat = Literal["webm", "ogg", "pcm"]
+
 
 class ChatRequest(BaseModel):
     user_input: str
     is_first: bool = False
     session_id: Optional[str] = None
+    audio_format: AudioFormat = "base64"
+
+
+def _resolve_session(session_id: Optional[str], is_first: bool) -> tuple[str, bool]:
+    """Reuse a known session, otherwise start a fresh one."""
+    if session_id and session_exists(session_id):
+        annotate(session_id=session_id)
+        return session_id, False
+    session_id = str(uuid.uuid4())
+    annotate(session_id=session_id)
+    return session_id, is_first
+
+
+async def _reply_audio(reply_text: str, audio_format: AudioFormat) -> dict:
+    """Synthesize the reply in the requested response format."""
+    if audio_format == "url":
+        audio = await synthesize_speech_bytes_async(reply_text)
+        audio_url = f"{router.prefix}/audio/{put_audio(audio, audio_media_type(audio))}" if audio else None
+        return {"reply_audio_base64": None, "reply_audio_url": audio_url}
+    audio_base64 = await synthesize_speech_async(reply_text)
+    return {"reply_audio_base64": audio_base64, "reply_audio_media_type": audio_media_type(audio_base64)}
+
+
+async def _buffer_upload(file: UploadFile) -> tuple[UploadFile, str]:
+    """In-memory copy of an upload (it may outlive this request when coalesced) plus its digest."""
+    limit = settings.STT_MAX_UPLOAD_BYTES
+    data = await file.read(limit + 1 if limit else -1)
+    copy = UploadFile(io.BytesIO(data), filename=file.filename, headers=file.headers)
+    return copy, hashlib.sha1(data).hexdigest()
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+TURN_QUEUE_SIZE = 64
+WS_SEND_QUEUE_SIZE = 64
+
+STT_FAILURE_REPLY = "Sorry, I couldn’t understand the audio. Could you try again?"
+
+# Fixed replies that are spoken often enough to be worth prewarming in the TTS cache
+CANNED_REPLIES = (
+    gpt.EMPTY_INPUT_REPLY,
+    gpt.UNCONFIGURED_REPLY,
+    gpt.EMPTY_COMPLETION_REPLY,
+    gpt.CRISIS_FALLBACK_REPLY,
+    gpt.FALLBACK_REPLY,
+    STT_FAILURE_REPLY,
+)
+
+
+async def _turn_events(
+    user_text: str,
+    session_id: str,
+    is_first: bool,
+    crisis_result: dict,
+    with_audio: bool,
+    raw_audio: bool = False,
+) -> AsyncIterator[tuple[str, dict]]:
+    """Events for one streamed turn: meta, token deltas, audio chunks, done.
+
+    With ``with_audio`` every completed sentence is sent to TTS while the
+    LLM is still generating, and ``audio`` events are emitted strictly in
+    sentence order as soon as each one is ready. Audio is base64 in
+    ``audio_base64`` or, with ``raw_audio``, bytes in ``audio``; its
+    ``media_type`` depends on TTS_OUTPUT_CODEC.
+    """
+
+    crisis_flag = crisis_result["crisis"]
+    yield "meta", {
+        "crisis": crisis_flag,
+        "banner": crisis_result["banner"],
+        "session_id": session_id,
+    }
+
+    append_message(session_id, "user", user_text)
+    history = get_history(session_id)
 
+    # Bounded: a slow client pauses generation instead of buffering the reply
+    out: asyncio.Queue = asyncio.Queue(TURN_QUEUE_SIZE)
+    tts_jobs: asyncio.Queue = asyncio.Queue()
+    parts = []
+    failed = False
+    synthesize = synthesize_speech_bytes_async if raw_audio else synthesize_speech_async
+    audio_key = "audio" if raw_audio else "audio_base64"
+
+    def speak(sentence: str) -> None:
+        tts_jobs.put_nowait((sentence, asyncio.create_task(synthesize(sentence))))
+
+    async def generate() -> None:
+        nonlocal failed
+        chunker = SentenceChunker()
+        try:
+            async for delta in stream_reply(
+                user_text,
+                crisis=crisis_flag,
+                is_first=is_first,
+                history=history,
+                summary=get_summary(session_id),
+            ):
+                parts.append(delta)
+                await out.put(("token", {"text": delta}))
+                if with_audio:
+                    for sentence in chunker.feed(delta):
+                        speak(sentence)
+            if with_audio:
+                tail = chunker.flush()
+                if tail:
+                    speak(tail)
+        except Exception as e:
+            print(f"[STREAM] {session_id}: reply failed: {type(e).__name__} - {e}")
+            failed = True
+        finally:
+            tts_jobs.put_nowait(None)
+
+    async def deliver_audio() -> None:
+        index = 0
+        try:
+            while (job := await tts_jobs.get()) is not None:
+                sentence, task = job
+                try:
+                    audio = await task
+                except Exception as e:
+                    # Same as a clip TTS could not produce: the text still goes out
+                    print(f"[TTS] Sentence failed: {type(e).__name__} - {e}")
+                    audio = None
+                await out.put((
+                    "audio",
+                    {"index": index, "text": sentence, audio_key: audio, "media_type": audio_media_type(audio)},
+                ))
+                index += 1
+        except Exception as e:
+            print(f"[STREAM] {session_id}: audio failed: {type(e).__name__} - {e}")
+        # Always end the stream, or the consumer waits forever
+        await out.put(None)
+
+    workers = [asyncio.create_task(generate()), asyncio.create_task(deliver_audio())]
+    try:
+        while (event := await out.get()) is not None:
+            yield event
+    finally:
+        for task in workers:
+            task.cancel()
+        while not tts_jobs.empty():
+            job = tts_jobs.get_nowait()
+            if job is not None:
+                job[1].cancel()
+
+    reply_text = "".join(parts).strip()
+    if failed or not reply_text:
+        # Abandoned turn: keep a partial or empty reply out of the history
+        yield "done", {"reply_text": reply_text or gpt.FALLBACK_REPLY}
+        return
+    append_message(session_id, "assistant", reply_text)
+    maybe_update_summary(session_id)
+
+    yield "done", {"reply_text": reply_text}
+
+
+async def _sse_stream(events: AsyncIterator[tuple[str, dict]]) -> AsyncIterator[str]:
+    """SSE encoding of a turn's events (see _turn_events)."""
+    async for event, data in events:
+        yield _sse(event, data)
 
 
 @router.post("/text")
 async def chat_text(payload: ChatRequest):
     """Handles text input from user"""
 
-
-    if payload.session_id and session_exists(payload.session_id):
-        is_first = False
-        session_id = payload.session_id
-    else:
-        is_first = payload.is_first
-        session_id = str(uuid.uuid4())
+    session_id, is_first = _resolve_session(payload.session_id, payload.is_first)
 
     crisis_result = check_crisis(payload.user_input)
     crisis_flag = crisis_result["crisis"]
 
-    append_message(session_id, "user", payload.user_input)
+    async def answer() -> dict:
+        append_message(session_id, "user", payload.user_input)
+        history = get_history(session_id)
 
-    history = get_history(session_id)
-    summary = get_summary(session_id)
-    if summary:
-        augmented_history = [{"role": "system", "content": summary}] + history
-    else:
-        augmented_history = history
-
-    reply_text = generate_reply(
-        payload.user_input,
-        crisis=crisis_flag,
-        is_first=is_first,
-        history=augmented_history,
+        reply_text = await generate_reply_async(
+            payload.user_input,
+            crisis=crisis_flag,
+            is_first=is_first,
+            history=history,
+            summary=get_summary(session_id),
+        )
+
+        append_message(session_id, "assistant", reply_text)
+        maybe_update_summary(session_id)
+
+        reply_audio = await _reply_audio(reply_text, payload.audio_format)
+
+        return {
+            "reply_text": reply_text,
+            **reply_audio,
+            "crisis": crisis_flag,
+            "banner": crisis_result["banner"],
+            "session_id": session_id,
+        }
+
+    key = ("text", payload.audio_format, payload.user_input)
+    return await session_turns.run(session_id, key, answer, priority=crisis_flag)
+
+
+@router.post("/text/stream")
+async def chat_text_stream(payload: ChatRequest, audio: bool = False):
+    """Streams the reply to text input as server-sent events.
+
+    Events, in order: ``meta`` (session id, crisis flag and banner),
+    one ``token`` per text delta, then ``done`` with the full reply.
+    With ``?audio=true`` sentence-level ``audio`` events are interleaved.
+    """
+
+    session_id, is_first = _resolve_session(payload.session_id, payload.is_first)
+    crisis_result = check_crisis(payload.user_input)
+
+    events = await session_turns.stream(
+        session_id,
+        ("text/stream", audio, payload.user_input),
+        lambda: _turn_events(payload.user_input, session_id, is_first, crisis_result, audio),
+        priority=crisis_result["crisis"],
     )
+    return StreamingResponse(_sse_stream(events), media_type="text/event-stream", headers=SSE_HEADERS)
 
-    append_message(session_id, "assistant", reply_text)
-    maybe_update_summary(session_id)
 
-    reply_audio_base64 = synthesize_speech(reply_text)
+@router.get("/audio/{audio_id}")
+async def chat_audio(audio_id: str):
+    """Serves a synthesized reply clip as raw bytes (see ``audio_format="url"``)."""
 
-    return {
-        "reply_text": reply_text,
-        "reply_audio_base64": reply_audio_base64,
-        "crisis": crisis_flag,
-        "banner": crisis_result["banner"],
-        "session_id": session_id,
-    }
+    clip = get_audio(audio_id)
+    if clip is None:
+        raise HTTPException(status_code=404, detail="Audio not found or expired")
+    data, media_type = clip
+    return Response(content=data, media_type=media_type, headers={"Cache-Control": "private, max-age=300"})
 
 
 @router.post("/voice")
@@ -70,55 +275,278 @@ async def chat_voice(
     file: UploadFile = File(...),
     is_first: bool = Form(False),
     session_id: Optional[str] = Form(None),
+    audio_format: AudioFormat = Form("base64"),
 ):
     """Handles voice input"""
 
-    if session_id and session_exists(session_id):
-        is_first = False
-    else:
-        is_first = is_first
-        session_id = str(uuid.uuid4())
+    session_id, is_first = _resolve_session(session_id, is_first)
+    upload, digest = await _buffer_upload(file)
 
-    user_text = transcribe_audio(file)
+    async def answer() -> dict:
+        user_text = await transcribe_audio_async(upload)
+
+        if not user_text:
+            return {
+                "reply_text": STT_FAILURE_REPLY,
+                "reply_audio_base64": None,
+                # Same keys as a spoken reply in this format
+                **({"reply_audio_url": None} if audio_format == "url" else {}),
+                "crisis": False,
+                "banner": None,
+                "session_id": session_id,
+            }
+
+        crisis_result = check_crisis(user_text)
+        crisis_flag = crisis_result["crisis"]
+
+        append_message(session_id, "user", user_text)
+        history = get_history(session_id)
+
+        reply_text = await generate_reply_async(
+            user_text,
+            crisis=crisis_flag,
+            is_first=is_first,
+            history=history,
+            summary=get_summary(session_id),
+        )
+
+        append_message(session_id, "assistant", reply_text)
+        maybe_update_summary(session_id)
+
+        reply_audio = await _reply_audio(reply_text, audio_format)
 
-    if not user_text:
         return {
-            "reply_text": "Sorry, I couldn’t understand the audio. Could you try again?",
-            "reply_audio_base64": None,
-            "crisis": False,
-            "banner": None,
+            "reply_text": reply_text,
+            **reply_audio,
+            "crisis": crisis_flag,
+            "banner": crisis_result["banner"],
             "session_id": session_id,
         }
 
+    return await session_turns.run(session_id, ("voice", audio_format, digest), answer)
+
+
+@router.post("/voice/stream")
+async def chat_voice_stream(
+    file: UploadFile = File(...),
+    is_first: bool = Form(False),
+    session_id: Optional[str] = Form(None),
+):
+    """Voice input with a pipelined reply: same events as /text/stream?audio=true."""
+
+    session_id, is_first = _resolve_session(session_id, is_first)
+    upload, digest = await _buffer_upload(file)
+
+    async def voice_events() -> AsyncIterator[tuple[str, dict]]:
+        user_text = await transcribe_audio_async(upload)
+
+        if not user_text:
+            yield "meta", {"crisis": False, "banner": None, "session_id": session_id}
+            yield "done", {"reply_text": STT_FAILURE_REPLY}
+            return
+
+        crisis_result = check_crisis(user_text)
+        async for event in _turn_events(user_text, session_id, is_first, crisis_result, True):
+            yield event
+
+    events = await session_turns.stream(session_id, ("voice/stream", digest), voice_events)
+    return StreamingResponse(_sse_stream(events), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+def _control_type(text: str) -> Optional[str]:
+    try:
+        return json.loads(text).get("type")
+    except (ValueError, AttributeError):
+        return None
+
+
+def _over_limit(received: int) -> bool:
+    limit = settings.STT_MAX_UPLOAD_BYTES
+    return bool(limit) and received > limit
+
+
+async def _reject_oversized(websocket: WebSocket, sender: Optional[asyncio.Task] = None) -> None:
+    """Report an utterance over STT_MAX_UPLOAD_BYTES and close with 1009 (message too big)."""
+    if sender:
+        # Stop the writer first so the error can't land between an audio header and its clip
+        sender.cancel()
+        await asyncio.gather(sender, return_exceptions=True)
+    detail = f"utterance exceeds {settings.STT_MAX_UPLOAD_BYTES} bytes"
+    await websocket.send_json({"type": "error", "detail": detail})
+    await websocket.close(code=1009)
+
+
+@router.websocket("/stt")
+async def chat_stt(websocket: WebSocket):
+    """Streaming transcription over a WebSocket.
+
+    The client sends binary frames of mono 16kHz s16le PCM while the user
+    speaks and a text frame ``{"type": "end"}`` when they stop. The server
+    answers with ``{"type": "partial", "text"}`` whenever the transcript
+    changes and one ``{"type": "final", "text"}`` per utterance; the
+    connection can then carry the next utterance. An utterance over
+    STT_MAX_UPLOAD_BYTES gets ``{"type": "error"}`` and the socket is closed.
+    """
+
+    await websocket.accept()
+    stream = get_provider().stream()
+    received = 0
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes"):
+                received += len(message["bytes"])
+                if _over_limit(received):
+                    await _reject_oversized(websocket)
+                    return
+                partial = await stream.feed_async(message["bytes"])
+                if partial is not None:
+                    await websocket.send_json({"type": "partial", "text": partial})
+            elif message.get("text") and _control_type(message["text"]) == "end":
+                text = await stream.finish_async()
+                await websocket.send_json({"type": "final", "text": text})
+                stream = get_provider().stream()
+                received = 0
+    except WebSocketDisconnect:
+        pass
+
+
+async def _ws_sender(websocket: WebSocket, outbox: asyncio.Queue) -> None:
+    """Single writer for the socket: JSON dicts as text frames, bytes as binary frames."""
+    while True:
+        item = await outbox.get()
+        if isinstance(item, bytes):
+            await websocket.send_bytes(item)
+        else:
+            await websocket.send_json(item)
+
+
+async def _voice_turn(
+    user_text: Optional[str],
+    session_id: str,
+    is_first: bool,
+    outbox: asyncio.Queue,
+) -> None:
+    await outbox.put({"type": "final", "text": user_text})
+    if not user_text:
+        await outbox.put({"type": "done", "reply_text": STT_FAILURE_REPLY})
+        return
+
     crisis_result = check_crisis(user_text)
-    crisis_flag = crisis_result["crisis"]
+    try:
+        events = await session_turns.stream(
+            session_id,
+            None,
+            lambda: _turn_events(user_text, session_id, is_first, crisis_result, True, raw_audio=True),
+            priority=crisis_result["crisis"],
+        )
+    except Rejected as e:
+        await outbox.put({"type": "busy", "detail": e.detail, "retry_after": e.retry_after})
+        return
+    async for event, data in events:
+        if event == "audio":
+            audio = data.pop("audio") or b""
+            await outbox.put({"type": "audio", **data, "bytes": len(audio)})
+            if audio:
+                await outbox.put(audio)
+        else:
+            await outbox.put({"type": event, **data})
 
-    append_message(session_id, "user", user_text)
 
-    history = get_history(session_id)
-    summary = get_summary(session_id)
-    if summary:
-        augmented_history = [{"role": "system", "content": summary}] + history
-    else:
-        augmented_history = history
-
-    reply_text = generate_reply(
-        user_text,
-        crisis=crisis_flag,
-        is_first=is_first,
-        history=augmented_history,
-    )
+@router.websocket("/ws")
+async def chat_ws(
+    websocket: WebSocket,
+    session_id: Optional[str] = None,
+    is_first: bool = False,
+    input_format: LiveFormat = "webm",
+):
+    """Persistent voice session: one connection for the whole conversation.
 
-    append_message(session_id, "assistant", reply_text)
-    maybe_update_summary(session_id)
+    Client -> server: binary frames of audio while the user speaks
+    (MediaRecorder WebM/Opus chunks by default, or ``input_format=pcm``)
+    and a text frame ``{"type": "end"}`` when they stop.
 
-    reply_audio_base64 = synthesize_speech(reply_text)
+    Server -> client (text frames unless noted): ``session`` once, then per
+    utterance ``partial`` transcripts, ``final``, ``meta``, ``token``
+    deltas, ``audio`` headers each followed by one binary frame with the
+    clip, and ``done``. The next utterance can start streaming while the
+    previous reply is still playing out; turns are answered in order. A
+    turn refused by admission control gets ``busy`` (with ``retry_after``)
+    instead of a reply. An utterance over STT_MAX_UPLOAD_BYTES gets
+    ``error`` and the socket is closed.
 
+    Backpressure: audio is only read from the socket as fast as decoding
+    and STT keep up, and replies are generated only as fast as the client
+    reads them. Partial transcripts are dropped rather than queued when the
+    client falls behind, since each one supersedes the last.
+    """
 
-    return {
-        "reply_text": reply_text,
-        "reply_audio_base64": reply_audio_base64,
-        "crisis": crisis_flag,
-        "banner": crisis_result["banner"],
-        "session_id": session_id,
-    }
\ No newline at end of file
+    await websocket.accept()
+    session_id, is_first = _resolve_session(session_id, is_first)
+
+    outbox: asyncio.Queue = asyncio.Queue(WS_SEND_QUEUE_SIZE)
+    sender = asyncio.create_task(_ws_sender(websocket, outbox))
+    await outbox.put({"type": "session", "session_id": session_id})
+
+    def offer_partial(text: str) -> None:
+        try:
+            outbox.put_nowait({"type": "partial", "text": text})
+        except asyncio.QueueFull:
+            pass
+
+    utterance: Optional[LiveTranscriber] = None
+    broken = False  # decoding failed; drop audio until the client ends the utterance
+    received = 0  # bytes in the current utterance
+    turn: Optional[asyncio.Task] = None
+
+    async def answer(pending: Optional[asyncio.Task], transcriber: Optional[LiveTranscriber], first: bool) -> None:
+        with trace("/chat/ws"):
+            annotate(session_id=session_id)
+            try:
+                user_text = await transcriber.finish() if transcriber else None
+            except Exception as e:
+                print(f"[STT] Live transcription failed: {type(e).__name__} - {e}")
+                user_text = None
+            if pending:
+                try:
+                    await pending
+                except Exception as e:
+                    # A failed turn must not take every later turn (and the socket) down with it
+                    print(f"[WS] Previous turn failed: {type(e).__name__} - {e}")
+            await _voice_turn(user_text, session_id, first, outbox)
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes"):
+                received += len(message["bytes"])
+                if _over_limit(received):
+                    await _reject_oversized(websocket, sender)
+                    break
+                if broken:
+                    continue
+                try:
+                    if utterance is None:
+                        utterance = await LiveTranscriber(input_format, offer_partial).start()
+                    await utterance.write(message["bytes"])
+                except Exception as e:
+                    print(f"[STT] Live decode failed: {type(e).__name__} - {e}")
+                    if utterance:
+                        await utterance.close()
+                    utterance, broken = None, True
+            elif message.get("text") and _control_type(message["text"]) == "end":
+                turn = asyncio.create_task(answer(turn, utterance, is_first))
+                utterance, broken, received = None, False, 0
+                is_first = False
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if utterance:
+            await utterance.close()
+        if turn:
+            turn.cancel()
+        sender.cancel()
@@ -0,0 +1,173 @@
+"""Admission control under overload, and double-submit coalescing.
+
+The LLM is a local OpenAI-compatible server that can only prefill
+``--capacity`` requests at a time (``--first-token-ms`` each); TTS is the
+stub Sarvam client.
+
+1. Overload: ``--users`` clients each send one /chat/text turn at once, far
+   more than the upstream can serve within a few seconds. With admission
+   off every turn queues on the stage semaphores and latency grows with
+   the size of the spike; with it on at most ``--max-active`` turns run,
+   ``--max-queue`` wait up to ``--queue-timeout`` seconds and the rest get
+   an immediate 503 with Retry-After.
+2. Double submit: ``--sessions`` sessions each fire ``--duplicates``
+   identical requests plus one different request at the same moment. The
+   duplicates share one LLM+TTS round, the different one is queued behind
+   it on the session (or refused with 429 past SESSION_MAX_PENDING), and
+   history never interleaves.
+
+    cd backend && python -m benchmarks.bench_admission
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from benchmarks import stubs
+
+LLM_PORT = 9117
+APP_PORT = 9118
+os.environ["HF_BASE_URL"] = f"http://127.0.0.1:{LLM_PORT}/v1"
+os.environ["TTS_CACHE_MAX_BYTES"] = "0"
+
+import httpx
+
+from benchmarks.fake_openai import make_app
+from service import cache
+from service.admission import admission, session_turns
+from main import app
+
+
+def _percentile(samples: list, q: float):
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1) if ordered else None
+
+
+async def _post(client: httpx.AsyncClient, body: dict) -> dict:
+    start = time.perf_counter()
+    try:
+        resp = await client.post("/chat/text", json=body)
+    except httpx.HTTPError as e:
+        return {"status": type(e).__name__, "ms": (time.perf_counter() - start) * 1000, "retry_after": None, "body": {}}
+    return {
+        "status": resp.status_code,
+        "ms": (time.perf_counter() - start) * 1000,
+        "retry_after": resp.headers.get("retry-after"),
+        "body": resp.json(),
+    }
+
+
+async def _overload(users: int) -> list:
+    limits = httpx.Limits(max_connections=users + 8)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{APP_PORT}", timeout=300, limits=limits) as client:
+        return await asyncio.gather(*(_post(client, {"user_input": f"I feel low today ({i})"}) for i in range(users)))
+
+
+async def _double_submit(sessions: int, duplicates: int) -> list:
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{APP_PORT}", timeout=300) as client:
+        ids = [(await _post(client, {"user_input": "hi"}))["body"]["session_id"] for _ in range(sessions)]
+
+        async def burst(session_id: str) -> dict:
+            same = {"user_input": "I can't sleep at night.", "session_id": session_id}
+            other = {"user_input": "Also my exams start next week.", "session_id": session_id}
+            first = asyncio.create_task(_post(client, same))
+            await asyncio.sleep(0.01)  # the original submit arrives first, the repeats just after
+            rest = await asyncio.gather(*[_post(client, same) for _ in range(duplicates - 1)], _post(client, other))
+            return {"session_id": session_id, "results": [await first, *rest]}
+
+        return await asyncio.gather(*(burst(s) for s in ids))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--capacity", type=int, default=4, help="concurrent prefills the fake LLM accepts")
+    parser.add_argument("--first-token-ms", type=float, default=500)
+    parser.add_argument("--tts-ms", type=float, default=100)
+    parser.add_argument("--max-active", type=int, default=32)
+    parser.add_argument("--max-queue", type=int, default=64)
+    parser.add_argument("--queue-timeout", type=float, default=3.0)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--duplicates", type=int, default=3)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    stubs.install(tts=stubs.Latency(args.tts_ms / 1000))
+    llm_app = make_app(stubs.Latency(args.first_token_ms / 1000), stubs.Latency(0.005), capacity=args.capacity)
+    stubs.serve_in_thread(llm_app, LLM_PORT)
+    stubs.serve_in_thread(app, APP_PORT)
+
+    results = {}
+    print(f"overload: {args.users} simultaneous turns, upstream capacity {args.capacity} x {args.first_token_ms:.0f}ms")
+    print(f"{'admission':>10s} {'ok':>5s} {'p50 ms':>8s} {'p99 ms':>8s} {'max ms':>8s} {'503':>5s} "
+          f"{'503 p50 ms':>11s} {'503 p99 ms':>11s} {'queue full':>11s} {'timed out':>10s} {'upstream':>9s}")
+    for mode in ("off", "on"):
+        admission.max_active = args.max_active if mode == "on" else 0
+        admission.max_queue = args.max_queue
+        admission.queue_timeout = args.queue_timeout
+        before = llm_app.state.requests
+        full, timed_out = admission.rejected, admission.timed_out
+        samples = asyncio.run(_overload(args.users))
+        ok = [s["ms"] for s in samples if s["status"] == 200]
+        refused = [s for s in samples if s["status"] == 503]
+        row = results[f"overload_{mode}"] = {
+            "ok": len(ok),
+            "p50_ms": _percentile(ok, 0.5),
+            "p99_ms": _percentile(ok, 0.99),
+            "max_ms": round(max(ok), 1) if ok else None,
+            "rejected_503": len(refused),
+            "rejected_p50_ms": _percentile([s["ms"] for s in refused], 0.5),
+            "rejected_p99_ms": _percentile([s["ms"] for s in refused], 0.99),
+            "rejected_queue_full": admission.rejected - full,
+            "rejected_timed_out": admission.timed_out - timed_out,
+            "retry_after_s": sorted({int(s["retry_after"]) for s in refused if s["retry_after"]}),
+            "other_errors": sum(1 for s in samples if s["status"] not in (200, 503)),
+            "upstream_requests": llm_app.state.requests - before,
+        }
+        print(f"{mode:>10s} {row['ok']:5d} {row['p50_ms'] or 0:8.1f} {row['p99_ms'] or 0:8.1f} "
+              f"{row['max_ms'] or 0:8.1f} {row['rejected_503']:5d} {row['rejected_p50_ms'] or 0:11.1f} "
+              f"{row['rejected_p99_ms'] or 0:11.1f} {row['rejected_queue_full']:11d} {row['rejected_timed_out']:10d} "
+              f"{row['upstream_requests']:9d}")
+    results["admission"] = admission.stats()
+
+    admission.max_active = args.max_active
+    before = llm_app.state.requests
+    coalesced_before = session_turns.coalesced
+    bursts = asyncio.run(_double_submit(args.sessions, args.duplicates))
+    statuses = [r["status"] for b in bursts for r in b["results"]]
+    shared = sum(
+        1 for b in bursts
+        if len({r["body"].get("reply_text") for r in b["results"][:args.duplicates] if r["status"] == 200}) == 1
+    )
+    # Each session: greeting pair + one pair per distinct message that got through
+    expected = [2 + 2 * (1 + (b["results"][-1]["status"] == 200)) for b in bursts]
+    actual = [len(cache.get_history(b["session_id"])) for b in bursts]
+    interleaved = sum(
+        1 for b in bursts
+        if [m["role"] for m in cache.get_history(b["session_id"])] != ["user", "assistant"] * (len(cache.get_history(b["session_id"])) // 2)
+    )
+    row = results["double_submit"] = {
+        "requests": len(statuses),
+        "ok": statuses.count(200),
+        "rejected_429": statuses.count(429),
+        "coalesced": session_turns.coalesced - coalesced_before,
+        "upstream_requests": llm_app.state.requests - before,
+        "sessions_with_shared_reply": shared,
+        "history_as_expected": sum(1 for e, a in zip(expected, actual) if e == a),
+        "interleaved_histories": interleaved,
+    }
+    print(f"\ndouble submit: {args.sessions} sessions x ({args.duplicates} identical + 1 different)")
+    print(f"  {row['requests']} requests -> {row['upstream_requests']} LLM calls, {row['coalesced']} coalesced, "
+          f"{row['rejected_429']} x 429")
+    print(f"  duplicates got one shared reply in {shared}/{args.sessions} sessions; history as expected in "
+          f"{row['history_as_expected']}/{args.sessions}, interleaved in {interleaved}")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
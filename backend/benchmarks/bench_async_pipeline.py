@@ -0,0 +1,120 @@
+"""Concurrent throughput of /chat/text and /chat/voice with stub providers.
+
+Compares the async pipeline against the old behaviour (blocking provider
+calls made directly on the event loop). With blocking calls throughput stays
+flat as concurrency grows; with the async pipeline it scales until the
+per-stage limits are reached.
+
+    cd backend && python -m benchmarks.bench_async_pipeline
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import time
+
+from benchmarks import stubs
+
+import httpx
+
+import api.chat
+import core.gpt
+import core.stt
+import core.tts
+from main import app
+
+
+def _use_blocking_calls() -> None:
+    """Re-create the pre-async handlers: provider calls run on the event loop."""
+
+    async def reply(*args, **kwargs):
+        return core.gpt.generate_reply(*args, **kwargs)
+
+    async def speech(text):
+        return core.tts.synthesize_speech(text)
+
+    async def transcribe(file):
+        return core.stt.transcribe_audio(file)
+
+    api.chat.generate_reply_async = reply
+    api.chat.synthesize_speech_async = speech
+    api.chat.transcribe_audio_async = transcribe
+
+
+async def _one_turn(client: httpx.AsyncClient, route: str) -> None:
+    if route == "text":
+        resp = await client.post("/chat/text", json={"user_input": "I feel tired all the time."})
+    else:
+        files = {"file": ("audio.webm", io.BytesIO(b"\x00" * 16000), "audio/webm")}
+        resp = await client.post("/chat/voice", files=files)
+    resp.raise_for_status()
+
+
+async def _run_level(route: str, concurrency: int, requests: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        queue: asyncio.Queue = asyncio.Queue()
+        for _ in range(requests):
+            queue.put_nowait(None)
+
+        async def worker():
+            while not queue.empty():
+                queue.get_nowait()
+                await _one_turn(client, route)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "route": route,
+        "concurrency": concurrency,
+        "requests": requests,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 2),
+    }
+
+
+async def _main(args) -> list:
+    results = []
+    for route in args.routes:
+        for level in args.levels:
+            result = await _run_level(route, level, max(level * args.rounds, level))
+            result["mode"] = args.mode
+            results.append(result)
+            print(
+                f"{args.mode:8s} /chat/{route:5s} c={level:<3d} "
+                f"{result['throughput_rps']:8.2f} req/s  ({result['seconds']}s)"
+            )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=["async", "blocking"], default="async")
+    parser.add_argument("--routes", nargs="+", default=["text", "voice"])
+    parser.add_argument("--levels", nargs="+", type=int, default=[1, 4, 16, 32])
+    parser.add_argument("--rounds", type=int, default=4, help="requests per worker")
+    parser.add_argument("--llm-ms", type=float, default=300)
+    parser.add_argument("--tts-ms", type=float, default=150)
+    parser.add_argument("--stt-ms", type=float, default=200)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    stubs.install(
+        llm=stubs.Latency(args.llm_ms / 1000),
+        tts=stubs.Latency(args.tts_ms / 1000),
+        stt=stubs.Latency(args.stt_ms / 1000),
+    )
+    if args.mode == "blocking":
+        _use_blocking_calls()
+
+    results = asyncio.run(_main(args))
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""TTS output codec: WAV vs WebM/Opus bytes, encode time, and turn latency on a slow link.
+
+1. Encode: speech-like clips (harmonic "voice" with syllable envelope and
+   noise, 22.05kHz mono, ``--seconds`` long) are encoded at each bitrate in
+   ``--bitrates``; reported are bytes vs the WAV and encode time.
+2. End to end: /chat/text turns (base64 audio in JSON, as the frontend
+   uses it) over a simulated link of ``--link-kbps`` with ``--rtt-ms``
+   round trip, once with TTS_OUTPUT_CODEC=wav and once with opus. The
+   stub TTS returns a speech-like WAV as long as the reply would be
+   spoken.
+
+Needs ffmpeg with libopus on PATH (pydub's ``AudioSegment.converter``).
+
+    cd backend && python -m benchmarks.bench_audio_codec --link-kbps 400
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import statistics
+import time
+import wave
+
+import numpy as np
+
+from benchmarks import stubs
+
+APP_PORT = 9121
+os.environ["TTS_CACHE_MAX_BYTES"] = "0"
+
+import httpx
+
+import core.tts
+from config import settings
+from core.tts import encode_opus
+from main import app
+
+SAMPLE_RATE = 22050
+CHARS_PER_SECOND = 14  # speaking rate of the stub voice
+
+
+def speech_wav(seconds: float, seed: int = 0) -> bytes:
+    """A WAV that encodes roughly like speech (not silence or a pure tone)."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    f0 = 150 + 35 * np.sin(2 * np.pi * 0.6 * t + seed)
+    phase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 14))
+    syllables = (np.sin(2 * np.pi * 3.1 * t) > -0.4) * (0.4 + 0.6 * np.sin(2 * np.pi * 4.7 * t) ** 2)
+    signal = voiced * syllables + 0.03 * rng.standard_normal(len(t))
+    pcm = (signal / np.abs(signal).max() * 0.6 * 32767).astype("<i2")
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+
+async def _throttled_turn(client: httpx.AsyncClient, link_bps: float, rtt: float) -> dict:
+    """One turn, with the response body arriving no faster than the link allows."""
+    start = time.perf_counter()
+    await asyncio.sleep(rtt)  # request out + first response byte back
+    body = bytearray()
+    async with client.stream("POST", "/chat/text", json={"user_input": "I feel tired all the time."}) as resp:
+        server_done = time.perf_counter()
+        async for chunk in resp.aiter_bytes(4096):
+            body += chunk
+            ahead = len(body) * 8 / link_bps - (time.perf_counter() - server_done)
+            if ahead > 0:
+                await asyncio.sleep(ahead)
+    reply = json.loads(body)
+    return {
+        "ms": (time.perf_counter() - start) * 1000,
+        "server_ms": (server_done - start - rtt) * 1000,
+        "body_bytes": len(body),
+        "audio_bytes": len(base64.b64decode(reply["reply_audio_base64"] or "")),
+        "media_type": reply.get("reply_audio_media_type"),
+    }
+
+
+async def _turns(codec: str, turns: int, link_bps: float, rtt: float) -> list:
+    settings.TTS_OUTPUT_CODEC = codec
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{APP_PORT}", timeout=300) as client:
+        return [await _throttled_turn(client, link_bps, rtt) for _ in range(turns)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, nargs="+", default=[2, 5, 10])
+    parser.add_argument("--bitrates", type=float, nargs="+", default=[16, 24, 32])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--link-kbps", type=float, default=400)
+    parser.add_argument("--rtt-ms", type=float, default=150)
+    parser.add_argument("--tts-ms", type=float, default=300)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    if core.tts._opus_encoder() is None:
+        raise SystemExit("needs ffmpeg with libopus on PATH")
+
+    results = {"encode": [], "turns": {}}
+    print(f"{'clip s':>6s} {'kbps':>5s} {'wav KB':>8s} {'opus KB':>8s} {'saved':>7s} {'encode ms':>10s}")
+    for seconds in args.seconds:
+        wav = speech_wav(seconds)
+        for kbps in args.bitrates:
+            times, opus = [], None
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                opus = encode_opus(wav, kbps)
+                times.append((time.perf_counter() - start) * 1000)
+            row = {
+                "seconds": seconds,
+                "bitrate_kbps": kbps,
+                "wav_bytes": len(wav),
+                "opus_bytes": len(opus),
+                "saved": round(1 - len(opus) / len(wav), 4),
+                "encode_ms": round(statistics.median(times), 1),
+            }
+            results["encode"].append(row)
+            print(f"{seconds:6g} {kbps:5g} {len(wav) / 1024:8.1f} {len(opus) / 1024:8.1f} {row['saved']:7.1%} "
+                  f"{row['encode_ms']:10.1f}")
+
+    stubs.install(llm=stubs.Latency(0.2), tts=stubs.Latency(args.tts_ms / 1000))
+    text_to_speech = core.tts.tts_provider.get().text_to_speech
+    convert = text_to_speech.convert
+    clips = {}
+
+    def speaking_convert(**kwargs):
+        text = kwargs["text"]
+        response = convert(**kwargs)
+        if text not in clips:
+            clips[text] = base64.b64encode(speech_wav(len(text) / CHARS_PER_SECOND)).decode()
+        response.audios = [clips[text]]
+        return response
+
+    text_to_speech.convert = speaking_convert
+    stubs.serve_in_thread(app, APP_PORT)
+
+    print(f"\n/chat/text over {args.link_kbps:g} kbps, {args.rtt_ms:g}ms RTT, "
+          f"Opus at {settings.TTS_OPUS_BITRATE_KBPS:g} kbps, median of {args.turns}")
+    print(f"{'codec':>6s} {'turn ms':>9s} {'server ms':>10s} {'body KB':>8s} {'audio KB':>9s}  media type")
+    for codec in ("wav", "opus"):
+        samples = asyncio.run(_turns(codec, args.turns, args.link_kbps * 1000, args.rtt_ms / 1000))
+        row = results["turns"][codec] = {
+            "turn_ms": round(statistics.median(s["ms"] for s in samples), 1),
+            "server_ms": round(statistics.median(s["server_ms"] for s in samples), 1),
+            "body_bytes": samples[-1]["body_bytes"],
+            "audio_bytes": samples[-1]["audio_bytes"],
+            "media_type": samples[-1]["media_type"],
+        }
+        print(f"{codec:>6s} {row['turn_ms']:9.1f} {row['server_ms']:10.1f} {row['body_bytes'] / 1024:8.1f} "
+              f"{row['audio_bytes'] / 1024:9.1f}  {row['media_type']}")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
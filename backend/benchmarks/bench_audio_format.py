@@ -0,0 +1,93 @@
+"""Bytes on the wire and peak memory per response: base64-in-JSON vs /chat/audio.
+
+Peak memory is measured with tracemalloc around each request (server and
+in-process client share the interpreter, so the client's copy of the body
+is included for both formats).
+
+    cd backend && python -m benchmarks.bench_audio_format --seconds 6
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import tracemalloc
+
+from benchmarks import stubs
+
+import httpx
+
+from main import app
+
+BODY = {"user_input": "I feel tired all the time."}
+
+
+def _wire_bytes(resp: httpx.Response) -> int:
+    header_bytes = sum(len(k) + len(v) + 4 for k, v in resp.headers.raw)
+    return header_bytes + len(resp.content)
+
+
+async def _base64_turn(client: httpx.AsyncClient) -> int:
+    resp = await client.post("/chat/text", json={**BODY, "audio_format": "base64"})
+    resp.raise_for_status()
+    return _wire_bytes(resp)
+
+
+async def _url_turn(client: httpx.AsyncClient) -> int:
+    resp = await client.post("/chat/text", json={**BODY, "audio_format": "url"})
+    resp.raise_for_status()
+    audio = await client.get(resp.json()["reply_audio_url"])
+    audio.raise_for_status()
+    return _wire_bytes(resp) + _wire_bytes(audio)
+
+
+async def _measure(turn, runs: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await turn(client)
+        wire, peaks = [], []
+        for _ in range(runs):
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+            wire.append(await turn(client))
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - base)
+    return {
+        "wire_bytes": max(wire),
+        "peak_alloc_kib": round(max(peaks) / 1024, 1),
+    }
+
+
+async def _main(args) -> dict:
+    tracemalloc.start()
+    results = {
+        "base64": await _measure(_base64_turn, args.runs),
+        "url": await _measure(_url_turn, args.runs),
+    }
+    tracemalloc.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=6.0, help="clip length at 22.05kHz 16-bit mono")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    clip = b"RIFF" + bytes(int(22050 * 2 * args.seconds))
+    stubs.STUB_AUDIO = base64.b64encode(clip).decode()
+    stubs.install(llm=stubs.Latency(0.0), tts=stubs.Latency(0.0))
+
+    results = asyncio.run(_main(args))
+    print(f"raw clip: {len(clip)} bytes")
+    for name, r in results.items():
+        print(f"{name:7s} wire {r['wire_bytes']:9d} bytes  peak alloc {r['peak_alloc_kib']:9.1f} KiB")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
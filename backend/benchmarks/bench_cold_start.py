@@ -0,0 +1,143 @@
+"""Cold start: import time, time to /health and time to the first reply.
+
+1. Import: ``import main`` in ``--runs`` fresh interpreters, as shipped
+   (provider SDKs imported on first use) and "eager" (openai, sarvamai,
+   pydub and speech_recognition imported up front, as before lazy
+   providers).
+2. Boot: a uvicorn worker is started ``--runs`` times against a local fake
+   LLM (no Sarvam key, so replies are text-only); reported are the time to
+   the first 200 from /health and how long the first /chat/text turn
+   takes when it arrives ``--first-request-after-ms`` later, with provider
+   prewarm on and off.
+3. Fault tolerance: a worker whose LLM endpoint refuses connections and
+   whose TTS key is missing still boots, reports the providers in /health
+   and answers /chat/text with the fallback reply.
+
+    cd backend && python -m benchmarks.bench_cold_start
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks import stubs
+from benchmarks.fake_openai import make_app
+
+LLM_PORT = 9119
+APP_PORT = 9120
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+EAGER = "import openai, sarvamai, pydub, speech_recognition; "
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); {eager}import main; print((time.perf_counter() - t) * 1000)"
+
+
+def _env(**overrides) -> dict:
+    env = {**os.environ, "STT_PROVIDER": "stub", "TTS_CACHE_PREWARM": "false", "TTS_CACHE_MAX_BYTES": "0"}
+    env.pop("SARVAM_API_KEY", None)
+    env.update(overrides)
+    return env
+
+
+def _import_ms(eager: bool) -> float:
+    code = IMPORT_SNIPPET.format(eager=EAGER if eager else "")
+    out = subprocess.run([sys.executable, "-c", code], cwd=BACKEND, env=_env(), capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def _boot(env: dict, wait: float = 0.0, timeout: float = 30.0) -> dict:
+    """Start a worker, poll /health, then send one turn ``wait`` seconds later.
+
+    ``health_ms`` is from process start; ``turn_ms`` is the turn's own latency.
+    """
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(APP_PORT), "--log-level", "warning"],
+        cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{APP_PORT}", timeout=timeout) as client:
+            while True:
+                if time.perf_counter() - start > timeout:
+                    raise RuntimeError("worker did not come up")
+                try:
+                    health = client.get("/health")
+                    break
+                except httpx.TransportError:
+                    time.sleep(0.01)
+            health_ms = (time.perf_counter() - start) * 1000
+            time.sleep(wait)
+            sent = time.perf_counter()
+            reply = client.post("/chat/text", json={"user_input": "I can't sleep at night."})
+            turn_ms = (time.perf_counter() - sent) * 1000
+            providers = client.get("/health").json()["providers"]
+    finally:
+        proc.terminate()
+        proc.wait()
+    body = reply.json()
+    return {
+        "health_ms": health_ms,
+        "turn_ms": turn_ms,
+        "status": reply.status_code,
+        "reply_text": body.get("reply_text"),
+        "audio": body.get("reply_audio_base64") is not None,
+        "providers_at_boot": {name: p["state"] for name, p in health.json()["providers"].items()},
+        "providers": {name: p["state"] for name, p in providers.items()},
+    }
+
+
+def _median(samples: list) -> float:
+    return round(statistics.median(samples), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--first-token-ms", type=float, default=100)
+    parser.add_argument("--first-request-after-ms", type=float, default=1000)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"import main, median of {args.runs} fresh interpreters")
+    for mode in ("lazy", "eager"):
+        samples = [_import_ms(mode == "eager") for _ in range(args.runs)]
+        results[f"import_{mode}"] = {"median_ms": _median(samples), "min_ms": round(min(samples), 1)}
+        print(f"  {mode:>6s} {_median(samples):8.1f} ms  (min {min(samples):.1f})")
+
+    stubs.serve_in_thread(make_app(stubs.Latency(args.first_token_ms / 1000), stubs.Latency(0.005)), LLM_PORT)
+    llm_env = {"HF_BASE_URL": f"http://127.0.0.1:{LLM_PORT}/v1", "HF_TOKEN": "stub"}
+
+    print(f"\nworker boot, median of {args.runs} (fake LLM {args.first_token_ms:.0f}ms to first token, no TTS key)")
+    print(f"{'prewarm':>8s} {'/health ms':>11s} {'1st turn ms':>12s}")
+    wait = args.first_request_after_ms / 1000
+    for prewarm in ("true", "false"):
+        runs = [_boot(_env(PROVIDERS_PREWARM=prewarm, **llm_env), wait) for _ in range(args.runs)]
+        row = results[f"boot_prewarm_{prewarm}"] = {
+            "health_ms": _median([r["health_ms"] for r in runs]),
+            "turn_ms": _median([r["turn_ms"] for r in runs]),
+            "ok": sum(r["status"] == 200 for r in runs),
+            "providers_after_reply": runs[-1]["providers"],
+        }
+        print(f"{prewarm:>8s} {row['health_ms']:11.1f} {row['turn_ms']:12.1f}")
+
+    run = _boot(_env(HF_BASE_URL="http://127.0.0.1:9/v1", HF_TOKEN="stub", LLM_MAX_ATTEMPTS="1"))
+    results["faulty_providers"] = run
+    print("\nLLM endpoint down, no TTS key:")
+    print(f"  /health after {run['health_ms']:.1f} ms, /chat/text {run['status']} in {run['turn_ms']:.1f} ms "
+          f"(audio: {run['audio']})")
+    print(f"  reply: {run['reply_text']!r}")
+    print(f"  providers: {run['providers']}")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
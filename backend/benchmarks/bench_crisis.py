@@ -0,0 +1,101 @@
+"""Crisis detection: Aho–Corasick matcher vs the original per-keyword scan.
+
+Builds a synthetic lexicon of ``--phrases`` entries (the shipped lexicon
+plus generated phrases), then times both on messages of increasing
+length. Also checks that every message the original loop flags is still
+flagged.
+
+    cd backend && python -m benchmarks.bench_crisis --phrases 1000
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+
+from benchmarks.bench_facts import _message
+from core import crisis
+
+_VERBS = ["hurt", "end", "finish", "stop", "harm", "cut", "punish", "destroy", "erase", "leave"]
+_OBJECTS = ["myself", "everything", "it all", "my life", "someone", "them", "him", "her", "the pain", "this"]
+_LEADS = ["i want to", "i'm going to", "i will", "i need to", "i might", "i plan to", "tonight i'll", "soon i'll", "i feel like i should", "i'm ready to"]
+
+
+def _lexicon(size: int, rng: random.Random) -> dict:
+    lexicon = {category: list(phrases) for category, phrases in crisis.CRISIS_LEXICON.items()}
+    generated = [f"{lead} {verb} {obj}" for lead in _LEADS for verb in _VERBS for obj in _OBJECTS]
+    rng.shuffle(generated)
+    extra = generated[:max(0, size - len(crisis.CRISIS_KEYWORDS))]
+    lexicon.setdefault("generated", []).extend(extra)
+    return lexicon
+
+
+def _legacy(keywords: list):
+    def check(text: str) -> bool:
+        text_lower = text.lower().strip()
+        for keyword in keywords:
+            if keyword in text_lower:
+                return True
+        return False
+    return check
+
+
+def _time_per_call(fn, texts: list, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            fn(text)
+    return (time.perf_counter() - start) / (repeat * len(texts)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--phrases", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    lexicon = _lexicon(args.phrases, rng)
+    keywords = [p for phrases in lexicon.values() for p in phrases]
+
+    start = time.perf_counter()
+    matcher = crisis.CrisisMatcher(lexicon)
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"lexicon: {len(matcher)} phrases, automaton built in {build_ms:.1f} ms")
+
+    legacy = _legacy([k.lower() for k in keywords])
+    results = {"phrases": len(matcher), "build_ms": round(build_ms, 2), "us_per_message": {}}
+
+    # Every message the original loop flags must still be flagged
+    corpus = [_message(rng) for _ in range(2000)]
+    corpus += [f"{_message(rng)} {rng.choice(keywords)} {_message(rng)}" for _ in range(2000)]
+    missed = sum(1 for t in corpus if legacy(t) and not matcher.scan(t).matches)
+    print(f"recall check: {len(corpus)} messages, {missed} missed")
+    results["missed"] = missed
+
+    print(f"{'chars':>8s} {'legacy':>10s} {'automaton':>10s}   (µs per message)")
+    for sentences in (1, 5, 25, 100):
+        texts = [" ".join(_message(rng) for _ in range(sentences)) for _ in range(50)]
+        repeat = max(1, 100 // sentences)
+
+        chars = sum(map(len, texts)) // len(texts)
+        legacy_us = _time_per_call(legacy, texts, repeat)
+        automaton_us = _time_per_call(matcher.scan, texts, repeat)
+
+        results["us_per_message"][chars] = {
+            "legacy": round(legacy_us, 2),
+            "automaton": round(automaton_us, 2),
+        }
+        print(f"{chars:8d} {legacy_us:10.2f} {automaton_us:10.2f}")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+    if missed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
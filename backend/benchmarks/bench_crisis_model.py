@@ -0,0 +1,83 @@
+"""Latency of the crisis classifier tier, one message at a time and batched.
+
+Weights are random (latency does not depend on their values) and written to
+a temporary ``.npy`` that is memory-mapped exactly as in production, unless
+``--model`` points at a trained file.
+
+    cd backend && python -m benchmarks.bench_crisis_model
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.bench_facts import _message
+from core.crisis import normalize
+from core.crisis_model import N_BUCKETS, CrisisClassifier
+
+
+def _percentile(samples: list, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", help="trained weights (default: random)")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=5)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    path = args.model
+    if not path:
+        fd, path = tempfile.mkstemp(suffix=".npy")
+        os.close(fd)
+        np.save(path, np.random.default_rng(args.seed).normal(0, 0.1, N_BUCKETS + 1).astype(np.float32))
+
+    start = time.perf_counter()
+    classifier = CrisisClassifier.load(path)
+    load_ms = (time.perf_counter() - start) * 1000
+    print(f"load (mmap): {load_ms:.2f} ms")
+
+    rng = random.Random(args.seed)
+    results = {"load_ms": round(load_ms, 3), "single_us": {}, "batch_us_per_message": {}}
+
+    print(f"{'chars':>8s} {'p50 µs':>10s} {'p99 µs':>10s}   (one message)")
+    for sentences in (1, 3, 10):
+        texts = [normalize(" ".join(_message(rng) for _ in range(sentences))) for _ in range(args.messages)]
+        samples = []
+        for text in texts:
+            t0 = time.perf_counter()
+            classifier.score(text)
+            samples.append((time.perf_counter() - t0) * 1e6)
+        chars = sum(map(len, texts)) // len(texts)
+        p50, p99 = _percentile(samples, 0.5), _percentile(samples, 0.99)
+        results["single_us"][chars] = {"p50": round(p50, 2), "p99": round(p99, 2)}
+        print(f"{chars:8d} {p50:10.2f} {p99:10.2f}")
+
+    texts = [normalize(_message(rng)) for _ in range(args.messages)]
+    print(f"{'batch':>8s} {'µs/msg':>10s}")
+    for size in (1, 16, 64, 256):
+        batches = [texts[i:i + size] for i in range(0, len(texts), size)]
+        t0 = time.perf_counter()
+        for batch in batches:
+            classifier.score_batch(batch)
+        per_msg = (time.perf_counter() - t0) / sum(map(len, batches)) * 1e6
+        results["batch_us_per_message"][size] = round(per_msg, 2)
+        print(f"{size:8d} {per_msg:10.2f}")
+
+    if not args.model:
+        os.remove(path)
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
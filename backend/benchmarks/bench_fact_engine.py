@@ -0,0 +1,112 @@
+"""Single-pass fact engine vs the original per-pattern extractors.
+
+First checks that both call sites produce exactly the original output on
+a randomized corpus (plus hand-picked edge cases), then times extraction
+on messages of increasing length.
+
+    cd backend && python -m benchmarks.bench_fact_engine
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+
+from benchmarks import legacy_facts
+from benchmarks.bench_facts import WORDS, _message
+from core import facts
+from service.summary import extract_facts
+
+EDGE_CASES = [
+    "i'm Ravi and I am 23. I'm from new delhi",
+    "I'm feeling low. I'm feeling worse. I feel stuck",
+    "I want to stop because I feel sad about my girlfriend and friends.",
+    "call me Jo-, my name is X. I am 7",
+    "I'M ANXIOUS, my Mom said I can't sleep",
+    "There is a reason for every person and their grandmother and stepson",
+    "my goal is to heal. I hope to rest. i like tea. I love rain. I enjoy quiet",
+    "I have been feeling numb since my fiancé left. My child is 3",
+    "I struggle with anger. I'm struggling with guilt",
+    "Honestly nothing. I live in A very long place name that goes on",
+    "I am tired; I'm tired; I'm 34 and I am Sam",
+    "İstanbul was home. I'm from İzmir and my friend says I feel lost",
+    "",
+]
+
+
+def _corpus(n: int, seed: int) -> list:
+    rng = random.Random(seed)
+    extra = ["I'm", "i am", "Call me", "my name is", "I feel", ".", ",", "friend", "son", "I'm from", "22"]
+    out = list(EDGE_CASES)
+    for _ in range(n):
+        parts = [_message(rng) for _ in range(rng.randint(1, 4))]
+        for _ in range(rng.randint(0, 4)):
+            parts.insert(rng.randint(0, len(parts)), rng.choice(extra) + " " + rng.choice(WORDS["name"]))
+        out.append(" ".join(parts))
+    return out
+
+
+def check_equivalence(corpus: list) -> int:
+    mismatches = 0
+    for text in corpus:
+        history = [{"role": "user", "content": text}]
+        if extract_facts(history) != legacy_facts.extract_facts(history):
+            mismatches += 1
+            print("summary mismatch:", repr(text), file=sys.stderr)
+        if facts.recent_details(history) != legacy_facts.memory_summary(history):
+            mismatches += 1
+            print("recent-details mismatch:", repr(text), file=sys.stderr)
+    return mismatches
+
+
+def _time_per_call(fn, texts: list, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            fn(text)
+    return (time.perf_counter() - start) / (repeat * len(texts)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", type=int, default=3000)
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    corpus = _corpus(args.corpus, args.seed)
+    mismatches = check_equivalence(corpus)
+    print(f"equivalence: {len(corpus)} messages, {mismatches} mismatches")
+
+    rng = random.Random(args.seed)
+    results = {"mismatches": mismatches, "us_per_message": {}}
+    print(f"{'chars':>8s} {'legacy':>10s} {'engine':>10s}   (µs per message, both call sites)")
+    for sentences in (1, 10, 100, 500):
+        texts = [" ".join(_message(rng) for _ in range(sentences)) for _ in range(20)]
+        repeat = max(1, 200 // sentences)
+
+        def legacy(text):
+            history = [{"role": "user", "content": text}]
+            legacy_facts.extract_facts(history)
+            legacy_facts.memory_summary(history)
+
+        def engine(text):
+            # uncached: a fresh scan per call, like a new message
+            facts.ENGINE.scan(text)
+
+        chars = sum(map(len, texts)) // len(texts)
+        legacy_us = _time_per_call(legacy, texts, repeat)
+        engine_us = _time_per_call(engine, texts, repeat)
+        results["us_per_message"][chars] = {"legacy": round(legacy_us, 2), "engine": round(engine_us, 2)}
+        print(f"{chars:8d} {legacy_us:10.2f} {engine_us:10.2f}")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Per-turn cost of fact extraction + summary as a conversation grows.
+
+Compares the incremental fact index (each user message scanned once, at
+append time) with the original full rescan of the history window on every
+turn. Per-turn cost of the incremental path should stay flat.
+
+    cd backend && python -m benchmarks.bench_facts
+"""
+
+import argparse
+import json
+import random
+import time
+
+from benchmarks import legacy_facts
+from service.session_store import InMemorySessionStore
+
+TEMPLATES = [
+    "My name is {name} and I live in {city}.",
+    "I feel {feeling} most evenings, especially after talking to my {relation}.",
+    "I want to {goal}. I can't {struggle} though.",
+    "I like {hobby}. I'm struggling with {struggle} at work.",
+    "Honestly the week has been long and I keep replaying the same conversation in my head.",
+    "I'm feeling {feeling} again. My {relation} says I should rest more.",
+    "I enjoy {hobby} on weekends, it helps me breathe a little.",
+]
+WORDS = {
+    "name": ["Asha", "Rohan", "Meera", "Kabir", "Sam"],
+    "city": ["Pune", "Delhi", "Bangalore", "Kochi"],
+    "feeling": ["drained", "anxious about exams", "lonely", "numb", "restless at night"],
+    "relation": ["mom", "brother", "friend", "partner", "daughter"],
+    "goal": ["sleep better", "change jobs", "reconnect with old friends", "be kinder to myself"],
+    "struggle": ["focus on anything", "say no to people", "stop overthinking"],
+    "hobby": ["painting", "long walks", "cooking for my family", "old Hindi songs"],
+}
+REPLY = "That sounds like a lot to carry. What feels heaviest right now?"
+
+
+def _message(rng: random.Random) -> str:
+    template = rng.choice(TEMPLATES)
+    return template.format(**{k: rng.choice(v) for k, v in WORDS.items()})
+
+
+def _per_turn_us(turn_fn, turns: int, checkpoints: list, seed: int) -> dict:
+    rng = random.Random(seed)
+    messages = [_message(rng) for _ in range(turns)]
+    costs = {}
+    window_start = 0.0
+    for i, text in enumerate(messages, 1):
+        start = time.perf_counter()
+        turn_fn(text)
+        window_start += time.perf_counter() - start
+        if i in checkpoints:
+            costs[i] = window_start
+            window_start = 0.0
+    # average cost per turn within each checkpoint window
+    result, prev = {}, 0
+    for cp in checkpoints:
+        result[cp] = round(costs[cp] / (cp - prev) * 1e6, 2)
+        prev = cp
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+    checkpoints = [cp for cp in (10, 100, 1000, 5000, 20000) if cp <= args.turns]
+
+    store = InMemorySessionStore(ttl_seconds=3600, max_sessions=10)
+
+    def incremental_turn(text: str) -> None:
+        store.append_message("bench", "user", text)
+        store.get_summary("bench")
+        store.append_message("bench", "assistant", REPLY)
+        store.maybe_update_summary("bench")
+
+    legacy = legacy_facts.RescanSummarizer()
+
+    def rescan_turn(text: str) -> None:
+        legacy.append("user", text)
+        legacy.summary
+        legacy.append("assistant", REPLY)
+        legacy.maybe_update_summary()
+
+    results = {
+        "incremental_us_per_turn": _per_turn_us(incremental_turn, args.turns, checkpoints, args.seed),
+        "rescan_us_per_turn": _per_turn_us(rescan_turn, args.turns, checkpoints, args.seed),
+    }
+    print(f"{'turns up to':>12s} {'incremental':>12s} {'rescan':>10s}   (µs per turn)")
+    for cp in checkpoints:
+        print(
+            f"{cp:12d} {results['incremental_us_per_turn'][cp]:12.2f} "
+            f"{results['rescan_us_per_turn'][cp]:10.2f}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
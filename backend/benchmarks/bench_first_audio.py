@@ -0,0 +1,96 @@
+"""Time-to-first-audio: sequential /chat/text versus pipelined sentence TTS.
+
+The sequential path only returns audio after the whole reply was generated
+and synthesized in one call. The pipelined path (/chat/text/stream?audio=true)
+sends each finished sentence to TTS while the LLM keeps generating.
+
+    cd backend && python -m benchmarks.bench_first_audio --runs 10
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+
+from benchmarks import stubs
+
+LLM_PORT = 9103
+APP_PORT = 9104
+os.environ["HF_BASE_URL"] = f"http://127.0.0.1:{LLM_PORT}/v1"
+
+import httpx
+
+from benchmarks.fake_openai import make_app
+from main import app
+
+REPLY = (
+    "That sounds exhausting, and it makes sense you feel worn down. "
+    "When sleep slips away night after night, everything else gets heavier too. "
+    "Maybe tonight we try one small wind-down ritual, like dimming screens an hour early. "
+    "What usually goes through your mind when you lie awake?"
+)
+BODY = {"user_input": "I feel tired all the time and I can't sleep."}
+
+
+def _sequential(client: httpx.Client) -> dict:
+    start = time.perf_counter()
+    resp = client.post("/chat/text", json=BODY)
+    resp.raise_for_status()
+    total = time.perf_counter() - start
+    return {"first_audio": total, "total": total}
+
+
+def _pipelined(client: httpx.Client) -> dict:
+    start = time.perf_counter()
+    first_audio = None
+    with client.stream("POST", "/chat/text/stream", params={"audio": "true"}, json=BODY) as resp:
+        resp.raise_for_status()
+        for line in resp.iter_lines():
+            if first_audio is None and line == "event: audio":
+                first_audio = time.perf_counter() - start
+    return {"first_audio": first_audio, "total": time.perf_counter() - start}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--first-token-ms", type=float, default=400)
+    parser.add_argument("--per-token-ms", type=float, default=40)
+    parser.add_argument("--tts-ms", type=float, default=250, help="fixed TTS cost per call")
+    parser.add_argument("--tts-per-char-ms", type=float, default=2.0)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    stubs.install(tts=stubs.Latency(args.tts_ms / 1000), tts_per_char=args.tts_per_char_ms / 1000)
+    stubs.serve_in_thread(
+        make_app(stubs.Latency(args.first_token_ms / 1000), stubs.Latency(args.per_token_ms / 1000), REPLY),
+        LLM_PORT,
+    )
+    stubs.serve_in_thread(app, APP_PORT)
+
+    results = {}
+    with httpx.Client(base_url=f"http://127.0.0.1:{APP_PORT}", timeout=60) as client:
+        for name, turn in (("sequential", _sequential), ("pipelined", _pipelined)):
+            turn(client)
+            samples = [turn(client) for _ in range(args.runs)]
+            first = [s["first_audio"] * 1000 for s in samples]
+            total = [s["total"] * 1000 for s in samples]
+            results[name] = {
+                "first_audio_p50_ms": round(statistics.median(first), 1),
+                "first_audio_max_ms": round(max(first), 1),
+                "total_p50_ms": round(statistics.median(total), 1),
+            }
+            r = results[name]
+            print(
+                f"{name:10s} first audio p50 {r['first_audio_p50_ms']:7.1f} ms  "
+                f"max {r['first_audio_max_ms']:7.1f} ms  total p50 {r['total_p50_ms']:7.1f} ms"
+            )
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""LLM client resilience: SDK defaults vs retries/breaker vs hedged requests.
+
+Two local OpenAI-compatible servers stand in for the providers. The
+primary injects 503s (``--error-rate``) and stalls before the first token
+(``--stall-rate`` for ``--stall-seconds``); the hedge endpoint is healthy.
+Each mode streams ``--requests`` completions at ``--concurrency``:
+
+- sdk: a plain AsyncOpenAI client (SDK retries, default timeouts), like
+  the original stream_reply.
+- retry: core.llm_client.ResilientLLM on the primary only.
+- hedged: the same plus the healthy endpoint. The router sends most
+  traffic to whichever endpoint is faster/healthier and hedges first
+  tokens later than that endpoint's rolling p95 to the other.
+
+"failed" requests are the ones that would have ended in the canned
+fallback reply.
+
+    cd backend && python -m benchmarks.bench_llm_client --requests 400
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks import stubs
+from benchmarks.fake_openai import Faults, make_app
+
+from openai import AsyncOpenAI
+
+from core.llm_client import LLMEndpoint, ResilientLLM, make_async_client
+
+PRIMARY_PORT = 9108
+HEDGE_PORT = 9109
+MESSAGES = [{"role": "user", "content": "I feel tired all the time."}]
+
+
+def _percentile(samples: list, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else float("nan")
+
+
+async def _sdk_deltas(client: AsyncOpenAI):
+    stream = await client.chat.completions.create(model="fake", messages=MESSAGES, stream=True)
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+async def _run(open_stream, requests: int, concurrency: int) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> dict:
+        async with semaphore:
+            start = time.perf_counter()
+            ttft = None
+            try:
+                async for _ in open_stream():
+                    if ttft is None:
+                        ttft = time.perf_counter() - start
+                ok = ttft is not None
+            except Exception:
+                ok = False
+            return {"ok": ok, "ttft": ttft, "total": time.perf_counter() - start}
+
+    return await asyncio.gather(*(one() for _ in range(requests)))
+
+
+def _make_mode(mode: str, args):
+    primary_url = f"http://127.0.0.1:{PRIMARY_PORT}/v1"
+    if mode == "sdk":
+        client = AsyncOpenAI(base_url=primary_url, api_key="stub")
+        return (lambda: _sdk_deltas(client)), None
+    primary = LLMEndpoint("primary", make_async_client(primary_url, "stub"), "fake")
+    endpoints = [primary]
+    if mode == "hedged":
+        endpoints.append(LLMEndpoint("hedge", make_async_client(f"http://127.0.0.1:{HEDGE_PORT}/v1", "stub"), "fake"))
+    llm = ResilientLLM(
+        endpoints,
+        max_attempts=args.attempts,
+        backoff=0.1,
+        backoff_max=1.0,
+        first_token_timeout=args.first_token_timeout,
+    )
+    return (lambda: llm.stream(MESSAGES)), llm
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--first-token-ms", type=float, default=400)
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--per-token-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--stall-rate", type=float, default=0.03)
+    parser.add_argument("--stall-seconds", type=float, default=20)
+    parser.add_argument("--first-token-timeout", type=float, default=2.0)
+    parser.add_argument("--attempts", type=int, default=3)
+    parser.add_argument("--modes", nargs="+", default=["sdk", "retry", "hedged"])
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    latency = stubs.Latency(args.first_token_ms / 1000, args.jitter_ms / 1000)
+    per_token = stubs.Latency(args.per_token_ms / 1000)
+    faults = Faults(args.error_rate, args.stall_rate, args.stall_seconds)
+    primary_app = make_app(latency, per_token, faults=faults)
+    stubs.serve_in_thread(primary_app, PRIMARY_PORT)
+    stubs.serve_in_thread(make_app(latency, per_token), HEDGE_PORT)
+
+    results = {}
+    print(f"{'mode':>7s} {'ttft p50':>9s} {'ttft p99':>9s} {'total p50':>10s} {'total p99':>10s} {'failed':>7s} {'upstream':>9s}")
+    for mode in args.modes:
+        open_stream, llm = _make_mode(mode, args)
+        before = primary_app.state.requests
+        samples = asyncio.run(_run(open_stream, args.requests, args.concurrency))
+        # Failed requests count at the time the caller gave up
+        ttft = [(s["ttft"] if s["ok"] else s["total"]) * 1000 for s in samples]
+        total = [s["total"] * 1000 for s in samples]
+        row = {
+            "ttft_p50_ms": round(_percentile(ttft, 0.5), 1),
+            "ttft_p99_ms": round(_percentile(ttft, 0.99), 1),
+            "total_p50_ms": round(_percentile(total, 0.5), 1),
+            "total_p99_ms": round(_percentile(total, 0.99), 1),
+            "failed": sum(1 for s in samples if not s["ok"]),
+            "primary_requests": primary_app.state.requests - before,
+        }
+        if llm is not None:
+            row["client"] = llm.stats()
+        results[mode] = row
+        print(f"{mode:>7s} {row['ttft_p50_ms']:9.1f} {row['ttft_p99_ms']:9.1f} {row['total_p50_ms']:10.1f} "
+              f"{row['total_p99_ms']:10.1f} {row['failed']:7d} {row['primary_requests']:9d}")
+        if llm is not None:
+            print(f"         retries {llm.retries}, hedges {llm.hedges} (won {llm.hedge_wins}), "
+                  f"breaker trips {llm.endpoints[0].breaker.trips}")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
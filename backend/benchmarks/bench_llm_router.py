@@ -0,0 +1,159 @@
+"""Multi-endpoint LLM routing simulation: one pinned endpoint vs the router.
+
+Three local OpenAI-compatible servers with limited prefill capacity stand
+in for providers: ``a`` (fast), ``b`` (slower) and ``c`` (reserved for
+crisis turns). Traffic runs through four phases, ``--requests`` streamed
+completions each, ``--crisis`` of them crisis turns:
+
+- steady: every endpoint healthy.
+- degraded: ``a`` slows to ``--degraded-ms`` and fails 10% of requests.
+- recovered: ``a`` is back to normal.
+- overload: ``--overload-concurrency`` clients, more than a and b accept.
+
+"pinned" sends everything to ``a``, like a single HF_BASE_URL/HF_MODEL.
+"router" routes over a and b by EWMA latency/error rate with in-flight
+caps (shedding the excess), and sends crisis turns to c first.
+
+    cd backend && python -m benchmarks.bench_llm_router
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from benchmarks import stubs
+from benchmarks.fake_openai import Faults, make_app
+
+from core.llm_client import LLMEndpoint, LLMOverloaded, ResilientLLM, make_async_client
+
+PORTS = {"a": 9110, "b": 9111, "c": 9112}
+MESSAGES = [{"role": "user", "content": "I feel tired all the time."}]
+
+
+def _percentile(samples: list, q: float):
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1) if ordered else None
+
+
+def _endpoint(name: str, max_inflight: int = 0, reserved: bool = False) -> LLMEndpoint:
+    client = make_async_client(f"http://127.0.0.1:{PORTS[name]}/v1", "stub")
+    return LLMEndpoint(name, client, "fake", max_inflight=max_inflight, reserved=reserved)
+
+
+def _make_llm(mode: str, args) -> ResilientLLM:
+    options = dict(max_attempts=3, backoff=0.05, backoff_max=0.5, first_token_timeout=args.first_token_timeout)
+    if mode == "pinned":
+        return ResilientLLM([_endpoint("a")], **options)
+    endpoints = [
+        _endpoint("a", args.max_inflight),
+        _endpoint("b", args.max_inflight),
+        _endpoint("c", args.max_inflight // 2, reserved=True),
+    ]
+    return ResilientLLM(endpoints, crisis_endpoint="c", explore=0.02, **options)
+
+
+async def _run(llm: ResilientLLM, requests: int, concurrency: int, crisis_share: float, seed: int) -> list:
+    rng = random.Random(seed)
+    kinds = [rng.random() < crisis_share for _ in range(requests)]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(crisis: bool) -> dict:
+        async with semaphore:
+            start = time.perf_counter()
+            ttft = None
+            outcome = "ok"
+            try:
+                async for _ in llm.stream(MESSAGES, crisis=crisis):
+                    if ttft is None:
+                        ttft = time.perf_counter() - start
+            except LLMOverloaded:
+                outcome = "shed"
+            except Exception:
+                outcome = "failed"
+            if outcome == "ok" and ttft is None:
+                outcome = "failed"
+            return {"crisis": crisis, "outcome": outcome, "ttft": ttft, "waited": time.perf_counter() - start}
+
+    return await asyncio.gather(*(one(c) for c in kinds))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--overload-concurrency", type=int, default=96)
+    parser.add_argument("--crisis", type=float, default=0.05)
+    parser.add_argument("--capacity", type=int, default=12, help="concurrent prefills per fake endpoint")
+    parser.add_argument("--max-inflight", type=int, default=24, help="router cap per endpoint")
+    parser.add_argument("--a-ms", type=float, default=300)
+    parser.add_argument("--b-ms", type=float, default=500)
+    parser.add_argument("--c-ms", type=float, default=400)
+    parser.add_argument("--degraded-ms", type=float, default=2500)
+    parser.add_argument("--first-token-timeout", type=float, default=4.0)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    latency = {
+        "a": stubs.Latency(args.a_ms / 1000, args.a_ms / 5000),
+        "b": stubs.Latency(args.b_ms / 1000, args.b_ms / 5000),
+        "c": stubs.Latency(args.c_ms / 1000, args.c_ms / 5000),
+    }
+    faults = Faults()
+    apps = {}
+    for name, port in PORTS.items():
+        apps[name] = make_app(
+            latency[name], stubs.Latency(0.02), faults=faults if name == "a" else None, capacity=args.capacity
+        )
+        stubs.serve_in_thread(apps[name], port)
+
+    phases = [
+        ("steady", args.concurrency, args.a_ms, 0.0),
+        ("degraded", args.concurrency, args.degraded_ms, 0.1),
+        ("recovered", args.concurrency, args.a_ms, 0.0),
+        ("overload", args.overload_concurrency, args.a_ms, 0.0),
+    ]
+
+    async def run_mode(mode: str) -> dict:
+        # One event loop per mode: pooled connections must not outlive their loop
+        llm = _make_llm(mode, args)
+        rows = {}
+        for i, (phase, concurrency, a_ms, error_rate) in enumerate(phases):
+            latency["a"].mean = a_ms / 1000
+            faults.error_rate = error_rate
+            before = {name: app.state.requests for name, app in apps.items()}
+            samples = await _run(llm, args.requests, concurrency, args.crisis, seed=i)
+            served = [s for s in samples if s["outcome"] != "shed"]
+            # A failed turn is a fallback reply after however long the user waited
+            normal = [(s["ttft"] or s["waited"]) * 1000 for s in served if not s["crisis"]]
+            crisis = [(s["ttft"] or s["waited"]) * 1000 for s in served if s["crisis"]]
+            row = rows[phase] = {
+                "ttft_p50_ms": _percentile(normal, 0.5),
+                "ttft_p99_ms": _percentile(normal, 0.99),
+                "crisis_ttft_p50_ms": _percentile(crisis, 0.5),
+                "crisis_ttft_p99_ms": _percentile(crisis, 0.99),
+                "failed": sum(1 for s in samples if s["outcome"] == "failed"),
+                "shed": sum(1 for s in samples if s["outcome"] == "shed"),
+                "crisis_shed": sum(1 for s in samples if s["outcome"] == "shed" and s["crisis"]),
+                "traffic": {name: app.state.requests - before[name] for name, app in apps.items()},
+            }
+            traffic = "/".join(str(row["traffic"][n]) for n in PORTS)
+            print(f"{mode:>7s} {phase:>10s} {row['ttft_p50_ms']:9.1f} {row['ttft_p99_ms']:9.1f} "
+                  f"{row['crisis_ttft_p99_ms'] or 0:11.1f} {row['failed']:7d} {row['shed']:5d}  {traffic}")
+        rows["client"] = llm.stats()
+        return rows
+
+    results = {}
+    print(f"{'mode':>7s} {'phase':>10s} {'ttft p50':>9s} {'ttft p99':>9s} {'crisis p99':>11s} "
+          f"{'failed':>7s} {'shed':>5s}  traffic a/b/c")
+    for mode in ("pinned", "router"):
+        results[mode] = asyncio.run(run_mode(mode))
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Tracing/metrics overhead and coverage.
+
+1. Micro: cost of one ``span()`` with metrics on and off.
+2. End to end: streamed text turns and voice turns through the app (fake
+   OpenAI server, stub TTS and STT) with METRICS_ENABLED off vs on,
+   alternating rounds to cancel drift.
+3. Coverage: every stage a turn passes through must appear in /metrics
+   with the expected count, and the exposition must be well formed.
+
+    cd backend && python -m benchmarks.bench_metrics
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import re
+import statistics
+import time
+import timeit
+import wave
+
+from benchmarks import stubs
+
+LLM_PORT = 9113
+APP_PORT = 9114
+os.environ["HF_BASE_URL"] = f"http://127.0.0.1:{LLM_PORT}/v1"
+os.environ["TTS_CACHE_MAX_BYTES"] = "0"
+
+import httpx
+
+from benchmarks.fake_openai import make_app
+from benchmarks.stubs import STUB_TRANSCRIPT
+from config import settings
+from core import stt
+from main import app
+from service.metrics import metrics, span
+
+EXPECTED_STAGES = ("session", "crisis", "facts", "prompt", "llm", "llm_first_token", "tts", "stt")
+_SAMPLE = re.compile(r'^(\w+)\{([^}]*)\} (\S+)$')
+
+
+def _wav(seconds: float) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(stt.SAMPLE_RATE)
+        w.writeframes(bytes(int(seconds * stt.SAMPLE_RATE) * 2))
+    return buf.getvalue()
+
+
+def _micro(n: int) -> dict:
+    def one():
+        with span("bench"):
+            pass
+
+    out = {}
+    for enabled in (False, True):
+        settings.METRICS_ENABLED = enabled
+        out["on" if enabled else "off"] = round(min(timeit.repeat(one, number=n, repeat=5)) / n * 1e9, 1)
+    metrics.reset()
+    return out
+
+
+async def _turns(client: httpx.AsyncClient, sessions: int, turns: int, clip: bytes) -> list:
+    async def session(i: int) -> list:
+        samples = []
+        session_id = None
+        for t in range(turns):
+            start = time.perf_counter()
+            if i % 2:
+                data = {"session_id": session_id} if session_id else {}
+                request = client.stream("POST", "/chat/voice/stream", data=data, files={"file": ("a.wav", clip, "audio/wav")})
+            else:
+                body = {"user_input": "I feel tired all the time and I can't sleep.", "session_id": session_id}
+                request = client.stream("POST", "/chat/text/stream?audio=true", json=body)
+            async with request as resp:
+                event = None
+                async for line in resp.aiter_lines():
+                    if line.startswith("event: "):
+                        event = line[7:]
+                    elif line.startswith("data: ") and event == "meta":
+                        session_id = json.loads(line[6:])["session_id"]
+            samples.append(time.perf_counter() - start)
+        return samples
+
+    return [s for samples in await asyncio.gather(*(session(i) for i in range(sessions))) for s in samples]
+
+
+def _check_exposition(text: str) -> list:
+    """Problems found in the Prometheus text (empty list = OK)."""
+    problems = []
+    buckets = {}
+    counts = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        m = _SAMPLE.match(line)
+        if not m:
+            problems.append(f"unparsable: {line}")
+            continue
+        name, labels, value = m.groups()
+        series = re.sub(r',?le="[^"]*"', "", labels)
+        if name.endswith("_bucket"):
+            buckets.setdefault((name[:-7], series), []).append(float(value))
+        elif name.endswith("_count"):
+            counts[(name[:-6], series)] = float(value)
+    for key, values in buckets.items():
+        if values != sorted(values):
+            problems.append(f"non-cumulative buckets: {key}")
+        if values[-1] != counts.get(key):
+            problems.append(f"+Inf bucket != count: {key}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = {"span_ns": _micro(200_000)}
+    print(f"span(): {results['span_ns']['off']} ns off, {results['span_ns']['on']} ns on")
+
+    stubs.install(tts=stubs.Latency(0.05))
+    stt.stt_provider.set(stt.StubSTT(STUB_TRANSCRIPT, latency=0.05))
+    stubs.serve_in_thread(make_app(stubs.Latency(0.2), stubs.Latency(0.01)), LLM_PORT)
+    stubs.serve_in_thread(app, APP_PORT)
+    clip = _wav(2.0)
+
+    async def run(enabled: bool) -> list:
+        settings.METRICS_ENABLED = enabled
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{APP_PORT}", timeout=60) as client:
+            return await _turns(client, args.sessions, args.turns, clip)
+
+    asyncio.run(run(False))  # warm up
+    metrics.reset()
+    timings = {"off": [], "on": []}
+    for _ in range(args.rounds):
+        for enabled in (False, True):
+            timings["on" if enabled else "off"] += asyncio.run(run(enabled))
+
+    for mode, samples in timings.items():
+        ms = [s * 1000 for s in samples]
+        results[mode] = {"turn_p50_ms": round(statistics.median(ms), 2), "turn_mean_ms": round(statistics.mean(ms), 2)}
+    overhead = results["on"]["turn_mean_ms"] - results["off"]["turn_mean_ms"]
+    print(f"turn mean: {results['off']['turn_mean_ms']} ms off, {results['on']['turn_mean_ms']} ms on "
+          f"({overhead:+.2f} ms, within noise if small)")
+
+    # Coverage: only the "on" rounds were recorded
+    turns = args.rounds * args.sessions * args.turns
+    summary = metrics.summary()
+    coverage = {stage: summary.get(stage, {}).get("count", 0) for stage in EXPECTED_STAGES}
+    text = httpx.get(f"http://127.0.0.1:{APP_PORT}/metrics").text
+    problems = _check_exposition(text)
+    missing = [stage for stage, n in coverage.items() if n == 0]
+    results["coverage"] = {"turns": turns, "stage_counts": coverage, "missing": missing, "exposition_problems": problems}
+    print(f"{turns} traced turns; stage counts: {coverage}")
+    print("coverage OK" if not missing and not problems else f"missing {missing}, problems {problems[:5]}")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Reply cache on a greeting/short-probe heavy traffic mix.
+
+Replays ``--turns`` replies through generate_reply_async against the stub
+LLM (``--llm-ms`` per call), with the reply cache off and on. The mix is
+``--greetings`` first-turn greetings, ``--probes`` short feeling words at
+random conversation depths, a few crisis-flagged short turns (which must
+always reach the LLM), and longer messages for the rest.
+
+    cd backend && python -m benchmarks.bench_reply_cache --turns 2000
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from benchmarks import stubs
+
+from config import settings
+from core import gpt
+from service.reply_cache import reply_cache
+
+GREETINGS = ["hi", "Hi!", "hello", "hey", "hey there", "Hello.", "namaste", "hii"]
+PROBES = ["sad", "I feel sad", "tired", "so tired", "feeling low", "numb", "I feel empty", "drained"]
+CRISIS = ["I want to die", "kill myself"]
+LONG = [
+    "Work has been piling up and my manager keeps adding deadlines I can't meet.",
+    "My mother calls every night and asks why I sound so low, and I don't know what to say.",
+    "I'm anxious about the presentation on Friday, my hands shake just thinking about it.",
+]
+
+
+def _history(rng: random.Random, depth: int, user_text: str) -> list:
+    history = []
+    for _ in range(depth):
+        history += [{"role": "user", "content": rng.choice(LONG)}, {"role": "assistant", "content": stubs.STUB_REPLY}]
+    return history + [{"role": "user", "content": user_text}]
+
+
+def _traffic(n: int, greetings: float, probes: float, crisis: float, seed: int) -> list:
+    rng = random.Random(seed)
+    turns = []
+    for _ in range(n):
+        r = rng.random()
+        if r < greetings:
+            text = rng.choice(GREETINGS)
+            turns.append({"kind": "greeting", "text": text, "is_first": True, "crisis": False, "history": _history(rng, 0, text)})
+        elif r < greetings + probes:
+            text = rng.choice(PROBES)
+            turns.append({"kind": "probe", "text": text, "is_first": False, "crisis": False,
+                          "history": _history(rng, rng.randint(1, 8), text)})
+        elif r < greetings + probes + crisis:
+            text = rng.choice(CRISIS)
+            turns.append({"kind": "crisis", "text": text, "is_first": False, "crisis": True, "history": _history(rng, 2, text)})
+        else:
+            text = rng.choice(LONG)
+            turns.append({"kind": "long", "text": text, "is_first": False, "crisis": False,
+                          "history": _history(rng, rng.randint(0, 8), text)})
+    return turns
+
+
+def _percentile(samples: list, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def _run(turns: list, concurrency: int, calls: list) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(turn: dict) -> dict:
+        async with semaphore:
+            before = len(calls)
+            start = time.perf_counter()
+            await gpt.generate_reply_async(
+                turn["text"], crisis=turn["crisis"], is_first=turn["is_first"], history=turn["history"]
+            )
+            return {"kind": turn["kind"], "ms": (time.perf_counter() - start) * 1000, "llm": len(calls) > before}
+
+    return await asyncio.gather(*(one(t) for t in turns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--greetings", type=float, default=0.25)
+    parser.add_argument("--probes", type=float, default=0.2)
+    parser.add_argument("--crisis", type=float, default=0.02)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--llm-ms", type=float, default=800)
+    parser.add_argument("--seed", type=int, default=3)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    stubs.install(llm=stubs.Latency(args.llm_ms / 1000, args.llm_ms / 10000))
+    calls = []
+    create = gpt._async_client.chat.completions.create
+
+    async def counting_create(**kwargs):
+        calls.append(kwargs["messages"][-1]["content"])
+        return await create(**kwargs)
+
+    gpt._async_client.chat.completions.create = counting_create
+    turns = _traffic(args.turns, args.greetings, args.probes, args.crisis, args.seed)
+
+    results = {}
+    print(f"{'cache':>5s} {'LLM calls':>10s} {'p50 ms':>8s} {'p95 ms':>8s} {'greet p50':>10s} {'probe p50':>10s} {'crisis LLM':>11s}")
+    for enabled in (False, True):
+        settings.REPLY_CACHE_ENABLED = enabled
+        reply_cache.clear()
+        calls.clear()
+        samples = asyncio.run(_run(turns, args.concurrency, calls))
+        ms = [s["ms"] for s in samples]
+        by_kind = {k: [s for s in samples if s["kind"] == k] for k in ("greeting", "probe", "crisis", "long")}
+        row = {
+            "llm_calls": len(calls),
+            "p50_ms": round(_percentile(ms, 0.5), 1),
+            "p95_ms": round(_percentile(ms, 0.95), 1),
+            "greeting_p50_ms": round(_percentile([s["ms"] for s in by_kind["greeting"]], 0.5), 1),
+            "probe_p50_ms": round(_percentile([s["ms"] for s in by_kind["probe"]], 0.5), 1),
+            "crisis_llm_calls": f"{sum(s['llm'] for s in by_kind['crisis'])}/{len(by_kind['crisis'])}",
+        }
+        if enabled:
+            row["cache"] = reply_cache.stats()
+        results["on" if enabled else "off"] = row
+        print(f"{'on' if enabled else 'off':>5s} {row['llm_calls']:10d} {row['p50_ms']:8.1f} {row['p95_ms']:8.1f} "
+              f"{row['greeting_p50_ms']:10.1f} {row['probe_p50_ms']:10.1f} {row['crisis_llm_calls']:>11s}")
+
+    stats = results["on"]["cache"]
+    print(f"hit rate {stats['hit_rate']:.1%} ({stats['entries']} keys), "
+          f"hit {stats['hit_ms_avg']} ms vs LLM {stats['miss_ms_avg']} ms on cacheable turns")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
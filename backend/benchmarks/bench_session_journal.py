@@ -0,0 +1,130 @@
+"""Session journal: write overhead on the request path and recovery time.
+
+1. Write overhead: ``--appends`` messages appended to the memory store with
+   no journal, with the group-committed journal, and with a write+fsync
+   per message for reference (what group commit avoids).
+2. Recovery: ``--messages`` messages (``--per-session`` per session) are
+   logged, then a fresh store is built from the directory: once replaying
+   the raw logs, and once more from the snapshot compacted out of them.
+
+    cd backend && python -m benchmarks.bench_session_journal --messages 1000000
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from service.session_journal import SessionJournal
+from service.session_store import InMemorySessionStore
+
+TEXT = "I have been feeling tired all week and I can't focus on my exams ({})."
+
+
+def _dir_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def _append_us(store, appends: int, sessions: int) -> float:
+    start = time.perf_counter()
+    for i in range(appends):
+        store._append(f"session-{i % sessions}", "user" if i % 2 == 0 else "assistant", TEXT.format(i))
+    return (time.perf_counter() - start) / appends * 1e6
+
+
+def _fsync_each_us(directory: str, appends: int, sessions: int) -> float:
+    """One write + fsync per message, as without group commit."""
+    with open(os.path.join(directory, "fsync-each.jsonl"), "a", encoding="utf-8") as fh:
+        start = time.perf_counter()
+        for i in range(appends):
+            fh.write(json.dumps(["m", f"session-{i % sessions}", "user", TEXT.format(i), time.time()]) + "\n")
+            fh.flush()
+            os.fsync(fh.fileno())
+        return (time.perf_counter() - start) / appends * 1e6
+
+
+def _recover(directory: str, max_sessions: int):
+    start = time.perf_counter()
+    journal = SessionJournal(directory, ttl_seconds=86400)
+    store = InMemorySessionStore(ttl_seconds=86400, max_sessions=max_sessions, journal=journal)
+    return store, journal, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--appends", type=int, default=20_000)
+    parser.add_argument("--fsync-appends", type=int, default=500)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--per-session", type=int, default=20)
+    parser.add_argument("--flush-interval-ms", type=float, default=50)
+    parser.add_argument("--dir", help="journal directory (default: a temp dir, removed afterwards)")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    root = args.dir or tempfile.mkdtemp(prefix="session-journal-")
+    results = {}
+    try:
+        sessions = max(1, args.appends // args.per_session)
+        plain = _append_us(InMemorySessionStore(86400, sessions), args.appends, sessions)
+        journal = SessionJournal(os.path.join(root, "overhead"), 86400, args.flush_interval_ms / 1000)
+        store = InMemorySessionStore(86400, sessions, journal=journal)
+        logged = _append_us(store, args.appends, sessions)
+        store.close()
+        fsync_each = _fsync_each_us(root, args.fsync_appends, sessions)
+        results["write"] = {
+            "append_us": round(plain, 2),
+            "append_journal_us": round(logged, 2),
+            "append_fsync_each_us": round(fsync_each, 2),
+            "records_per_fsync": round(journal.written / max(1, journal.fsyncs), 1),
+        }
+        print(f"append, per message ({args.appends} appends, flush every {args.flush_interval_ms:.0f}ms)")
+        print(f"  no journal        {plain:9.2f} us")
+        print(f"  group commit      {logged:9.2f} us   ({results['write']['records_per_fsync']} records per fsync)")
+        print(f"  fsync per message {fsync_each:9.2f} us   ({args.fsync_appends} appends)")
+
+        directory = os.path.join(root, "recovery")
+        sessions = max(1, args.messages // args.per_session)
+        journal = SessionJournal(directory, 86400, args.flush_interval_ms / 1000, snapshot_records=args.messages * 2)
+        store = InMemorySessionStore(86400, sessions, journal=journal)
+        start = time.perf_counter()
+        _append_us(store, args.messages, sessions)
+        store.close()
+        write_s = time.perf_counter() - start
+        log_bytes = _dir_bytes(directory)
+
+        store, journal, from_log_ms = _recover(directory, sessions)
+        recovered = len(store._sessions)
+        journal._compactor.join()  # recovery compacts the replayed logs into a snapshot
+        store.close()
+        snapshot_bytes = _dir_bytes(directory)
+        store, journal, from_snapshot_ms = _recover(directory, sessions)
+        store.close()
+
+        results["recovery"] = {
+            "messages": args.messages,
+            "sessions": recovered,
+            "write_s": round(write_s, 2),
+            "log_mb": round(log_bytes / 2**20, 1),
+            "from_log_ms": round(from_log_ms, 1),
+            "snapshot_mb": round(snapshot_bytes / 2**20, 1),
+            "from_snapshot_ms": round(from_snapshot_ms, 1),
+            "sessions_from_snapshot": len(store._sessions),
+        }
+        row = results["recovery"]
+        print(f"\nrecovery, {args.messages} logged messages in {sessions} sessions (written in {row['write_s']}s)")
+        print(f"  replay log        {row['from_log_ms']:9.1f} ms   {row['log_mb']:7.1f} MB  -> {recovered} sessions")
+        print(f"  load snapshot     {row['from_snapshot_ms']:9.1f} ms   {row['snapshot_mb']:7.1f} MB  -> "
+              f"{row['sessions_from_snapshot']} sessions")
+    finally:
+        if not args.dir:
+            shutil.rmtree(root, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""Memory per session and history read cost, by session layout.
+
+Layouts:
+
+* ``dicts``: a ``defaultdict`` of ``deque(maxlen=20)`` holding one
+  ``{"role", "content"}`` dict per message (core/memory.py).
+* ``deque``: the in-memory store with a deque of message dicts per session,
+  as before packed sessions.
+* ``packed``: the in-memory store as shipped (role codes + contents tuple,
+  HistoryView reads).
+
+Each layout is filled in a fresh interpreter with ``--sessions`` sessions of
+``--messages`` messages; RSS growth is scaled to 10k sessions. Message text
+is allocated before measuring, so the growth is the layout's own
+overhead. ``get_history + session_exists`` ("read") and reading plus
+iterating the history as message dicts are timed on a full window.
+
+    cd backend && python -m benchmarks.bench_session_memory --sessions 50000
+"""
+
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict, deque
+
+from service.session_store import WINDOW, InMemorySessionStore
+
+LAYOUTS = ("dicts", "deque", "packed")
+USER_TEXT = "I have been feeling tired all week and I can't focus on my exams ({}/{})."
+ASSISTANT_TEXT = "That sounds exhausting. When did you first notice the tiredness, and does rest help at all? ({}/{})"
+
+
+def _rss_bytes() -> int:
+    with open("/proc/self/statm") as fh:
+        return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+class _DictStore:
+    """core/memory.py's layout."""
+
+    def __init__(self):
+        self._store = defaultdict(lambda: deque(maxlen=WINDOW))
+
+    def _append(self, session_id: str, role: str, content: str) -> None:
+        self._store[session_id].append({"role": role, "content": content})
+
+    def get_history(self, session_id: str) -> list:
+        return list(self._store[session_id])
+
+    def session_exists(self, session_id: str) -> bool:
+        return len(self.get_history(session_id)) > 0
+
+
+class _DequeSession:
+    __slots__ = ("history", "facts", "facts_dirty", "summary", "last_access")
+
+    def __init__(self, now: float):
+        self.history = deque(maxlen=WINDOW)
+        self.facts = None
+        self.facts_dirty = False
+        self.summary = None
+        self.last_access = now
+
+
+class _DequeStore(InMemorySessionStore):
+    """The in-memory store with a deque of message dicts per session."""
+
+    def get_history(self, session_id: str) -> list:
+        with self._lock:
+            session = self._touch(session_id, time.monotonic())
+            return list(session.history) if session else []
+
+    def _append(self, session_id: str, role: str, content: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            session = self._touch(session_id, now)
+            if session is None:
+                session = self._sessions[session_id] = _DequeSession(now)
+            session.history.append({"role": role, "content": content})
+            self._evict(now)
+
+    def session_exists(self, session_id: str) -> bool:
+        with self._lock:
+            session = self._touch(session_id, time.monotonic())
+            return bool(session and session.history)
+
+
+def _worker(layout: str, sessions: int, messages: int, reads: int) -> dict:
+    ids = [f"{i:08x}-0000-4000-8000-{i:012x}" for i in range(sessions)]
+    texts = [
+        [(USER_TEXT if m % 2 == 0 else ASSISTANT_TEXT).format(i, m) for m in range(messages)]
+        for i in range(sessions)
+    ]
+    if layout == "dicts":
+        store = _DictStore()
+    elif layout == "deque":
+        store = _DequeStore(ttl_seconds=3600, max_sessions=sessions)
+    else:
+        store = InMemorySessionStore(ttl_seconds=3600, max_sessions=sessions)
+
+    gc.collect()
+    before = _rss_bytes()
+    for session_id, session_texts in zip(ids, texts):
+        for m, text in enumerate(session_texts):
+            store._append(session_id, "user" if m % 2 == 0 else "assistant", text)
+    gc.collect()
+    grown = _rss_bytes() - before
+
+    full = ids[0]
+    for m in range(WINDOW):
+        store._append(full, "user", f"filler {m}")
+    start = time.perf_counter()
+    for _ in range(reads):
+        store.session_exists(full)
+        store.get_history(full)
+    read_us = (time.perf_counter() - start) / reads * 1e6
+    start = time.perf_counter()
+    for _ in range(reads):
+        [m for m in store.get_history(full)]
+    build_us = (time.perf_counter() - start) / reads * 1e6
+
+    return {
+        "rss_per_10k_sessions_mb": round(grown * 10_000 / sessions / 2**20, 2),
+        "bytes_per_session": round(grown / sessions),
+        "read_us": round(read_us, 2),
+        "read_and_iterate_us": round(build_us, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20_000)
+    parser.add_argument("--messages", type=int, nargs="+", default=[2, WINDOW])
+    parser.add_argument("--reads", type=int, default=20_000)
+    parser.add_argument("--worker", choices=LAYOUTS, help=argparse.SUPPRESS)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(_worker(args.worker, args.sessions, args.messages[0], args.reads)))
+        return
+
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = {}
+    print(f"{args.sessions} sessions per layout, fresh interpreter each")
+    print(f"{'messages':>8s} {'layout':>7s} {'MB/10k':>8s} {'B/session':>10s} {'read us':>8s} {'read+iter us':>13s}")
+    for messages in args.messages:
+        for layout in LAYOUTS:
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_session_memory", "--worker", layout,
+                 "--sessions", str(args.sessions), "--messages", str(messages), "--reads", str(args.reads)],
+                cwd=backend, capture_output=True, text=True, check=True,
+            )
+            row = results[f"{layout}_{messages}"] = json.loads(out.stdout.strip().splitlines()[-1])
+            print(f"{messages:8d} {layout:>7s} {row['rss_per_10k_sessions_mb']:8.2f} {row['bytes_per_session']:10d} "
+                  f"{row['read_us']:8.2f} {row['read_and_iterate_us']:13.2f}")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
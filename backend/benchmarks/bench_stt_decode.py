@@ -0,0 +1,116 @@
+"""STT audio preparation: temp-file WAV round trip vs in-memory PCM.
+
+Times everything up to the recognizer call (which is the same in both
+paths and needs the network), and reports Python-side peak memory from
+tracemalloc. Sample clips are generated 44.1kHz stereo WAVs, like an
+uncompressed browser upload; pass ``--clip`` to use real recordings.
+
+    cd backend && python -m benchmarks.bench_stt_decode
+"""
+
+import argparse
+import array
+import io
+import json
+import math
+import os
+import tempfile
+import time
+import tracemalloc
+import wave
+
+import speech_recognition as sr
+from pydub import AudioSegment
+
+from core import stt
+
+
+def _sample_clip(seconds: float, rate: int = 44100) -> bytes:
+    frames = array.array("h")
+    for i in range(int(seconds * rate)):
+        v = int(8000 * math.sin(2 * math.pi * 220 * i / rate))
+        frames.extend((v, v))
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(frames.tobytes())
+    return buf.getvalue()
+
+
+def legacy_prepare(data: bytes) -> list:
+    """The original transcribe_audio up to recognize_google.
+
+    The WAV format hint spares it an ffprobe call, which only flatters it.
+    """
+    recognizer = sr.Recognizer()
+    wav_path = None
+    try:
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_wav:
+            fmt = "wav" if data[:4] == b"RIFF" else None
+            audio = AudioSegment.from_file(io.BytesIO(data), format=fmt)
+            audio = audio.set_frame_rate(16000).set_channels(1).set_sample_width(2)
+            audio.export(tmp_wav.name, format="wav")
+            wav_path = tmp_wav.name
+        with sr.AudioFile(wav_path) as source:
+            return [recognizer.record(source)]
+    finally:
+        if wav_path and os.path.exists(wav_path):
+            os.remove(wav_path)
+
+
+def in_memory_prepare(data: bytes) -> list:
+    pcm = stt.decode_pcm(stt.read_upload(io.BytesIO(data)))
+    out = []
+    for chunk in stt.pcm_chunks(pcm, 50):
+        frame = pcm if len(chunk) == len(pcm) else bytes(chunk)
+        out.append(sr.AudioData(frame, stt.SAMPLE_RATE, stt.SAMPLE_WIDTH))
+    return out
+
+
+def _measure(fn, data: bytes, repeat: int) -> dict:
+    fn(data)  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(data)
+    latency_ms = (time.perf_counter() - start) / repeat * 1000
+    tracemalloc.start()
+    fn(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"ms": round(latency_ms, 2), "peak_mb": round(peak / 1e6, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, nargs="+", default=[5, 30, 120])
+    parser.add_argument("--clip", action="append", help="audio file to use instead of generated clips")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    if args.clip:
+        clips = {}
+        for path in args.clip:
+            with open(path, "rb") as fh:
+                clips[os.path.basename(path)] = fh.read()
+    else:
+        clips = {f"{s:g}s": _sample_clip(s) for s in args.seconds}
+
+    results = {}
+    print(f"{'clip':>10s} {'MB':>6s} {'legacy ms':>10s} {'peak MB':>8s} {'memory ms':>10s} {'peak MB':>8s}")
+    for name, data in clips.items():
+        legacy = _measure(legacy_prepare, data, args.repeat)
+        memory = _measure(in_memory_prepare, data, args.repeat)
+        results[name] = {"bytes": len(data), "legacy": legacy, "in_memory": memory}
+        print(f"{name:>10s} {len(data) / 1e6:6.2f} {legacy['ms']:10.2f} {legacy['peak_mb']:8.2f} "
+              f"{memory['ms']:10.2f} {memory['peak_mb']:8.2f}")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
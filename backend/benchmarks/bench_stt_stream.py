@@ -0,0 +1,128 @@
+"""End-of-speech -> final transcript: upload-then-transcribe vs streaming.
+
+Both modes go through the /chat/stt WebSocket with the offline stub STT
+provider, which costs ``--rtf`` seconds of CPU per second of audio plus
+``--latency`` per recognition.
+
+- upload: the client records the whole utterance, uploads the compressed
+  clip (``--upload-kbps`` at ``--uplink-kbps``), then the server processes
+  all of it.
+- stream: 100ms PCM chunks are sent in real time while the user speaks, so
+  only the tail is left when they stop.
+
+    cd backend && python -m benchmarks.bench_stt_stream --sessions 1 4 8
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks import stubs
+from benchmarks.stubs import STUB_TRANSCRIPT
+
+import websockets
+
+from core import stt
+from main import app
+
+CHUNK_SECONDS = 0.1
+
+
+def _percentile(samples: list, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def _utterance(url: str, mode: str, seconds: float, upload_delay: float) -> dict:
+    chunk = bytes(int(CHUNK_SECONDS * stt.SAMPLE_RATE) * stt.SAMPLE_WIDTH)
+    chunks = int(seconds / CHUNK_SECONDS)
+    first_partial = None
+    async with websockets.connect(url, max_size=None) as ws:
+        start = time.perf_counter()
+
+        async def read_partials():
+            nonlocal first_partial
+            while True:
+                msg = json.loads(await ws.recv())
+                if msg["type"] == "final":
+                    return msg
+                if first_partial is None:
+                    first_partial = time.perf_counter() - start
+
+        reader = asyncio.create_task(read_partials())
+        if mode == "stream":
+            for _ in range(chunks):
+                await ws.send(chunk)
+                await asyncio.sleep(CHUNK_SECONDS)
+            end_of_speech = time.perf_counter()
+        else:
+            await asyncio.sleep(seconds)
+            end_of_speech = time.perf_counter()
+            await asyncio.sleep(upload_delay)
+            await ws.send(chunk * chunks)
+        await ws.send(json.dumps({"type": "end"}))
+        final = await reader
+        done = time.perf_counter()
+
+    return {
+        "eos_to_text": done - end_of_speech,
+        "first_partial": first_partial,
+        "ok": final["text"] == STUB_TRANSCRIPT,
+    }
+
+
+async def _run(url: str, mode: str, sessions: int, rounds: int, seconds: float, upload_delay: float) -> list:
+    samples = []
+    for _ in range(rounds):
+        samples += await asyncio.gather(*(
+            _utterance(url, mode, seconds, upload_delay) for _ in range(sessions)
+        ))
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--seconds", type=float, default=4.0, help="utterance length")
+    parser.add_argument("--rtf", type=float, default=0.3, help="STT real-time factor")
+    parser.add_argument("--latency", type=float, default=0.1, help="fixed STT latency per recognition")
+    parser.add_argument("--upload-kbps", type=float, default=32, help="bitrate of the uploaded clip")
+    parser.add_argument("--uplink-kbps", type=float, default=1000)
+    parser.add_argument("--port", type=int, default=9105)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    stt.stt_provider.set(stt.StubSTT(STUB_TRANSCRIPT, latency=args.latency, realtime_factor=args.rtf))
+    server = stubs.serve_in_thread(app, args.port)
+    url = f"ws://127.0.0.1:{args.port}/chat/stt"
+    upload_delay = args.seconds * args.upload_kbps / args.uplink_kbps
+
+    results = {}
+    print(f"{'mode':>8s} {'sessions':>9s} {'p50 ms':>8s} {'p95 ms':>8s} {'1st partial ms':>15s}")
+    try:
+        for sessions in args.sessions:
+            for mode in ("upload", "stream"):
+                samples = asyncio.run(_run(url, mode, sessions, args.rounds, args.seconds, upload_delay))
+                eos = [s["eos_to_text"] * 1000 for s in samples]
+                partials = [s["first_partial"] * 1000 for s in samples if s["first_partial"] is not None]
+                row = {
+                    "p50_ms": round(_percentile(eos, 0.5), 1),
+                    "p95_ms": round(_percentile(eos, 0.95), 1),
+                    "first_partial_ms": round(_percentile(partials, 0.5), 1) if partials else None,
+                    "errors": sum(1 for s in samples if not s["ok"]),
+                }
+                results.setdefault(mode, {})[sessions] = row
+                partial = f"{row['first_partial_ms']:15.1f}" if partials else f"{'-':>15s}"
+                print(f"{mode:>8s} {sessions:9d} {row['p50_ms']:8.1f} {row['p95_ms']:8.1f} {partial}")
+    finally:
+        server.should_exit = True
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Time-to-first-token of /chat/text/stream versus /chat/text.
+
+Starts a local fake OpenAI-compatible server (see ``fake_openai``) and the
+app itself on localhost, then compares how long the client waits before it
+sees any reply text on each route.
+
+    cd backend && python -m benchmarks.bench_ttft --runs 20
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+
+from benchmarks import stubs
+
+LLM_PORT = 9101
+APP_PORT = 9102
+os.environ["HF_BASE_URL"] = f"http://127.0.0.1:{LLM_PORT}/v1"
+
+import httpx
+
+from benchmarks.fake_openai import make_app
+from main import app
+
+
+def _blocking_turn(client: httpx.Client) -> dict:
+    start = time.perf_counter()
+    resp = client.post("/chat/text", json={"user_input": "I feel tired all the time."})
+    resp.raise_for_status()
+    total = time.perf_counter() - start
+    return {"ttft": total, "total": total}
+
+
+def _streaming_turn(client: httpx.Client) -> dict:
+    start = time.perf_counter()
+    ttft = None
+    with client.stream("POST", "/chat/text/stream", json={"user_input": "I feel tired all the time."}) as resp:
+        resp.raise_for_status()
+        for line in resp.iter_lines():
+            if ttft is None and line == "event: token":
+                ttft = time.perf_counter() - start
+    return {"ttft": ttft, "total": time.perf_counter() - start}
+
+
+def _summarize(samples: list) -> dict:
+    ttft = [s["ttft"] * 1000 for s in samples]
+    total = [s["total"] * 1000 for s in samples]
+    return {
+        "ttft_p50_ms": round(statistics.median(ttft), 1),
+        "ttft_max_ms": round(max(ttft), 1),
+        "total_p50_ms": round(statistics.median(total), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--first-token-ms", type=float, default=400)
+    parser.add_argument("--per-token-ms", type=float, default=40)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    stubs.install(tts=stubs.Latency(0.0))
+    stubs.serve_in_thread(
+        make_app(stubs.Latency(args.first_token_ms / 1000), stubs.Latency(args.per_token_ms / 1000)),
+        LLM_PORT,
+    )
+    stubs.serve_in_thread(app, APP_PORT)
+
+    results = {}
+    with httpx.Client(base_url=f"http://127.0.0.1:{APP_PORT}", timeout=60) as client:
+        for name, turn in (("/chat/text", _blocking_turn), ("/chat/text/stream", _streaming_turn)):
+            turn(client)  # warm up connections
+            results[name] = _summarize([turn(client) for _ in range(args.runs)])
+            r = results[name]
+            print(
+                f"{name:18s} ttft p50 {r['ttft_p50_ms']:7.1f} ms  max {r['ttft_max_ms']:7.1f} ms  "
+                f"total p50 {r['total_p50_ms']:7.1f} ms"
+            )
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""N simultaneous voice sessions: per-turn HTTP uploads vs one /chat/ws each.
+
+Every session speaks ``--turns`` utterances of ``--seconds`` each. Times are
+measured from the end of speech:
+
+- http: the client uploads the recorded clip (WAV) to /chat/voice/stream.
+- ws: 100ms PCM chunks are streamed over /chat/ws while the user speaks.
+
+Providers are local stubs: a streaming OpenAI-compatible server for the LLM,
+the stub Sarvam client for TTS and the stub STT provider (``--rtf`` seconds
+per second of audio plus ``--stt-ms``). The TTS cache is disabled so every
+turn pays for synthesis. Streaming spreads the same STT work over the time
+the user speaks, so N sessions need about N * rtf STT workers to keep up
+(``--stt-workers``).
+
+    cd backend && python -m benchmarks.bench_voice_ws --sessions 1 8 32
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import time
+import wave
+
+from benchmarks import stubs
+
+LLM_PORT = 9106
+APP_PORT = 9107
+os.environ["HF_BASE_URL"] = f"http://127.0.0.1:{LLM_PORT}/v1"
+os.environ["TTS_CACHE_MAX_BYTES"] = "0"
+
+import httpx
+import websockets
+
+from benchmarks.fake_openai import make_app
+from benchmarks.stubs import STUB_TRANSCRIPT
+from core import stt
+from main import app
+from service import concurrency
+
+CHUNK_SECONDS = 0.1
+REPLY = (
+    "That sounds exhausting, and it makes sense you feel worn down. "
+    "When sleep slips away night after night, everything else gets heavier too. "
+    "What usually goes through your mind when you lie awake?"
+)
+
+
+def _percentile(samples: list, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else float("nan")
+
+
+def _pcm(seconds: float) -> bytes:
+    return bytes(int(seconds * stt.SAMPLE_RATE) * stt.SAMPLE_WIDTH)
+
+
+def _wav(pcm: bytes) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(stt.SAMPLE_WIDTH)
+        w.setframerate(stt.SAMPLE_RATE)
+        w.writeframes(pcm)
+    return buf.getvalue()
+
+
+async def _http_session(base: str, turns: int, seconds: float) -> list:
+    clip = _wav(_pcm(seconds))
+    samples = []
+    session_id = None
+    async with httpx.AsyncClient(base_url=base, timeout=120) as client:
+        for _ in range(turns):
+            await asyncio.sleep(seconds)  # user speaking
+            eos = time.perf_counter()
+            marks = {}
+            data = {"session_id": session_id} if session_id else {}
+            files = {"file": ("audio.wav", clip, "audio/wav")}
+            async with client.stream("POST", "/chat/voice/stream", data=data, files=files) as resp:
+                event = None
+                async for line in resp.aiter_lines():
+                    if line.startswith("event: "):
+                        event = line[7:]
+                        marks.setdefault(event, time.perf_counter() - eos)
+                    elif line.startswith("data: ") and event == "meta":
+                        session_id = json.loads(line[6:])["session_id"]
+            samples.append({
+                "transcript": marks.get("meta"),
+                "first_token": marks.get("token"),
+                "first_audio": marks.get("audio"),
+                "done": marks.get("done"),
+            })
+    return samples
+
+
+async def _ws_session(url: str, turns: int, seconds: float) -> list:
+    chunk = _pcm(CHUNK_SECONDS)
+    samples = []
+    async with websockets.connect(url + "?input_format=pcm", max_size=None) as ws:
+        assert json.loads(await ws.recv())["type"] == "session"
+        for _ in range(turns):
+            for _ in range(int(seconds / CHUNK_SECONDS)):
+                await ws.send(chunk)
+                await asyncio.sleep(CHUNK_SECONDS)
+            eos = time.perf_counter()
+            await ws.send(json.dumps({"type": "end"}))
+            marks = {}
+            while True:
+                msg = await ws.recv()
+                if isinstance(msg, bytes):
+                    continue
+                kind = json.loads(msg)["type"]
+                marks.setdefault(kind, time.perf_counter() - eos)
+                if kind == "done":
+                    break
+            samples.append({
+                "transcript": marks.get("final"),
+                "first_token": marks.get("token"),
+                "first_audio": marks.get("audio"),
+                "done": marks.get("done"),
+            })
+    return samples
+
+
+async def _run(mode: str, sessions: int, turns: int, seconds: float) -> list:
+    if mode == "http":
+        runs = [_http_session(f"http://127.0.0.1:{APP_PORT}", turns, seconds) for _ in range(sessions)]
+    else:
+        runs = [_ws_session(f"ws://127.0.0.1:{APP_PORT}/chat/ws", turns, seconds) for _ in range(sessions)]
+    return [s for session in await asyncio.gather(*runs) for s in session]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--seconds", type=float, default=3.0, help="utterance length")
+    parser.add_argument("--rtf", type=float, default=0.3, help="STT real-time factor")
+    parser.add_argument("--stt-ms", type=float, default=100)
+    parser.add_argument("--stt-workers", type=int, help="override STT_CONCURRENCY")
+    parser.add_argument("--first-token-ms", type=float, default=400)
+    parser.add_argument("--per-token-ms", type=float, default=40)
+    parser.add_argument("--tts-ms", type=float, default=250)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    if args.stt_workers:
+        concurrency.STAGE_LIMITS["stt"] = args.stt_workers
+    stubs.install(tts=stubs.Latency(args.tts_ms / 1000), tts_per_char=0.002)
+    stt.stt_provider.set(stt.StubSTT(STUB_TRANSCRIPT, latency=args.stt_ms / 1000, realtime_factor=args.rtf))
+    stubs.serve_in_thread(
+        make_app(stubs.Latency(args.first_token_ms / 1000), stubs.Latency(args.per_token_ms / 1000), REPLY),
+        LLM_PORT,
+    )
+    stubs.serve_in_thread(app, APP_PORT)
+
+    results = {}
+    print(f"{'mode':>5s} {'N':>4s} {'text p50':>9s} {'token p50':>10s} {'audio p50':>10s} {'audio p95':>10s} {'done p50':>9s}   (ms after end of speech)")
+    for sessions in args.sessions:
+        for mode in ("http", "ws"):
+            samples = asyncio.run(_run(mode, sessions, args.turns, args.seconds))
+            row = {}
+            for key in ("transcript", "first_token", "first_audio", "done"):
+                values = [s[key] * 1000 for s in samples if s[key] is not None]
+                row[key] = {"p50": round(_percentile(values, 0.5), 1), "p95": round(_percentile(values, 0.95), 1)}
+            results.setdefault(mode, {})[sessions] = row
+            print(f"{mode:>5s} {sessions:4d} {row['transcript']['p50']:9.1f} {row['first_token']['p50']:10.1f} "
+                  f"{row['first_audio']['p50']:10.1f} {row['first_audio']['p95']:10.1f} {row['done']['p50']:9.1f}")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""A local OpenAI-compatible chat completions server with injectable latency.
+
+Supports both plain and ``stream=True`` requests, and optional injected
+faults (503 errors, stalls before the first token). Use ``make_app()`` to
+build the ASGI app and ``stubs.serve_in_thread`` to run it, or start it
+directly:
+
+    cd backend && python -m benchmarks.fake_openai --port 9100 --first-token-ms 400
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from contextlib import nullcontext
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from benchmarks.stubs import STUB_REPLY, Latency
+
+
+def _tokens(text: str) -> list:
+    words = text.split(" ")
+    return [w if i == 0 else " " + w for i, w in enumerate(words)]
+
+
+class Faults:
+    """Per-request fault injection: a 503 with ``error_rate``, a stall with ``stall_rate``."""
+
+    def __init__(self, error_rate: float = 0.0, stall_rate: float = 0.0, stall_seconds: float = 30.0):
+        self.error_rate = error_rate
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+
+    def pick(self) -> str | None:
+        r = random.random()
+        if r < self.error_rate:
+            return "error"
+        if r < self.error_rate + self.stall_rate:
+            return "stall"
+        return None
+
+
+def make_app(
+        first_token: Latency,
+        per_token: Latency,
+        reply: str = STUB_REPLY,
+        faults: Faults | None = None,
+        capacity: int = 0,
+    ) -> FastAPI:
+    """``capacity`` > 0 limits concurrent prefills; extra requests queue for a slot."""
+    app = FastAPI()
+    app.state.requests = 0
+    app.state.slots = None
+
+    def prefill_slot():
+        if not capacity:
+            return nullcontext()
+        if app.state.slots is None:
+            app.state.slots = asyncio.Semaphore(capacity)
+        return app.state.slots
+
+    @app.post("/v1/chat/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        fault = faults.pick() if faults else None
+        if fault == "error":
+            await asyncio.sleep(0.01)
+            return JSONResponse({"error": {"message": "injected failure", "type": "server_error"}}, status_code=503)
+        if fault == "stall":
+            await asyncio.sleep(faults.stall_seconds)
+        model = body.get("model", "fake")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+
+        if not body.get("stream"):
+            async with prefill_slot():
+                await asyncio.sleep(first_token.sample())
+            await asyncio.sleep(per_token.sample() * len(_tokens(reply)))
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": reply},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            }
+
+        def chunk(delta: dict, finish_reason=None) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def events():
+            async with prefill_slot():
+                await asyncio.sleep(first_token.sample())
+            yield chunk({"role": "assistant", "content": ""})
+            for i, token in enumerate(_tokens(reply)):
+                if i:
+                    await asyncio.sleep(per_token.sample())
+                yield chunk({"content": token})
+            yield chunk({}, finish_reason="stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--first-token-ms", type=float, default=400)
+    parser.add_argument("--per-token-ms", type=float, default=40)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--stall-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    faults = Faults(args.error_rate, args.stall_rate)
+    app = make_app(Latency(args.first_token_ms / 1000), Latency(args.per_token_ms / 1000), faults=faults)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""Verbatim copies of the original fact extractors, kept as a reference.
+
+Used by the benchmarks as the "before" baseline and to check that the
+optimized extractors produce the same output.
+"""
+
+from collections import deque
+from typing import Dict, List, Optional, Set
+import re
+
+
+def extract_facts(history: List[dict]) -> Dict[str, set]:
+    facts = {
+        "names": set(),
+        "locations": set(),
+        "goals": set(),
+        "likes": set(),
+        "concerns": set(),
+        "relations": set(),
+        "feelings": set(),
+    }
+    name_patterns = [
+        re.compile(r"\bmy name is ([A-Z][a-zA-Z\-']{1,30})", re.IGNORECASE),
+        re.compile(r"\bcall me ([A-Z][a-zA-Z\-']{1,30})", re.IGNORECASE),
+        re.compile(r"\bi am ([A-Z][a-zA-Z\-']{1,30})", re.IGNORECASE),
+    ]
+    location_patterns = [
+        re.compile(r"\bI live in ([A-Z][A-Za-z\s]{1,40})", re.IGNORECASE),
+        re.compile(r"\bI'm from ([A-Z][A-Za-z\s]{1,40})", re.IGNORECASE),
+    ]
+    goal_patterns = [re.compile(r"\bI want to ([^.]{3,80})", re.IGNORECASE)]
+    like_patterns = [
+        re.compile(r"\bI like ([^.]{3,60})", re.IGNORECASE),
+        re.compile(r"\bI love ([^.]{3,60})", re.IGNORECASE),
+        re.compile(r"\bI enjoy ([^.]{3,60})", re.IGNORECASE),
+    ]
+    concern_patterns = [
+        re.compile(r"\bI'm struggling with ([^.]{3,80})", re.IGNORECASE),
+        re.compile(r"\bI struggle with ([^.]{3,80})", re.IGNORECASE),
+        re.compile(r"\bI can't ([^.]{3,80})", re.IGNORECASE),
+    ]
+    feeling_patterns = [
+        re.compile(r"\bI feel ([^.]{3,80})", re.IGNORECASE),
+        re.compile(r"\bI'm feeling ([^.]{3,80})", re.IGNORECASE),
+    ]
+    relation_keywords = {"mom","mother","dad","father","sister","brother","friend","friends","partner","wife","husband","girlfriend","boyfriend","son","daughter"}
+
+    for msg in history:
+        if msg.get("role") != "user":
+            continue
+        text = msg.get("content", "")
+        if not text:
+            continue
+        for pat in name_patterns:
+            m = pat.search(text)
+            if m:
+                facts["names"].add(m.group(1).strip())
+        for pat in location_patterns:
+            m = pat.search(text)
+            if m:
+                loc = m.group(1).strip().rstrip('.')
+                if len(loc.split()) <= 5:
+                    facts["locations"].add(loc)
+        for pat in goal_patterns:
+            m = pat.search(text)
+            if m:
+                facts["goals"].add(m.group(1).strip().rstrip('.'))
+        for pat in like_patterns:
+            m = pat.search(text)
+            if m:
+                facts["likes"].add(m.group(1).strip().rstrip('.'))
+        for pat in concern_patterns:
+            m = pat.search(text)
+            if m:
+                facts["concerns"].add(m.group(1).strip().rstrip('.'))
+        for pat in feeling_patterns:
+            m = pat.search(text)
+            if m:
+                facts["feelings"].add(m.group(1).strip().rstrip('.'))
+        lowered = text.lower()
+        for kw in relation_keywords:
+            if kw in lowered:
+                facts["relations"].add(kw)
+    return facts
+
+def format_summary(facts: Dict[str, set]) -> str:
+    parts = []
+    if facts["names"]:
+        parts.append("Names: " + ", ".join(sorted(facts["names"])) )
+    if facts["locations"]:
+        parts.append("Locations: " + ", ".join(sorted(facts["locations"])) )
+    if facts["goals"]:
+        parts.append("Goals: " + "; ".join(sorted(facts["goals"]))[:160])
+    if facts["likes"]:
+        parts.append("Likes: " + "; ".join(sorted(facts["likes"]))[:120])
+    if facts["feelings"]:
+        parts.append("Feelings: " + "; ".join(sorted(facts["feelings"]))[:160])
+    if facts["concerns"]:
+        parts.append("Concerns: " + "; ".join(sorted(facts["concerns"]))[:160])
+    if facts["relations"]:
+        parts.append("Relations: " + ", ".join(sorted(facts["relations"])) )
+    if not parts:
+        return ""
+    return "Long-term user context: " + " | ".join(parts)
+
+
+class RescanSummarizer:
+    """The original maybe_update_summary: full rescan of the window."""
+
+    def __init__(self, max_turns: int = 10):
+        self.max_turns = max_turns
+        self.history = deque(maxlen=2 * max_turns)
+        self.summary: Optional[str] = None
+        self.count = 0
+
+    def append(self, role: str, content: str) -> None:
+        self.history.append({"role": role, "content": content})
+
+    def maybe_update_summary(self) -> None:
+        history = list(self.history)
+        count = len(history)
+        if count == 0:
+            return
+        if count >= (2 * self.max_turns - 2) or (count - self.count) >= 8 or self.summary is None:
+            summary_text = format_summary(extract_facts(history))
+            if summary_text:
+                self.summary = summary_text
+                self.count = count
+
+
+def memory_summary(history: List[dict]) -> Optional[str]:
+    """The original inline memory synthesis from generate_reply."""
+    memory_summary = None
+    # --- Lightweight memory synthesis (rule-based) ---
+    if history:
+        # Extract structured cues from history
+        name: Optional[str] = None
+        age: Optional[str] = None
+        location: Optional[str] = None
+        goals: Set[str] = set()
+        preferences: Set[str] = set()
+        concerns: Set[str] = set()
+        relations: Set[str] = set()
+
+        # Precompile small regex patterns
+        name_patterns = [
+            re.compile(r"\bmy name is ([A-Z][a-zA-Z\-']{1,30})\b", re.IGNORECASE),
+            re.compile(r"\bcall me ([A-Z][a-zA-Z\-']{1,30})\b", re.IGNORECASE),
+            re.compile(r"\bi am ([A-Z][a-zA-Z\-']{1,30})\b", re.IGNORECASE),
+            re.compile(r"^i'm ([A-Z][a-zA-Z\-']{1,30})\b", re.IGNORECASE),
+        ]
+        age_pattern = re.compile(r"\bI(?:'m| am) (\d{1,2})\b")
+        location_patterns = [
+            re.compile(r"\bI live in ([A-Z][A-Za-z\s]{1,40})", re.IGNORECASE),
+            re.compile(r"\bI'm from ([A-Z][A-Za-z\s]{1,40})", re.IGNORECASE),
+        ]
+        goal_patterns = [
+            re.compile(r"\bI want to ([^.]{3,80})", re.IGNORECASE),
+            re.compile(r"\bmy goal is to ([^.]{3,80})", re.IGNORECASE),
+            re.compile(r"\bI hope to ([^.]{3,80})", re.IGNORECASE),
+        ]
+        pref_patterns = [
+            re.compile(r"\bI like ([^.]{3,60})", re.IGNORECASE),
+            re.compile(r"\bI love ([^.]{3,60})", re.IGNORECASE),
+            re.compile(r"\bI enjoy ([^.]{3,60})", re.IGNORECASE),
+        ]
+        concern_patterns = [
+            re.compile(r"\bI feel ([^.]{3,80})", re.IGNORECASE),
+            re.compile(r"\bI'm feeling ([^.]{3,80})", re.IGNORECASE),
+            re.compile(r"\bI have been feeling ([^.]{3,80})", re.IGNORECASE),
+            re.compile(r"\bI'm (anxious|depressed|stressed|overwhelmed|tired)\b", re.IGNORECASE),
+        ]
+        relation_keywords = {"mom","mother","dad","father","sister","brother","friend","friends","partner","wife","husband","girlfriend","boyfriend","fiancé","fiancee","child","son","daughter"}
+
+        for m in history:
+            if not isinstance(m, dict):
+                continue
+            role = m.get("role")
+            if role != "user":
+                continue
+            text: str = m.get("content", "")
+            if not text:
+                continue
+
+            if not name:
+                for pat in name_patterns:
+                    nm = pat.search(text)
+                    if nm:
+                        cand = nm.group(1).strip().strip(",.;!?")
+                       
+                        if len(cand) > 1:
+                            name = cand[0].upper() + cand[1:]
+                            break
+     
+            if not age:
+                ag = age_pattern.search(text)
+                if ag:
+                    age_val = ag.group(1)
+                    if 4 <= len(age_val) <= 2:  
+                        pass
+                    else:
+                        age = age_val
+
+            if not location:
+                for pat in location_patterns:
+                    loc = pat.search(text)
+                    if loc:
+                        loc_val = loc.group(1).strip().rstrip('.').title()
+                        if len(loc_val.split()) <= 5:
+                            location = loc_val
+                            break
+  
+            for pat in goal_patterns:
+                g = pat.search(text)
+                if g:
+                    goals.add(g.group(1).strip().rstrip('.'))
+  
+            for pat in pref_patterns:
+                p = pat.search(text)
+                if p:
+                    preferences.add(p.group(1).strip().rstrip('.'))
+   
+            for pat in concern_patterns:
+                c = pat.search(text)
+                if c:
+                    concerns.add(c.group(c.lastindex or 1).strip().rstrip('.'))
+
+            lowered = text.lower()
+            for kw in relation_keywords:
+                if kw in lowered:
+                    relations.add(kw)
+
+        fact_chunks: List[str] = []
+        if name:
+            fact_chunks.append(f"Name: {name}")
+        if age:
+            fact_chunks.append(f"Age: {age}")
+        if location:
+            fact_chunks.append(f"Location: {location}")
+        if goals:
+            fact_chunks.append("Goals: " + "; ".join(sorted(goals))[:120])
+        if preferences:
+            fact_chunks.append("Likes: " + "; ".join(sorted(preferences))[:120])
+        if concerns:
+            fact_chunks.append("Concerns: " + "; ".join(sorted(concerns))[:160])
+        if relations:
+            fact_chunks.append("Mentioned relations: " + ", ".join(sorted(relations)))
+
+        if fact_chunks:
+            memory_summary = "Key user details (recent turns): " + " | ".join(fact_chunks)
+    return memory_summary
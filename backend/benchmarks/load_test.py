@@ -0,0 +1,342 @@
+"""End-to-end load test: multi-turn sessions against the whole app at rising concurrency.
+
+The app runs in-process under uvicorn with local stand-ins for every
+external provider, each with its own latency distribution (mean and
+jitter, in ms):
+
+- LLM: a streaming OpenAI-compatible server (``--llm-first-token-ms``,
+  ``--llm-per-token-ms``) in place of the HuggingFace router.
+- TTS: the stub Sarvam client (``--tts-ms`` plus ``--tts-per-char-ms``).
+- STT: the stub provider behind the real upload decode (``--stt-ms``).
+
+At each ``--concurrency`` level that many simulated users hold a
+conversation of ``--turns`` turns, pausing ``--think-ms`` between turns.
+Each turn picks a route from ``--mix`` (text, text/stream with audio,
+voice upload) and a message from a scripted conversation. Per level it
+reports throughput, p50/p95/p99 turn latency (overall and per route),
+time to first token for streamed routes, errors, memory per session and
+the per-stage breakdown from service.metrics.
+
+Write results with ``--json`` and compare against an earlier run with
+``--baseline``:
+
+    cd backend && python -m benchmarks.load_test --json run.json
+    cd backend && python -m benchmarks.load_test --baseline run.json
+"""
+
+import argparse
+import asyncio
+import gc
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import wave
+
+from benchmarks import stubs
+
+LLM_PORT = 9115
+APP_PORT = 9116
+os.environ["HF_BASE_URL"] = f"http://127.0.0.1:{LLM_PORT}/v1"
+os.environ.setdefault("TTS_CACHE_MAX_BYTES", "0")
+
+import httpx
+
+from benchmarks.fake_openai import make_app
+from core import stt
+from main import app
+from service import cache
+from service.metrics import metrics
+
+ROUTES = ("text", "stream", "voice")
+REPLY = (
+    "That sounds exhausting, and it makes sense you feel worn down. "
+    "When sleep slips away night after night, everything else gets heavier too. "
+    "What usually goes through your mind when you lie awake?"
+)
+# One scripted conversation; sessions start at random offsets into it
+SCRIPT = (
+    "hi",
+    "My name is Asha and I live in Pune.",
+    "I have been feeling really low since my exams started.",
+    "I can't sleep properly, I keep thinking about failing.",
+    "My parents expect me to get into engineering and I don't even like it.",
+    "tired",
+    "Sometimes I just sit in my room and scroll for hours.",
+    "My best friend Rohan moved to Bangalore last month, so I have nobody to talk to.",
+    "I tried going for walks but I stopped after two days.",
+    "Do you think it's normal to feel this way before results?",
+    "sad",
+    "I guess I want to feel like myself again.",
+)
+
+
+def _percentile(samples: list, q: float):
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1) if ordered else None
+
+
+def _latency_row(samples_ms: list) -> dict:
+    return {
+        "n": len(samples_ms),
+        "p50_ms": _percentile(samples_ms, 0.5),
+        "p95_ms": _percentile(samples_ms, 0.95),
+        "p99_ms": _percentile(samples_ms, 0.99),
+    }
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+
+        # Peak, not current, but still an upper bound off Linux (kB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _deep_size(obj, seen: set) -> int:
+    """Bytes reachable from ``obj`` (containers, instance dicts and slots), counted once."""
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_size(k, seen) + _deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)) or type(obj).__name__ == "deque":
+        size += sum(_deep_size(item, seen) for item in obj)
+    else:
+        if hasattr(obj, "__dict__"):
+            size += _deep_size(obj.__dict__, seen)
+        for name in getattr(type(obj), "__slots__", ()):
+            if hasattr(obj, name):
+                size += _deep_size(getattr(obj, name), seen)
+    return size
+
+
+def _store_bytes_per_session() -> float | None:
+    sessions = getattr(cache.get_store(), "_sessions", None)
+    if not sessions:
+        return None
+    return round(sum(_deep_size(s, set()) for s in sessions.values()) / len(sessions))
+
+
+def _wav(seconds: float) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(stt.SAMPLE_WIDTH)
+        w.setframerate(stt.SAMPLE_RATE)
+        w.writeframes(bytes(int(seconds * stt.SAMPLE_RATE) * stt.SAMPLE_WIDTH))
+    return buf.getvalue()
+
+
+async def _read_events(resp: httpx.Response, start: float) -> tuple:
+    """Drain an SSE response; returns (session_id, seconds to first token, error)."""
+    session_id = first = error = None
+    event = None
+    async for line in resp.aiter_lines():
+        if line.startswith("event: "):
+            event = line[7:]
+        elif line.startswith("data: "):
+            if event == "meta":
+                session_id = json.loads(line[6:])["session_id"]
+            elif event == "token" and first is None:
+                first = time.perf_counter() - start
+            elif event == "error":
+                error = line[6:]
+    return session_id, first, error
+
+
+async def _turn(client: httpx.AsyncClient, route: str, text: str, session_id, clip: bytes) -> dict:
+    start = time.perf_counter()
+    first = error = None
+    try:
+        if route == "text":
+            resp = await client.post("/chat/text", json={"user_input": text, "session_id": session_id})
+            resp.raise_for_status()
+            session_id = resp.json()["session_id"]
+        else:
+            if route == "stream":
+                request = client.stream(
+                    "POST", "/chat/text/stream?audio=true", json={"user_input": text, "session_id": session_id}
+                )
+            else:
+                data = {"session_id": session_id} if session_id else {}
+                request = client.stream("POST", "/chat/voice/stream", data=data, files={"file": ("turn.wav", clip, "audio/wav")})
+            async with request as resp:
+                resp.raise_for_status()
+                new_id, first, error = await _read_events(resp, start)
+                session_id = new_id or session_id
+    except (httpx.HTTPError, KeyError, ValueError) as exc:
+        error = f"{type(exc).__name__}: {exc}"
+    return {
+        "route": route,
+        "session_id": session_id,
+        "ms": (time.perf_counter() - start) * 1000,
+        "first_ms": first * 1000 if first is not None else None,
+        "error": error,
+    }
+
+
+async def _level(client: httpx.AsyncClient, users: int, args, clip: bytes, rng: random.Random) -> tuple:
+    weights = [args.mix[r] for r in ROUTES]
+    think = stubs.Latency(args.think_ms / 1000, args.think_ms / 4000)
+
+    async def user() -> list:
+        samples = []
+        session_id = None
+        offset = rng.randrange(len(SCRIPT))
+        # Stagger arrivals over one think time so users do not move in lockstep
+        await asyncio.sleep(rng.random() * args.think_ms / 1000)
+        for t in range(args.turns):
+            route = rng.choices(ROUTES, weights)[0]
+            sample = await _turn(client, route, SCRIPT[(offset + t) % len(SCRIPT)], session_id, clip)
+            session_id = sample["session_id"]
+            samples.append(sample)
+            await asyncio.sleep(think.sample())
+        return samples
+
+    start = time.perf_counter()
+    per_user = await asyncio.gather(*(user() for _ in range(users)))
+    return [s for samples in per_user for s in samples], time.perf_counter() - start
+
+
+def _report(users: int, samples: list, elapsed: float, rss_delta: int, store_bytes) -> dict:
+    ok = [s for s in samples if not s["error"]]
+    routes = {}
+    for route in ROUTES:
+        rows = [s for s in ok if s["route"] == route]
+        if rows:
+            routes[route] = _latency_row([s["ms"] for s in rows])
+            firsts = [s["first_ms"] for s in rows if s["first_ms"] is not None]
+            if firsts:
+                routes[route]["first_token_p50_ms"] = _percentile(firsts, 0.5)
+                routes[route]["first_token_p95_ms"] = _percentile(firsts, 0.95)
+    sessions = len({s["session_id"] for s in samples if s["session_id"]})
+    return {
+        "users": users,
+        "turns": len(samples),
+        "errors": len(samples) - len(ok),
+        "error_examples": sorted({s["error"] for s in samples if s["error"]})[:3],
+        "elapsed_s": round(elapsed, 2),
+        "throughput_turns_s": round(len(ok) / elapsed, 2),
+        **_latency_row([s["ms"] for s in ok]),
+        "routes": routes,
+        "sessions": sessions,
+        "rss_per_session_bytes": round(rss_delta / sessions) if sessions else None,
+        "store_bytes_per_session": store_bytes,
+        "stages": metrics.summary(),
+    }
+
+
+def _git_revision() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _compare(results: dict, path: str) -> None:
+    with open(path) as fh:
+        previous = json.load(fh)
+    baseline = {row["users"]: row for row in previous["levels"]}
+    print(f"\nvs {path} (rev {previous.get('revision') or '?'}, {previous.get('started')}):")
+    print(f"{'users':>6s} {'turns/s':>15s} {'p50 ms':>17s} {'p95 ms':>17s} {'p99 ms':>17s}")
+
+    def delta(new, old) -> str:
+        if new is None or old is None or not old:
+            return f"{'-':>17s}"
+        return f"{new:8.1f} ({(new - old) / old:+5.0%})"
+
+    for row in results["levels"]:
+        old = baseline.get(row["users"])
+        if old is None:
+            continue
+        print(f"{row['users']:6d} {delta(row['throughput_turns_s'], old['throughput_turns_s']):>15s} "
+              f"{delta(row['p50_ms'], old['p50_ms'])} {delta(row['p95_ms'], old['p95_ms'])} "
+              f"{delta(row['p99_ms'], old['p99_ms'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--turns", type=int, default=6, help="turns per simulated user")
+    parser.add_argument("--think-ms", type=float, default=500, help="pause between a user's turns")
+    parser.add_argument("--mix", default="text=0.4,stream=0.3,voice=0.3", help="route weights")
+    parser.add_argument("--llm-first-token-ms", type=float, nargs=2, default=[400, 100], metavar=("MEAN", "JITTER"))
+    parser.add_argument("--llm-per-token-ms", type=float, nargs=2, default=[20, 5], metavar=("MEAN", "JITTER"))
+    parser.add_argument("--tts-ms", type=float, nargs=2, default=[250, 60], metavar=("MEAN", "JITTER"))
+    parser.add_argument("--tts-per-char-ms", type=float, default=1.0)
+    parser.add_argument("--stt-ms", type=float, nargs=2, default=[300, 80], metavar=("MEAN", "JITTER"))
+    parser.add_argument("--clip-seconds", type=float, default=3.0, help="length of each voice upload")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="earlier --json output to compare against")
+    args = parser.parse_args()
+    args.mix = {k: float(v) for k, v in (part.split("=") for part in args.mix.split(","))}
+    args.mix = {route: args.mix.get(route, 0.0) for route in ROUTES}
+
+    def ms(pair) -> stubs.Latency:
+        return stubs.Latency(pair[0] / 1000, pair[1] / 1000)
+
+    stubs.install(tts=ms(args.tts_ms), tts_per_char=args.tts_per_char_ms / 1000, stt_provider=ms(args.stt_ms))
+    stubs.serve_in_thread(make_app(ms(args.llm_first_token_ms), ms(args.llm_per_token_ms), reply=REPLY), LLM_PORT)
+    stubs.serve_in_thread(app, APP_PORT)
+    clip = _wav(args.clip_seconds)
+    rng = random.Random(args.seed)
+
+    async def run(users: int) -> tuple:
+        limits = httpx.Limits(max_connections=users + 8)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{APP_PORT}", timeout=120, limits=limits) as client:
+            return await _level(client, users, args, clip, rng)
+
+    asyncio.run(run(2))  # warm up connections, thread pools and lazy clients
+    results = {
+        "revision": _git_revision(),
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "args": {k: v for k, v in vars(args).items() if k not in ("json", "baseline")},
+        "levels": [],
+    }
+    print(f"{'users':>6s} {'turns':>6s} {'err':>4s} {'turns/s':>8s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s} "
+          f"{'stream 1st p95':>15s} {'RSS KB/sess':>12s} {'store KB/sess':>14s}  slowest stages (mean ms)")
+    for users in args.concurrency:
+        metrics.reset()
+        gc.collect()
+        rss_before = _rss_bytes()
+        samples, elapsed = asyncio.run(run(users))
+        gc.collect()
+        row = _report(users, samples, elapsed, _rss_bytes() - rss_before, _store_bytes_per_session())
+        results["levels"].append(row)
+
+        first = row["routes"].get("stream", {}).get("first_token_p95_ms")
+        per_session = max(row["rss_per_session_bytes"] or 0, 0)
+        store = row["store_bytes_per_session"] or 0
+        stages = sorted(
+            ((name, s["mean_ms"]) for name, s in row["stages"].items() if s["mean_ms"] is not None),
+            key=lambda item: -item[1],
+        )[:4]
+        print(f"{users:6d} {row['turns']:6d} {row['errors']:4d} {row['throughput_turns_s']:8.2f} "
+              f"{row['p50_ms'] or 0:8.1f} {row['p95_ms'] or 0:8.1f} {row['p99_ms'] or 0:8.1f} "
+              f"{first or 0:15.1f} {per_session / 1024:12.1f} {store / 1024:14.1f}  "
+              + ", ".join(f"{name} {mean:.0f}" for name, mean in stages))
+        for example in row["error_examples"]:
+            print(f"       error: {example}")
+
+    if args.baseline:
+        _compare(results, args.baseline)
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Prompt tokens per turn over a long synthetic conversation.
+
+Replays ``--turns`` user/assistant exchanges through an in-memory session
+store and, for every turn, builds the prompt two ways:
+
+- legacy: persona + instructions (+ probe hint) as one system message,
+  recent details, the summary as a system message, then the full history.
+- budgeted: core.gpt._build_messages (stable prefix, history trimmed to
+  ``--budget``, one deduplicated context note).
+
+Reports estimated prompt tokens per turn and how many leading tokens are
+byte-identical to the previous turn's prompt (what provider-side prefix
+caching can reuse). Token counts use core.gpt.estimate_tokens; pass
+``--tiktoken`` to also count with a real tokenizer if its encoding is
+available.
+
+    cd backend && python -m benchmarks.report_prompt_tokens --turns 60
+"""
+
+import argparse
+import json
+import random
+
+from core import gpt
+from core.facts import recent_details
+from service.session_store import InMemorySessionStore
+
+OPENERS = [
+    "Hi, I'm Meera and I'm from Pune.",
+    "I feel tired all the time and I can't sleep.",
+    "My goal is to finish my thesis before June.",
+    "I love long walks in the evening, they calm me down.",
+]
+USER_LINES = [
+    "Work has been piling up and my manager keeps adding deadlines.",
+    "I feel sad.",
+    "My mother calls every night and asks why I sound so low.",
+    "I'm anxious about the presentation on Friday, my hands shake just thinking about it.",
+    "I struggle with guilt when I take a day off, even when I'm exhausted.",
+    "Honestly I don't know, some days are fine and then it all crashes again.",
+    "My friend Arjun says I should talk to someone, so here I am.",
+    "I want to sleep properly again, that's all I'm asking for.",
+    "I feel numb.",
+    "Yesterday I skipped lunch again because I couldn't stop checking email.",
+]
+REPLIES = [
+    "That sounds like a lot to carry. What part of it weighs on you most right now?",
+    "It makes sense you'd feel worn down. When did it start feeling this heavy?",
+    "Thank you for sharing that. Maybe one small pause in the day could help; what might that look like?",
+    "You're noticing a pattern there. What usually happens right before the crash?",
+    "That's a kind thing Arjun said. How does it feel to be talking about it now?",
+]
+
+
+def legacy_messages(user_text: str, history: list, summary, persona_key: str) -> list:
+    """The original _build_messages, with the summary prepended by the caller."""
+    if summary:
+        history = [{"role": "system", "content": summary}] + history
+    tail = " " + gpt.PROBE_INSTRUCTION if gpt._should_probe(user_text) else ""
+    messages = [{"role": "system", "content": gpt.PERSONA_MAP[persona_key] + gpt.MEMORY_INSTRUCTION + tail}]
+    if history:
+        memory = recent_details(history)
+        if memory:
+            messages.append({"role": "system", "content": memory})
+        messages.extend(history)
+    return messages
+
+
+def _tokens(messages: list, count) -> int:
+    return sum(gpt.MESSAGE_OVERHEAD_TOKENS + count(m["content"]) for m in messages)
+
+
+def _shared_prefix(prev: list, cur: list, count) -> int:
+    """Tokens in the leading messages identical to the previous prompt."""
+    shared = 0
+    for a, b in zip(prev, cur):
+        if a != b:
+            break
+        shared += gpt.MESSAGE_OVERHEAD_TOKENS + count(b["content"])
+    return shared
+
+
+def _counter(use_tiktoken: bool):
+    if not use_tiktoken:
+        return gpt.estimate_tokens
+    import tiktoken
+
+    encoding = tiktoken.get_encoding("cl100k_base")
+    return lambda text: len(encoding.encode(text))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=60)
+    parser.add_argument("--budget", type=int, default=None, help="default: PROMPT_TOKEN_BUDGET")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--tiktoken", action="store_true", help="count with tiktoken's cl100k_base")
+    parser.add_argument("--json", help="write per-turn results to this file")
+    args = parser.parse_args()
+
+    count = _counter(args.tiktoken)
+    rng = random.Random(args.seed)
+    store = InMemorySessionStore(ttl_seconds=3600, max_sessions=1)
+    sid = "report"
+
+    rows = []
+    prev = {"legacy": [], "budgeted": []}
+    print(f"{'turn':>4s} {'legacy':>7s} {'cached':>7s} {'budget':>7s} {'cached':>7s}")
+    for turn in range(args.turns):
+        user_text = OPENERS[turn] if turn < len(OPENERS) else rng.choice(USER_LINES)
+        is_first = turn == 0
+        store.append_message(sid, "user", user_text)
+        history = store.get_history(sid)
+        summary = store.get_summary(sid)
+
+        prompts = {
+            "legacy": legacy_messages(user_text, history, summary, "greeting" if is_first else "base"),
+            "budgeted": gpt._build_messages(
+                user_text, is_first=is_first, history=history, summary=summary, token_budget=args.budget
+            ),
+        }
+        row = {"turn": turn + 1}
+        for name, messages in prompts.items():
+            row[name] = _tokens(messages, count)
+            row[name + "_cached"] = _shared_prefix(prev[name], messages, count)
+            prev[name] = messages
+        rows.append(row)
+        if turn < 5 or (turn + 1) % 10 == 0:
+            print(f"{row['turn']:4d} {row['legacy']:7d} {row['legacy_cached']:7d} "
+                  f"{row['budgeted']:7d} {row['budgeted_cached']:7d}")
+
+        store.append_message(sid, "assistant", rng.choice(REPLIES))
+        store.maybe_update_summary(sid)
+
+    steady = rows[1:]
+    totals = {name: sum(r[name] for r in rows) for name in ("legacy", "budgeted")}
+    uncached = {name: sum(r[name] - r[name + "_cached"] for r in steady) for name in ("legacy", "budgeted")}
+    print(f"total prompt tokens: legacy {totals['legacy']}, budgeted {totals['budgeted']} "
+          f"({100 * (1 - totals['budgeted'] / totals['legacy']):.1f}% fewer)")
+    print(f"uncached tokens after turn 1: legacy {uncached['legacy']}, budgeted {uncached['budgeted']}")
+    print(f"max prompt: legacy {max(r['legacy'] for r in rows)}, budgeted {max(r['budgeted'] for r in rows)}")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump({"totals": totals, "uncached": uncached, "turns": rows}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
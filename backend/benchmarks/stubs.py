@@ -0,0 +1,140 @@
+"""Local stand-ins for the LLM, TTS and STT providers used by the benchmarks.
+
+Importing this module seeds dummy credentials so every provider counts as
+configured; call ``install()`` after importing the app to swap the
+provider clients for stubs with configurable latency.
+"""
+
+import asyncio
+import base64
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("HF_TOKEN", "stub")
+os.environ.setdefault("SARVAM_API_KEY", "stub")
+# Startup prewarm would call whichever TTS client is installed at that point
+os.environ.setdefault("TTS_CACHE_PREWARM", "false")
+
+STUB_REPLY = "That sounds really heavy. What part of it is weighing on you most today?"
+STUB_TRANSCRIPT = "I feel tired all the time and I can't sleep."
+# ~1s of 16-bit mono silence at 22.05kHz, roughly the size of a short reply
+STUB_AUDIO = base64.b64encode(b"RIFF" + bytes(44100)).decode()
+
+
+class Latency:
+    """Gaussian latency distribution (seconds), clipped at zero."""
+
+    def __init__(self, mean: float, jitter: float = 0.0):
+        self.mean = mean
+        self.jitter = jitter
+
+    def sample(self) -> float:
+        if not self.jitter:
+            return self.mean
+        return max(0.0, random.gauss(self.mean, self.jitter))
+
+
+def _completion(content: str) -> SimpleNamespace:
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class _StubCompletions:
+    def __init__(self, latency: Latency):
+        self.latency = latency
+
+    def create(self, *, model, messages, **kwargs):
+        time.sleep(self.latency.sample())
+        return _completion(STUB_REPLY)
+
+
+async def _chunks(content: str):
+    for i, word in enumerate(content.split(" ")):
+        delta = SimpleNamespace(content=word if i == 0 else " " + word)
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+class _StubAsyncCompletions(_StubCompletions):
+    async def create(self, *, model, messages, **kwargs):
+        await asyncio.sleep(self.latency.sample())
+        if kwargs.get("stream"):
+            return _chunks(STUB_REPLY)
+        return _completion(STUB_REPLY)
+
+
+class StubOpenAI:
+    def __init__(self, latency: Latency):
+        self.chat = SimpleNamespace(completions=_StubCompletions(latency))
+
+
+class StubAsyncOpenAI:
+    def __init__(self, latency: Latency):
+        self.chat = SimpleNamespace(completions=_StubAsyncCompletions(latency))
+
+
+class _StubTextToSpeech:
+    def __init__(self, latency: Latency, per_char: float = 0.0):
+        self.latency = latency
+        self.per_char = per_char
+
+    def convert(self, **kwargs):
+        time.sleep(self.latency.sample() + self.per_char * len(kwargs.get("text", "")))
+        return SimpleNamespace(audios=[STUB_AUDIO])
+
+
+class StubSarvam:
+    """Sarvam client stand-in; ``per_char`` models cost growing with text length."""
+
+    def __init__(self, latency: Latency, per_char: float = 0.0):
+        self.text_to_speech = _StubTextToSpeech(latency, per_char)
+
+
+def install(
+    llm: Latency | None = None,
+    tts: Latency | None = None,
+    stt: Latency | None = None,
+    tts_per_char: float = 0.0,
+    stt_provider: Latency | None = None,
+) -> None:
+    """Swap external providers for local stubs; ``None`` keeps the real one.
+
+    ``stt`` replaces the whole upload transcription (no audio decode);
+    ``stt_provider`` installs a StubSTT behind the real decode path.
+    """
+    import core.gpt
+    import core.stt
+    import core.tts
+
+    if llm is not None:
+        core.gpt._client = StubOpenAI(llm)
+        core.gpt._async_client = StubAsyncOpenAI(llm)
+        core.gpt.llm_provider.reset()
+    if tts is not None:
+        core.tts.tts_provider.set(StubSarvam(tts, tts_per_char))
+    if stt is not None:
+        def fake_transcribe(file):
+            file.file.read()
+            time.sleep(stt.sample())
+            return STUB_TRANSCRIPT
+
+        core.stt.transcribe_audio = fake_transcribe
+    if stt_provider is not None:
+        class SampledSTT(core.stt.StubSTT):
+            # A fresh draw for every recognition; assignments from __init__ are ignored
+            latency = property(lambda self: stt_provider.sample(), lambda self, value: None)
+
+        core.stt.stt_provider.set(SampledSTT(STUB_TRANSCRIPT))
+
+
+def serve_in_thread(asgi_app, port: int, host: str = "127.0.0.1"):
+    """Run an ASGI app with uvicorn on a background thread; returns the server."""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(asgi_app, host=host, port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
@@ -13,5 +13,109 @@ class Settings:
     HF_TOKEN: str = os.getenv("HF_TOKEN") 
     HF_MODEL: str = os.getenv("HF_MODEL", "openai/gpt-oss-20b:fireworks-ai")
 
-settings = Settings()
+    # LLM client: connection pool, per-attempt timeouts, retries and circuit breaker
+    LLM_POOL_SIZE: int = int(os.getenv("LLM_POOL_SIZE", "64"))
+    LLM_KEEPALIVE_SECONDS: float = float(os.getenv("LLM_KEEPALIVE_SECONDS", "30"))
+    LLM_CONNECT_TIMEOUT_SECONDS: float = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "3"))
+    LLM_READ_TIMEOUT_SECONDS: float = float(os.getenv("LLM_READ_TIMEOUT_SECONDS", "15"))
+    LLM_ATTEMPT_TIMEOUT_SECONDS: float = float(os.getenv("LLM_ATTEMPT_TIMEOUT_SECONDS", "20"))
+    LLM_FIRST_TOKEN_TIMEOUT_SECONDS: float = float(os.getenv("LLM_FIRST_TOKEN_TIMEOUT_SECONDS", "8"))
+    LLM_MAX_ATTEMPTS: int = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+    LLM_BACKOFF_MS: float = float(os.getenv("LLM_BACKOFF_MS", "200"))
+    LLM_BACKOFF_MAX_MS: float = float(os.getenv("LLM_BACKOFF_MAX_MS", "2000"))
+    LLM_BREAKER_FAILURES: int = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+    LLM_BREAKER_RESET_SECONDS: float = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+    # Optional hedge endpoint; a duplicate request goes there when the first
+    # token is late (LLM_HEDGE_AFTER_MS, 0 = rolling p95 of the primary)
+    LLM_HEDGE_BASE_URL: str = os.getenv("LLM_HEDGE_BASE_URL", "")
+    LLM_HEDGE_MODEL: str = os.getenv("LLM_HEDGE_MODEL", "")
+    LLM_HEDGE_TOKEN: str = os.getenv("LLM_HEDGE_TOKEN", "")
+    LLM_HEDGE_AFTER_MS: float = float(os.getenv("LLM_HEDGE_AFTER_MS", "0"))
+    LLM_HEDGE: bool = os.getenv("LLM_HEDGE", "true").lower() == "true"
+
+    # Multi-endpoint routing: JSON list of endpoints (see core.llm_client.endpoints_from_config);
+    # empty = HF_BASE_URL/HF_MODEL plus the optional hedge endpoint
+    LLM_ENDPOINTS: str = os.getenv("LLM_ENDPOINTS", "")
+    LLM_CRISIS_ENDPOINT: str = os.getenv("LLM_CRISIS_ENDPOINT", "")
+    LLM_ROUTER_EWMA_ALPHA: float = float(os.getenv("LLM_ROUTER_EWMA_ALPHA", "0.2"))
+    LLM_ROUTER_EXPLORE: float = float(os.getenv("LLM_ROUTER_EXPLORE", "0.02"))
+
+    # Per-stage latency histograms served at /metrics; optional JSON log line per request
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_LOG_JSON: bool = os.getenv("METRICS_LOG_JSON", "false").lower() == "true"
+
+    # Build the LLM/TTS/STT clients in the background at startup instead of on
+    # the first request that needs them (the app never waits for either)
+    PROVIDERS_PREWARM: bool = os.getenv("PROVIDERS_PREWARM", "true").lower() == "true"
+
+    # Protects /admin routes (sent as X-Admin-Token); admin routes are off when empty
+    ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")
+
+    # Max in-flight calls per pipeline stage (per worker process)
+    LLM_CONCURRENCY: int = int(os.getenv("LLM_CONCURRENCY", "32"))
+    TTS_CONCURRENCY: int = int(os.getenv("TTS_CONCURRENCY", "8"))
+    STT_CONCURRENCY: int = int(os.getenv("STT_CONCURRENCY", "4"))
+
+    # Admission control: turns in progress (0 = unlimited), bounded wait queue in
+    # front of them, and distinct turns running or queued per session
+    ADMISSION_MAX_ACTIVE: int = int(os.getenv("ADMISSION_MAX_ACTIVE", "64"))
+    ADMISSION_MAX_QUEUE: int = int(os.getenv("ADMISSION_MAX_QUEUE", "128"))
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "5"))
+    SESSION_MAX_PENDING: int = int(os.getenv("SESSION_MAX_PENDING", "2"))
+
+    # Token budget for the prompt sent to the LLM (persona + trimmed history + context)
+    PROMPT_TOKEN_BUDGET: int = int(os.getenv("PROMPT_TOKEN_BUDGET", "3000"))
+
+    # Reply cache for greetings and short feeling words (pools of varied LLM replies)
+    REPLY_CACHE_ENABLED: bool = os.getenv("REPLY_CACHE_ENABLED", "false").lower() == "true"
+    REPLY_CACHE_MAX_ENTRIES: int = int(os.getenv("REPLY_CACHE_MAX_ENTRIES", "512"))
+    REPLY_CACHE_TTL_SECONDS: int = int(os.getenv("REPLY_CACHE_TTL_SECONDS", "3600"))
+    REPLY_CACHE_POOL_SIZE: int = int(os.getenv("REPLY_CACHE_POOL_SIZE", "4"))
+    REPLY_CACHE_MAX_WORDS: int = int(os.getenv("REPLY_CACHE_MAX_WORDS", "6"))
 
+    # STT provider: "google" (remote), "vosk" (offline, needs STT_VOSK_MODEL) or "stub"
+    STT_PROVIDER: str = os.getenv("STT_PROVIDER", "google")
+    STT_VOSK_MODEL: str = os.getenv("STT_VOSK_MODEL", "models/vosk-model-small-en-in-0.4")
+    STT_STUB_TRANSCRIPT: str = os.getenv("STT_STUB_TRANSCRIPT", "I feel tired all the time and I can't sleep.")
+
+    # STT uploads: size cap (0 = none) and length of each recognition request
+    STT_MAX_UPLOAD_BYTES: int = int(os.getenv("STT_MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+    STT_CHUNK_SECONDS: float = float(os.getenv("STT_CHUNK_SECONDS", "50"))
+
+    # TTS clip cache: in-memory LRU size and optional on-disk tier (LRU-pruned past its own cap)
+    TTS_CACHE_MAX_BYTES: int = int(os.getenv("TTS_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    TTS_CACHE_DIR: str = os.getenv("TTS_CACHE_DIR", "")
+    TTS_CACHE_DISK_MAX_BYTES: int = int(os.getenv("TTS_CACHE_DISK_MAX_BYTES", str(256 * 1024 * 1024)))
+    TTS_CACHE_PREWARM: bool = os.getenv("TTS_CACHE_PREWARM", "true").lower() == "true"
+
+    # Reply clips served from /chat/audio/{id}: in-memory bound per worker, and an optional
+    # directory shared by the workers on one host (without it, use one worker or sticky routing)
+    AUDIO_STORE_MAX_BYTES: int = int(os.getenv("AUDIO_STORE_MAX_BYTES", str(32 * 1024 * 1024)))
+    AUDIO_STORE_DIR: str = os.getenv("AUDIO_STORE_DIR", "")
+
+    # TTS output codec: "wav" as synthesized, or "opus" (WebM/Opus via ffmpeg, far smaller
+    # on slow links) at TTS_OPUS_BITRATE_KBPS, encoded by at most TTS_ENCODE_WORKERS processes
+    TTS_OUTPUT_CODEC: str = os.getenv("TTS_OUTPUT_CODEC", "wav")
+    TTS_OPUS_BITRATE_KBPS: float = float(os.getenv("TTS_OPUS_BITRATE_KBPS", "24"))
+    TTS_ENCODE_WORKERS: int = int(os.getenv("TTS_ENCODE_WORKERS", "2"))
+
+    # Session store: "memory" (per process) or "sqlite" (shared across workers)
+    SESSION_STORE: str = os.getenv("SESSION_STORE", "memory")
+    SESSION_TTL_SECONDS: int = int(os.getenv("SESSION_TTL_SECONDS", str(6 * 60 * 60)))
+    SESSION_MAX: int = int(os.getenv("SESSION_MAX", "10000"))
+    SESSION_DB_PATH: str = os.getenv("SESSION_DB_PATH", "sessions.db")
+    SESSION_FLUSH_INTERVAL_MS: int = int(os.getenv("SESSION_FLUSH_INTERVAL_MS", "50"))
+    SESSION_FLUSH_BATCH: int = int(os.getenv("SESSION_FLUSH_BATCH", "64"))
+    # Optional append-only journal for the memory store (one worker per directory):
+    # group-committed every SESSION_JOURNAL_FLUSH_INTERVAL_MS, snapshotted every N records
+    SESSION_JOURNAL_DIR: str = os.getenv("SESSION_JOURNAL_DIR", "")
+    SESSION_JOURNAL_FLUSH_INTERVAL_MS: int = int(os.getenv("SESSION_JOURNAL_FLUSH_INTERVAL_MS", "50"))
+    SESSION_JOURNAL_SNAPSHOT_RECORDS: int = int(os.getenv("SESSION_JOURNAL_SNAPSHOT_RECORDS", "200000"))
+
+    # Optional CSV (category,phrase) of extra crisis phrases
+    CRISIS_LEXICON_PATH: str = os.getenv("CRISIS_LEXICON_PATH", "")
+    # Optional hashed n-gram classifier (core/crisis_model.py); skipped if the file is absent
+    CRISIS_MODEL_PATH: str = os.getenv("CRISIS_MODEL_PATH", "crisis_model.npy")
+    CRISIS_MODEL_THRESHOLD: float = float(os.getenv("CRISIS_MODEL_THRESHOLD", "0.5"))
+
+settings = Settings()
@@ -1,44 +1,242 @@
 
-from typing import Optional
+import csv
+import re
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Optional
 
+from config import settings
+from core.crisis_model import load_classifier
+from service.metrics import span
 
-CRISIS_KEYWORDS = [
-    "going to murder someone",
-    "going to commit suicide",
-    "i feel like to kill someone",
-    "i'm going to rape someone",
-    "i'm going to do something really bad",
-    "i want to attack someone.",
-    "suicide",
-    "can't take it anymore"
-]
 
-def check_crisis(user_text: str) -> dict:
-    """
-    Check if the given text contains crisis keywords.
-    Returns a dict with crisis flag and optional banner info.
-    """
+# category -> phrases. Matching is substring-based on normalized text
+# (see normalize), so phrases are written in plain lowercase words.
+CRISIS_LEXICON: Dict[str, List[str]] = {
+    "violence": [
+        "going to murder someone",
+        "i feel like to kill someone",
+        "i'm going to rape someone",
+        "i want to attack someone.",
+    ],
+    "self_harm": [
+        "going to commit suicide",
+        "suicide",
+        "kill myself",
+        "end my life",
+        "want to die",
+        # Hinglish / Hindi
+        "khudkushi",
+        "aatmhatya",
+        "marna chahta hoon",
+        "marna chahti hoon",
+        "jeena nahi chahta",
+        "jeena nahi chahti",
+        "zinda nahi rehna",
+        "आत्महत्या",
+        "मरना चाहता हूँ",
+        "मरना चाहती हूँ",
+        "जीना नहीं चाहता",
+        "जीना नहीं चाहती",
+    ],
+    "distress": [
+        "i'm going to do something really bad",
+        "can't take it anymore",
+        "bardasht nahi hota",
+        "sab khatam kar dunga",
+        "sab khatam kar dungi",
+    ],
+}
+
+# Flat list kept for callers that only need the phrases
+CRISIS_KEYWORDS = [phrase for phrases in CRISIS_LEXICON.values() for phrase in phrases]
+
+CRISIS_BANNER = {
+    "message": "It sounds like you might be going through a really difficult time. You're not alone.",
+    "helpline": {
+        "india": "Call 9152987821 (Vandrevala Foundation Helpline)",
+        "international": "Find your local helpline at https://findahelpline.com",
+    },
+}
+
+
+_APOSTROPHES = str.maketrans({"’": "'", "‘": "'", "`": "'", "´": "'", "ʼ": "'"})
+# \w misses Devanagari vowel signs, so the block is kept explicitly
+_PUNCT = re.compile(r"[^\w\s'\u0900-\u097F]+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase, unify apostrophes, turn punctuation into spaces, collapse whitespace."""
+    text = text.lower().translate(_APOSTROPHES)
+    text = _PUNCT.sub(" ", text)
+    return _SPACES.sub(" ", text).strip()
+
+
+class AhoCorasick:
+    """Aho–Corasick automaton: all phrase occurrences in one linear pass."""
+
+    def __init__(self, phrases: Iterable[str]):
+        self.phrases: List[str] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[tuple] = [()]
+
+        for phrase in phrases:
+            if not phrase:
+                continue
+            state = 0
+            for ch in phrase:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                state = nxt
+            self._out[state] = self._out[state] + (len(self.phrases),)
+            self.phrases.append(phrase)
+
+        # Breadth-first failure links; outputs inherit along the fail chain
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find_all(self, text: str) -> List[int]:
+        """Indices of every phrase occurring in text (each reported once, in order of appearance)."""
+        goto, fail, out = self._goto, self._fail, self._out
+        found: Dict[int, None] = {}
+        state = 0
+        for ch in text:
+            while True:
+                nxt = goto[state].get(ch)
+                if nxt is not None:
+                    state = nxt
+                    break
+                if state == 0:
+                    break
+                state = fail[state]
+            if out[state]:
+                for idx in out[state]:
+                    found[idx] = None
+        return list(found)
+
+
+class CrisisMatch(NamedTuple):
+    matches: List[str]
+    categories: List[str]
 
-    text_lower = user_text.lower().strip()
 
-    for keyword in CRISIS_KEYWORDS:
-        if keyword in text_lower:
-            return {
-                "crisis": True,
-                "banner": {
-                    "message": "It sounds like you might be going through a really difficult time. You're not alone.",
-                    "helpline": {
-                        "india": "Call 9152987821 (Vandrevala Foundation Helpline)",
-                        "international": "Find your local helpline at https://findahelpline.com",
-                    },
-                },
-            }
+class CrisisMatcher:
+    """Phrase lexicon compiled once into a single automaton."""
 
+    def __init__(self, lexicon: Dict[str, List[str]]):
+        category_of: Dict[str, str] = {}
+        for category, phrases in lexicon.items():
+            for phrase in phrases:
+                category_of.setdefault(normalize(phrase), category)
+        self._automaton = AhoCorasick(category_of)
+        self._categories = [category_of[p] for p in self._automaton.phrases]
 
+    def __len__(self) -> int:
+        return len(self._categories)
+
+    def scan(self, text: str) -> CrisisMatch:
+        return self.scan_normalized(normalize(text))
+
+    def scan_normalized(self, text: str) -> CrisisMatch:
+        hits = self._automaton.find_all(text)
+        phrases = self._automaton.phrases
+        categories = list(dict.fromkeys(self._categories[i] for i in hits))
+        return CrisisMatch([phrases[i] for i in hits], categories)
+
+
+def load_lexicon(path: str) -> Dict[str, List[str]]:
+    """Read extra phrases from a CSV file with ``category,phrase`` columns."""
+    lexicon: Dict[str, List[str]] = {}
+    with open(path, newline="", encoding="utf-8") as fh:
+        for row in csv.DictReader(fh):
+            phrase = (row.get("phrase") or "").strip()
+            if phrase:
+                lexicon.setdefault((row.get("category") or "other").strip(), []).append(phrase)
+    return lexicon
+
+
+def _build_matcher() -> CrisisMatcher:
+    lexicon = {category: list(phrases) for category, phrases in CRISIS_LEXICON.items()}
+    if settings.CRISIS_LEXICON_PATH:
+        try:
+            for category, phrases in load_lexicon(settings.CRISIS_LEXICON_PATH).items():
+                lexicon.setdefault(category, []).extend(phrases)
+        except OSError as e:
+            print(f"[CRISIS] Could not load lexicon {settings.CRISIS_LEXICON_PATH}: {e}")
+    return CrisisMatcher(lexicon)
+
+
+_matcher = _build_matcher()
+_classifier = load_classifier(settings.CRISIS_MODEL_PATH)
+
+
+def _result(match: CrisisMatch, score: Optional[float] = None) -> dict:
+    flagged = score is not None and score >= settings.CRISIS_MODEL_THRESHOLD
+    if match.matches or flagged:
+        return {
+            "crisis": True,
+            "banner": CRISIS_BANNER,
+            "matches": match.matches,
+            "categories": match.categories or ["classifier"],
+            "score": score,
+        }
     return {
         "crisis": False,
         "banner": None,
+        "matches": [],
+        "categories": [],
+        "score": score,
     }
 
 
+def check_keywords(user_text: str) -> CrisisMatch:
+    """Keyword pass only (no classifier tier)."""
+    return _matcher.scan(user_text)
+
+
+def check_crisis(user_text: str) -> dict:
+    """
+    Check if the given text contains crisis keywords.
+    Returns a dict with crisis flag and optional banner info, plus the
+    matched phrases and their categories. When no phrase matches and a
+    classifier is loaded, its probability decides and is returned as score.
+    """
+    with span("crisis"):
+        text = normalize(user_text)
+        match = _matcher.scan_normalized(text)
+        score = None
+        if not match.matches and _classifier is not None:
+            score = _classifier.score(text)
+        return _result(match, score)
+
 
+def check_crisis_batch(texts: Iterable[str]) -> List[dict]:
+    """check_crisis for many messages; identical texts are scanned once and
+    the classifier scores all keyword misses in one vectorized call."""
+    texts = list(texts)
+    unique = list(dict.fromkeys(texts))
+    normalized = [normalize(t) for t in unique]
+    matches = [_matcher.scan_normalized(t) for t in normalized]
+    scores: List[Optional[float]] = [None] * len(unique)
+    if _classifier is not None:
+        pending = [i for i, m in enumerate(matches) if not m.matches]
+        if pending:
+            batch = _classifier.score_batch([normalized[i] for i in pending])
+            for i, score in zip(pending, batch):
+                scores[i] = float(score)
+    by_text = {t: (m, s) for t, m, s in zip(unique, matches, scores)}
+    return [_result(*by_text[t]) for t in texts]
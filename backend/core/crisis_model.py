@@ -0,0 +1,255 @@
+"""Offline crisis classifier: logistic regression over hashed n-grams.
+
+Runs after the keyword pass in core/crisis.py to catch paraphrases. The
+model is a single float32 ``.npy`` vector (``N_BUCKETS`` weights followed by
+the bias) loaded with ``mmap_mode="r"``, so loading is one mmap and worker
+processes share the pages. Texts are expected already normalized
+(``core.crisis.normalize``).
+
+Train and evaluate on a labelled CSV with ``text,label`` columns (label 1 =
+crisis):
+
+    cd backend && python -m core.crisis_model train data.csv --out crisis_model.npy
+    cd backend && python -m core.crisis_model eval data.csv --model crisis_model.npy
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import zlib
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+# Optional dependency, imported only once a model file is found (see
+# _import_numpy): without a model, startup never pays for numpy
+np = None
+
+
+# Changing any of these invalidates trained weights
+N_BUCKETS = 1 << 18
+CHAR_NGRAMS = (3, 4, 5)
+_MASK = N_BUCKETS - 1
+# Hash seeds keep word, bigram and n-gram features apart
+_SEED_WORD, _SEED_BIGRAM = 0x5EED0001, 0x5EED0002
+_SEED_NGRAM = {n: 0x811C9DC5 + n for n in CHAR_NGRAMS}
+_FNV_PRIME = 16777619
+
+
+def _import_numpy() -> bool:
+    """Bind numpy to ``np`` on first use; False when it is not installed."""
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return False
+        np = numpy
+    return True
+
+
+def _word_hashes(text: str) -> List[int]:
+    words = [w.encode("utf-8") for w in text.split()]
+    out = [zlib.crc32(w, _SEED_WORD) for w in words]
+    out += [zlib.crc32(a + b" " + b, _SEED_BIGRAM) for a, b in zip(words, words[1:])]
+    return out
+
+
+def _ngram_hashes(text: str) -> list:
+    """FNV-1a of every byte n-gram of the UTF-8 text, vectorized over positions."""
+    data = np.frombuffer(b" " + text.encode("utf-8") + b" ", dtype=np.uint8).astype(np.uint32)
+    parts = []
+    for n in CHAR_NGRAMS:
+        m = len(data) - n + 1
+        if m <= 0:
+            continue
+        h = np.full(m, _SEED_NGRAM[n], dtype=np.uint32)
+        for k in range(n):
+            h = (h ^ data[k:k + m]) * np.uint32(_FNV_PRIME)
+        parts.append(h)
+    return parts
+
+
+def _mix(h):
+    # murmur3 finalizer: spreads FNV's weak low bits before masking
+    h = h ^ (h >> np.uint32(16))
+    h = h * np.uint32(0x85EBCA6B)
+    h = h ^ (h >> np.uint32(13))
+    h = h * np.uint32(0xC2B2AE35)
+    return h ^ (h >> np.uint32(16))
+
+
+def featurize(text: str):
+    """Hashed word uni/bigrams and byte n-grams: (bucket ids, signed values).
+
+    Each feature contributes +-1/sqrt(number of features); repeated buckets
+    are left unmerged since only sums over them are ever taken.
+    """
+    words = np.asarray(_word_hashes(text), dtype=np.uint32)
+    h = _mix(np.concatenate([words] + _ngram_hashes(text)))
+    if not len(h):
+        return h.astype(np.int64), np.zeros(0, dtype=np.float32)
+    scale = np.float32(1.0 / math.sqrt(len(h)))
+    vals = np.where(h >> np.uint32(31), scale, -scale).astype(np.float32)
+    return (h & np.uint32(_MASK)).astype(np.int64), vals
+
+
+def _matrix(texts: Sequence[str]):
+    """CSR-style (row ids, bucket ids, values) for a batch of texts."""
+    rows, cols, vals = [], [], []
+    for row, text in enumerate(texts):
+        idx, val = featurize(text)
+        rows.append(np.full(len(idx), row, dtype=np.int64))
+        cols.append(idx)
+        vals.append(val)
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(vals)
+
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+class CrisisClassifier:
+    def __init__(self, weights):
+        if weights.shape != (N_BUCKETS + 1,):
+            raise ValueError(f"expected {N_BUCKETS + 1} weights, got {weights.shape}")
+        self._w = weights[:N_BUCKETS]
+        self._bias = float(weights[N_BUCKETS])
+
+    @classmethod
+    def load(cls, path: str) -> "CrisisClassifier":
+        if not _import_numpy():
+            raise ImportError("numpy is required for the crisis classifier")
+        return cls(np.load(path, mmap_mode="r"))
+
+    def score(self, text: str) -> float:
+        """Crisis probability for one normalized message."""
+        idx, val = featurize(text)
+        z = self._bias + float(np.dot(self._w[idx], val))
+        return float(_sigmoid(z))
+
+    def score_batch(self, texts: Sequence[str]):
+        """Crisis probabilities for many normalized messages (one numpy pass)."""
+        if not texts:
+            return np.zeros(0, dtype=np.float64)
+        rows, cols, vals = _matrix(texts)
+        z = np.bincount(rows, weights=self._w[cols] * vals, minlength=len(texts)) + self._bias
+        return _sigmoid(z)
+
+
+def load_classifier(path: str) -> Optional[CrisisClassifier]:
+    """The classifier at ``path``, or None when numpy or the file is missing."""
+    if not path or not os.path.exists(path):
+        return None
+    if not _import_numpy():
+        print("[CRISIS] numpy not installed; classifier tier disabled")
+        return None
+    try:
+        return CrisisClassifier.load(path)
+    except (OSError, ValueError) as e:
+        print(f"[CRISIS] Could not load classifier {path}: {e}")
+        return None
+
+
+# --- training / evaluation harness ---
+
+def read_labelled(path: str) -> Tuple[List[str], List[int]]:
+    texts, labels = [], []
+    with open(path, newline="", encoding="utf-8") as fh:
+        for row in csv.DictReader(fh):
+            text = (row.get("text") or "").strip()
+            if text:
+                texts.append(text)
+                labels.append(int(row.get("label") or 0))
+    return texts, labels
+
+
+def train(texts: Sequence[str], labels: Sequence[int], epochs: int = 200, lr: float = 0.5, l2: float = 1e-6):
+    """Full-batch AdaGrad on the logistic loss, positives weighted to balance classes."""
+    y = np.asarray(labels, dtype=np.float64)
+    pos = max(1.0, y.sum())
+    sample_weight = np.where(y == 1, (len(y) - pos) / pos, 1.0)
+    sample_weight /= sample_weight.mean()
+    rows, cols, vals = _matrix(texts)
+
+    w = np.zeros(N_BUCKETS + 1, dtype=np.float64)
+    g2 = np.full(N_BUCKETS + 1, 1e-8)
+    for _ in range(epochs):
+        z = np.bincount(rows, weights=w[cols] * vals, minlength=len(y)) + w[N_BUCKETS]
+        err = (_sigmoid(z) - y) * sample_weight / len(y)
+        grad = np.empty_like(w)
+        grad[:N_BUCKETS] = np.bincount(cols, weights=err[rows] * vals, minlength=N_BUCKETS) + l2 * w[:N_BUCKETS]
+        grad[N_BUCKETS] = err.sum()
+        g2 += grad * grad
+        w -= lr * grad / np.sqrt(g2)
+    return w.astype(np.float32)
+
+
+def _metrics(predicted: Iterable[bool], labels: Sequence[int]) -> dict:
+    tp = fp = fn = tn = 0
+    for p, y in zip(predicted, labels):
+        if p and y:
+            tp += 1
+        elif p:
+            fp += 1
+        elif y:
+            fn += 1
+        else:
+            tn += 1
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {
+        "precision": round(precision, 4),
+        "recall": round(recall, 4),
+        "f1": round(f1, 4),
+        "tp": tp, "fp": fp, "fn": fn, "tn": tn,
+    }
+
+
+def evaluate(texts: Sequence[str], labels: Sequence[int], classifier: CrisisClassifier, threshold: float) -> dict:
+    """Keyword pass alone, classifier alone and both tiers combined."""
+    from core.crisis import check_keywords, normalize
+
+    keyword = [bool(check_keywords(t).matches) for t in texts]
+    scores = classifier.score_batch([normalize(t) for t in texts])
+    model = [bool(s >= threshold) for s in scores]
+    return {
+        "messages": len(texts),
+        "threshold": threshold,
+        "keywords": _metrics(keyword, labels),
+        "classifier": _metrics(model, labels),
+        "combined": _metrics((k or m for k, m in zip(keyword, model)), labels),
+    }
+
+
+def main():
+    from core.crisis import normalize
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_train = sub.add_parser("train", help="fit weights on a text,label CSV")
+    p_train.add_argument("csv")
+    p_train.add_argument("--out", default="crisis_model.npy")
+    p_train.add_argument("--epochs", type=int, default=200)
+    p_train.add_argument("--lr", type=float, default=0.5)
+    p_eval = sub.add_parser("eval", help="precision/recall on a text,label CSV")
+    p_eval.add_argument("csv")
+    p_eval.add_argument("--model", default="crisis_model.npy")
+    p_eval.add_argument("--threshold", type=float, default=0.5)
+    args = parser.parse_args()
+
+    if not _import_numpy():
+        raise SystemExit("numpy is required: pip install numpy")
+
+    texts, labels = read_labelled(args.csv)
+    if args.command == "train":
+        weights = train([normalize(t) for t in texts], labels, epochs=args.epochs, lr=args.lr)
+        np.save(args.out, weights)
+        print(f"Trained on {len(texts)} messages ({sum(labels)} crisis) -> {args.out}")
+    else:
+        print(json.dumps(evaluate(texts, labels, CrisisClassifier.load(args.model), args.threshold), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Sequence, Set, Tuple
+import re
+
+# One rule per original pattern. ``stems`` are the literal lead-ins the rule
+# can start with; the engine finds every stem (and relation keyword) in a
+# single pass over the text, then runs only the rules for the stems it hit,
+# anchored at the hit. Rules are kept per call site because the two used to
+# differ in small ways (e.g. a trailing \b) and outputs must not change.
+
+_WORD = r"([A-Z][a-zA-Z\-']{1,30})"
+_PLACE = r"([A-Z][A-Za-z\s]{1,40})"
+
+
+class Rule(NamedTuple):
+    id: str
+    stems: Tuple[str, ...]
+    pattern: str
+    flags: int = re.IGNORECASE
+    at_start: bool = False
+
+
+RULES: List[Rule] = [
+    # service/summary.py (long-term summary)
+    Rule("s.name.my_name", ("my name is",), r"\bmy name is " + _WORD),
+    Rule("s.name.call_me", ("call me",), r"\bcall me " + _WORD),
+    Rule("s.name.i_am", ("i am",), r"\bi am " + _WORD),
+    Rule("s.location.live", ("i live in",), r"\bI live in " + _PLACE),
+    Rule("s.location.from", ("i'm",), r"\bI'm from " + _PLACE),
+    Rule("s.goal.want", ("i want to",), r"\bI want to ([^.]{3,80})"),
+    Rule("s.like.like", ("i like",), r"\bI like ([^.]{3,60})"),
+    Rule("s.like.love", ("i love",), r"\bI love ([^.]{3,60})"),
+    Rule("s.like.enjoy", ("i enjoy",), r"\bI enjoy ([^.]{3,60})"),
+    Rule("s.concern.struggling", ("i'm",), r"\bI'm struggling with ([^.]{3,80})"),
+    Rule("s.concern.struggle", ("i struggle with",), r"\bI struggle with ([^.]{3,80})"),
+    Rule("s.concern.cant", ("i can't",), r"\bI can't ([^.]{3,80})"),
+    Rule("s.feeling.feel", ("i feel",), r"\bI feel ([^.]{3,80})"),
+    Rule("s.feeling.feeling", ("i'm",), r"\bI'm feeling ([^.]{3,80})"),
+    # core/gpt.py (recent-turn details)
+    Rule("g.name.my_name", ("my name is",), r"\bmy name is " + _WORD + r"\b"),
+    Rule("g.name.call_me", ("call me",), r"\bcall me " + _WORD + r"\b"),
+    Rule("g.name.i_am", ("i am",), r"\bi am " + _WORD + r"\b"),
+    Rule("g.name.im_start", ("i'm",), r"i'm " + _WORD + r"\b", at_start=True),
+    Rule("g.age", ("i'm", "i am"), r"\bI(?:'m| am) (\d{1,2})\b", flags=0),
+    Rule("g.location.live", ("i live in",), r"\bI live in " + _PLACE),
+    Rule("g.location.from", ("i'm",), r"\bI'm from " + _PLACE),
+    Rule("g.goal.want", ("i want to",), r"\bI want to ([^.]{3,80})"),
+    Rule("g.goal.my_goal", ("my goal is to",), r"\bmy goal is to ([^.]{3,80})"),
+    Rule("g.goal.hope", ("i hope to",), r"\bI hope to ([^.]{3,80})"),
+    Rule("g.pref.like", ("i like",), r"\bI like ([^.]{3,60})"),
+    Rule("g.pref.love", ("i love",), r"\bI love ([^.]{3,60})"),
+    Rule("g.pref.enjoy", ("i enjoy",), r"\bI enjoy ([^.]{3,60})"),
+    Rule("g.concern.feel", ("i feel",), r"\bI feel ([^.]{3,80})"),
+    Rule("g.concern.feeling", ("i'm",), r"\bI'm feeling ([^.]{3,80})"),
+    Rule("g.concern.been_feeling", ("i have been feeling",), r"\bI have been feeling ([^.]{3,80})"),
+    Rule("g.concern.state", ("i'm",), r"\bI'm (anxious|depressed|stressed|overwhelmed|tired)\b"),
+]
+
+SUMMARY_RELATIONS = frozenset({"mom","mother","dad","father","sister","brother","friend","friends","partner","wife","husband","girlfriend","boyfriend","son","daughter"})
+RECENT_RELATIONS = SUMMARY_RELATIONS | {"fiancé", "fiancee", "child"}
+
+
+class ScanResult(NamedTuple):
+    values: Dict[str, str]       # rule id -> value from the rule's first (leftmost) match
+    relations: FrozenSet[str]    # relation keywords appearing anywhere (substring match)
+
+
+def _trie_regex(words: Sequence[str]) -> str:
+    """Alternation of literals compiled as a prefix trie (greedy: longest wins).
+
+    Python's re tries plain alternatives one by one; factoring shared
+    prefixes keeps the per-position work small on long messages.
+    """
+    root: dict = {}
+    for word in words:
+        node = root
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        ends_here = "" in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if ends_here:
+            return "(?:" + body + ")?"
+        return body
+
+    return build(root)
+
+
+class FactEngine:
+    """Single-pass multi-pattern matcher for fact extraction."""
+
+    def __init__(self, rules: Sequence[Rule], keywords: Sequence[str]):
+        self._by_stem: Dict[str, list] = {}
+        for rule in rules:
+            compiled = re.compile(rule.pattern, rule.flags)
+            for stem in rule.stems:
+                self._by_stem.setdefault(stem, []).append((rule, compiled))
+
+        # The greedy trie matches "friends" over "friend" at the same
+        # position; shorter keywords that prefix the hit are added back.
+        self._implied = {
+            kw: frozenset(k for k in keywords if kw.startswith(k)) for kw in keywords
+        }
+        # Keywords are matched in a zero-width lookahead so overlapping hits
+        # ("girlfriend" then "friend") are all seen, as with `kw in text`.
+        scanner = (
+            "(?=(?P<rel>" + _trie_regex(keywords) + "))"
+            "|\\b(?P<stem>" + _trie_regex(list(self._by_stem)) + ")"
+        )
+        # Scanning lowercased text case-sensitively is several times faster
+        # than re.IGNORECASE; the fallback covers the rare characters whose
+        # lowercase form has a different length (positions would shift).
+        self._scanner = re.compile(scanner)
+        self._scanner_ci = re.compile(scanner, re.IGNORECASE)
+
+    def _hits(self, text: str):
+        lowered = text.lower()
+        if len(lowered) == len(text):
+            for hit in self._scanner.finditer(lowered):
+                yield hit.group("rel"), hit.group("stem"), hit.start()
+            return
+        for hit in self._scanner.finditer(lowered):
+            if hit.group("rel") is not None:
+                yield hit.group("rel"), None, hit.start()
+        for hit in self._scanner_ci.finditer(text):
+            if hit.group("stem") is not None:
+                yield None, hit.group("stem").lower(), hit.start()
+
+    def scan(self, text: str) -> ScanResult:
+        values: Dict[str, str] = {}
+        relations: Set[str] = set()
+        for rel, stem, pos in self._hits(text):
+            if rel is not None:
+                relations |= self._implied[rel]
+                continue
+            for rule, compiled in self._by_stem[stem]:
+                if rule.id in values or (rule.at_start and pos != 0):
+                    continue
+                m = compiled.match(text, pos)
+                if m:
+                    values[rule.id] = m.group(m.lastindex or 1)
+        return ScanResult(values, frozenset(relations))
+
+
+ENGINE = FactEngine(RULES, sorted(RECENT_RELATIONS))
+
+
+@lru_cache(maxsize=4096)
+def scan(text: str) -> ScanResult:
+    """Scan one message. Cached, so both call sites share one pass per message."""
+    return ENGINE.scan(text)
+
+
+def _strip(value: str) -> str:
+    return value.strip().rstrip('.')
+
+
+# --- service/summary.py: long-term facts ---
+
+_SUMMARY_FIELDS = (
+    ("names", ("s.name.my_name", "s.name.call_me", "s.name.i_am"), str.strip),
+    ("goals", ("s.goal.want",), _strip),
+    ("likes", ("s.like.like", "s.like.love", "s.like.enjoy"), _strip),
+    ("concerns", ("s.concern.struggling", "s.concern.struggle", "s.concern.cant"), _strip),
+    ("feelings", ("s.feeling.feel", "s.feeling.feeling"), _strip),
+)
+
+
+def summary_facts(text: str) -> Dict[str, set]:
+    """Facts mentioned in one user message (only non-empty categories)."""
+    facts: Dict[str, set] = {}
+    if not text:
+        return facts
+    result = scan(text)
+    values = result.values
+    for category, rule_ids, clean in _SUMMARY_FIELDS:
+        found = {clean(values[r]) for r in rule_ids if r in values}
+        if found:
+            facts[category] = found
+    locations = set()
+    for r in ("s.location.live", "s.location.from"):
+        if r in values:
+            loc = _strip(values[r])
+            if len(loc.split()) <= 5:
+                locations.add(loc)
+    if locations:
+        facts["locations"] = locations
+    relations = result.relations & SUMMARY_RELATIONS
+    if relations:
+        facts["relations"] = set(relations)
+    return facts
+
+
+# --- core/gpt.py: recent-turn details ---
+
+class Cues(NamedTuple):
+    name: Optional[str]
+    age: Optional[str]
+    location: Optional[str]
+    goals: FrozenSet[str]
+    preferences: FrozenSet[str]
+    concerns: FrozenSet[str]
+    relations: FrozenSet[str]
+
+
+@lru_cache(maxsize=4096)
+def message_cues(text: str) -> Cues:
+    """Recent-turn cues from one user message."""
+    values = scan(text).values
+
+    name = None
+    for r in ("g.name.my_name", "g.name.call_me", "g.name.i_am", "g.name.im_start"):
+        if r in values:
+            cand = values[r].strip().strip(",.;!?")
+            if len(cand) > 1:
+                name = cand[0].upper() + cand[1:]
+                break
+
+    age = values.get("g.age")
+
+    location = None
+    for r in ("g.location.live", "g.location.from"):
+        if r in values:
+            loc_val = _strip(values[r]).title()
+            if len(loc_val.split()) <= 5:
+                location = loc_val
+                break
+
+    def collect(rule_ids) -> FrozenSet[str]:
+        return frozenset(_strip(values[r]) for r in rule_ids if r in values)
+
+    return Cues(
+        name=name,
+        age=age,
+        location=location,
+        goals=collect(("g.goal.want", "g.goal.my_goal", "g.goal.hope")),
+        preferences=collect(("g.pref.like", "g.pref.love", "g.pref.enjoy")),
+        concerns=collect(("g.concern.feel", "g.concern.feeling", "g.concern.been_feeling", "g.concern.state")),
+        relations=scan(text).relations & RECENT_RELATIONS,
+    )
+
+
+def recent_details(history: List[dict], covered: str = "") -> Optional[str]:
+    """The "Key user details" system note built from the recent history window.
+
+    Details whose text already appears in ``covered`` (e.g. the long-term
+    summary sent in the same prompt) are left out.
+    """
+    name: Optional[str] = None
+    age: Optional[str] = None
+    location: Optional[str] = None
+    goals: Set[str] = set()
+    preferences: Set[str] = set()
+    concerns: Set[str] = set()
+    relations: Set[str] = set()
+
+    for m in history:
+        if not isinstance(m, dict):
+            continue
+        if m.get("role") != "user":
+            continue
+        text: str = m.get("content", "")
+        if not text:
+            continue
+
+        cues = message_cues(text)
+        name = name or cues.name
+        age = age or cues.age
+        location = location or cues.location
+        goals.update(cues.goals)
+        preferences.update(cues.preferences)
+        concerns.update(cues.concerns)
+        relations.update(cues.relations)
+
+    if covered:
+        known = covered.lower()
+
+        def novel(value: Optional[str]) -> bool:
+            return bool(value) and re.search(r"\b" + re.escape(value.lower()) + r"\b", known) is None
+
+        name = name if novel(name) else None
+        location = location if novel(location) else None
+        goals = set(filter(novel, goals))
+        preferences = set(filter(novel, preferences))
+        concerns = set(filter(novel, concerns))
+        relations = set(filter(novel, relations))
+
+    fact_chunks: List[str] = []
+    if name:
+        fact_chunks.append(f"Name: {name}")
+    if age:
+        fact_chunks.append(f"Age: {age}")
+    if location:
+        fact_chunks.append(f"Location: {location}")
+    if goals:
+        fact_chunks.append("Goals: " + "; ".join(sorted(goals))[:120])
+    if preferences:
+        fact_chunks.append("Likes: " + "; ".join(sorted(preferences))[:120])
+    if concerns:
+        fact_chunks.append("Concerns: " + "; ".join(sorted(concerns))[:160])
+    if relations:
+        fact_chunks.append("Mentioned relations: " + ", ".join(sorted(relations)))
+
+    if not fact_chunks:
+        return None
+    return "Key user details (recent turns): " + " | ".join(fact_chunks)
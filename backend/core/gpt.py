@@ -1,10 +1,20 @@
 from __future__ import annotations
 
-from typing import Optional, List, Dict, Set
 import re
-from openai import OpenAI
+import time
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, AsyncIterator, Optional
 from config import settings
-from service.cache import get_summary
+from core.facts import recent_details, summary_facts
+from core.llm_client import LLMEndpoint, ResilientLLM, endpoints_from_config, make_async_client
+from service.concurrency import stage_limit
+from service.metrics import record, span
+from service.providers import register
+from service.reply_cache import normalize_input, reply_cache, reply_key
+
+if TYPE_CHECKING:
+    # The SDK is imported on first use (it is the slowest import in the app)
+    from openai import AsyncOpenAI, OpenAI
 
 
 BASE_PERSONA = EXISTENTIAL_THERAPIST_PERSONA = (
@@ -100,29 +110,276 @@ PERSONA_MAP = {
     "reflection": REFLECTION_PERSONA,
 }
 
+# --- Canned replies ---
+
+EMPTY_INPUT_REPLY = "I’m here with you. What would you like to share?"
+UNCONFIGURED_REPLY = "I’m here with you. What feels heaviest right now?"
+EMPTY_COMPLETION_REPLY = "I’m here with you. Could you tell me a bit more about what you’re feeling?"
+CRISIS_FALLBACK_REPLY = (
+    "I’m really glad you told me. You’re not alone. "
+    "If you’re in immediate danger, please contact your local emergency number. "
+    "Would it help to share what feels most urgent right now?"
+)
+FALLBACK_REPLY = "I’m here with you. What feels heaviest at the moment?"
+
 # --- Client singleton ---
 
 _client: Optional[OpenAI] = None
+_async_client: Optional[AsyncOpenAI] = None
 
 def _get_client() -> OpenAI:
     """Return a shared OpenAI client configured for HuggingFace router."""
     global _client
     if _client is None:
+        import httpx
+        from openai import OpenAI
+
         _client = OpenAI(
             base_url=settings.HF_BASE_URL,
-            api_key=settings.HF_TOKEN or "missing"
+            api_key=settings.HF_TOKEN or "missing",
+            timeout=httpx.Timeout(settings.LLM_ATTEMPT_TIMEOUT_SECONDS, connect=settings.LLM_CONNECT_TIMEOUT_SECONDS),
+            max_retries=settings.LLM_MAX_ATTEMPTS - 1,
         )
     return _client
 
+def _get_async_client() -> AsyncOpenAI:
+    """Return a shared AsyncOpenAI client configured for HuggingFace router."""
+    global _async_client
+    if _async_client is None:
+        _async_client = make_async_client(settings.HF_BASE_URL, settings.HF_TOKEN)
+    return _async_client
+
+def _create_llm() -> ResilientLLM:
+    """Build the router/retrying client used by the async reply paths."""
+    if settings.LLM_ENDPOINTS:
+        endpoints = endpoints_from_config(settings.LLM_ENDPOINTS)
+    else:
+        endpoints = [LLMEndpoint("primary", _get_async_client(), settings.HF_MODEL)]
+        if settings.LLM_HEDGE_BASE_URL or settings.LLM_HEDGE_MODEL:
+            endpoints.append(LLMEndpoint(
+                "hedge",
+                make_async_client(
+                    settings.LLM_HEDGE_BASE_URL or settings.HF_BASE_URL,
+                    settings.LLM_HEDGE_TOKEN or settings.HF_TOKEN,
+                ),
+                settings.LLM_HEDGE_MODEL or settings.HF_MODEL,
+            ))
+    return ResilientLLM(
+        endpoints,
+        crisis_endpoint=settings.LLM_CRISIS_ENDPOINT or None,
+        max_attempts=settings.LLM_MAX_ATTEMPTS,
+        backoff=settings.LLM_BACKOFF_MS / 1000,
+        backoff_max=settings.LLM_BACKOFF_MAX_MS / 1000,
+        first_token_timeout=settings.LLM_FIRST_TOKEN_TIMEOUT_SECONDS,
+        hedge=settings.LLM_HEDGE,
+        hedge_after=settings.LLM_HEDGE_AFTER_MS / 1000,
+        explore=settings.LLM_ROUTER_EXPLORE,
+    )
+
+def _llm_missing() -> Optional[str]:
+    return None if settings.HF_TOKEN or settings.LLM_ENDPOINTS else "HF_TOKEN not set"
+
+llm_provider = register("llm", _create_llm, _llm_missing)
+
+def _get_llm() -> ResilientLLM:
+    """Return the shared router/retrying client (built on first use)."""
+    return llm_provider.get()
+
+def _llm_slot(crisis: bool):
+    """Crisis turns skip the LLM stage queue; everything else waits for a slot."""
+    return nullcontext() if crisis else stage_limit("llm")
+
 def gpt_status() -> dict:
-    """Quick check to verify GPT config."""
+    """Quick check to verify GPT config; routing stats live behind /admin/llm."""
     return {
-        "configured": bool(settings.HF_TOKEN),
+        "configured": llm_provider.configured,
+        "ready": llm_provider.peek() is not None,
         "base_url": settings.HF_BASE_URL,
         "model": settings.HF_MODEL,
     }
 
 
+def _select_persona(crisis: bool, is_first: bool, persona: str | None) -> str:
+    """Key into PERSONA_MAP / PROMPT_PREFIXES for this turn."""
+    if crisis:
+        return "crisis"
+    if persona and persona.lower() in PERSONA_MAP and persona.lower() not in ("crisis", "greeting"):
+        return persona.lower()
+    if is_first:
+        return "greeting"
+    return "base"
+
+
+def _should_probe(txt: str) -> bool:
+    stripped = txt.strip().lower()
+    if len(stripped.split()) <= 6: 
+        trigger_words = {"sad", "down", "low", "empty", "numb", "tired", "drained", "exhausted"}
+        if any(w in stripped for w in trigger_words):
+            return True
+    return False
+
+
+MEMORY_INSTRUCTION = (
+    " Always remember user-provided details (like their name, family, or preferences). "
+    "If the user asks about them later, recall them from the conversation history."
+)
+
+PROBE_INSTRUCTION = (
+    "If the user's message is very brief and only names a difficult feeling, respond with: (1) a precise empathic reflection, (2) ONE gentle, open question to understand context (e.g., what feels most heavy about it or when it started)."
+)
+
+# Persona + standing instructions, built once: the leading system message is
+# byte-identical on every call, so provider-side prefix caching can reuse it.
+# Everything that varies per turn goes after the conversation history.
+PROMPT_PREFIXES = {
+    key: {"role": "system", "content": persona + MEMORY_INSTRUCTION}
+    for key, persona in PERSONA_MAP.items()
+}
+
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Fast local token estimate: ~4 characters per token, more for non-ASCII text."""
+    return (len(text) + 3) // 4 + (len(text.encode("utf-8")) - len(text)) // 2
+
+
+def _message_tokens(message: dict) -> int:
+    return MESSAGE_OVERHEAD_TOKENS + estimate_tokens(message.get("content") or "")
+
+
+def _context_note(user_text: str, summary: str | None, extra: list[str], history: list[dict]) -> str | None:
+    """One system note with the long-term summary, recent details and turn hints, without repeats."""
+    blocks: list[str] = []
+    for block in ([summary] if summary else []) + extra:
+        if block and block not in blocks:
+            blocks.append(block)
+    recent = recent_details(history, covered="\n".join(blocks))
+    if recent:
+        blocks.append(recent)
+    if _should_probe(user_text):
+        blocks.append(PROBE_INSTRUCTION)
+    return "\n".join(blocks) or None
+
+
+def _build_messages(
+        user_text: str,
+        *,
+        crisis: bool = False,
+        is_first: bool = False,
+        history: list[dict] | None = None,
+        persona: str | None = None,
+        summary: str | None = None,
+        token_budget: int | None = None,
+    ) -> list[dict]:
+    """Assemble the chat completion messages.
+
+    Layout: stable persona prefix, as much recent history as fits in the
+    token budget (oldest turns dropped first), one context note (summary,
+    memory cues, probe hint), then the current user message. System
+    messages found in ``history`` are folded into the context note.
+    """
+
+    budget = token_budget or settings.PROMPT_TOKEN_BUDGET
+    prefix = PROMPT_PREFIXES[_select_persona(crisis, is_first, persona)]
+
+    turns = [m for m in history or [] if m.get("role") != "system"]
+    extra = [m.get("content", "") for m in history or [] if m.get("role") == "system"]
+
+    if turns and turns[-1].get("role") == "user" and turns[-1].get("content") == user_text:
+        current = turns.pop()
+    else:
+        current = {"role": "user", "content": user_text}
+
+    note = _context_note(user_text, summary, extra, turns + [current])
+    tail = ([{"role": "system", "content": note}] if note else []) + [current]
+
+    remaining = budget - _message_tokens(prefix) - sum(map(_message_tokens, tail))
+    kept = len(turns)
+    while kept and remaining - _message_tokens(turns[kept - 1]) >= 0:
+        remaining -= _message_tokens(turns[kept - 1])
+        kept -= 1
+    window = turns[kept:]
+    # Don't open the window on a reply whose question was trimmed away
+    while window and window[0].get("role") == "assistant":
+        window = window[1:]
+
+    return [prefix] + window + tail
+
+
+# --- Reply cache ---
+
+_SUMMARY_DETAILS = re.compile(r"(?:Names|Locations): ([^|]+)")
+
+
+def _cache_key(
+        user_text: str,
+        *,
+        crisis: bool,
+        is_first: bool,
+        history: list[dict] | None,
+        persona: str | None,
+    ) -> str | None:
+    """Reply cache key for greetings and short feeling words; None if the turn must go to the LLM.
+
+    Crisis turns are never cached.
+    """
+    if not settings.REPLY_CACHE_ENABLED or crisis:
+        return None
+    persona_key = _select_persona(crisis, is_first, persona)
+    if len(normalize_input(user_text).split()) > settings.REPLY_CACHE_MAX_WORDS:
+        return None
+    if persona_key != "greeting" and not _should_probe(user_text):
+        return None
+    return reply_key(user_text, persona_key, history)
+
+
+def _shareable(reply: str, history: list[dict] | None, summary: str | None) -> bool:
+    """False if the reply mentions a name or place this user shared; it must not reach other users."""
+    details: set[str] = set()
+    for m in history or []:
+        if m.get("role") == "user":
+            facts = summary_facts(m.get("content", ""))
+            details |= facts.get("names", set()) | facts.get("locations", set())
+    for match in _SUMMARY_DETAILS.finditer(summary or ""):
+        details.update(v.strip() for v in match.group(1).split(","))
+    text = reply.lower()
+    return not any(d and d.lower() in text for d in details)
+
+
+def _remember_reply(key: str | None, reply: str, started: float, history, summary) -> None:
+    if key is None:
+        return
+    reply_cache.record_latency(False, time.perf_counter() - started)
+    if reply and _shareable(reply, history, summary):
+        reply_cache.put(key, reply)
+
+
+def _cached_reply(key: str | None, started: float) -> str | None:
+    if key is None:
+        return None
+    reply = reply_cache.get(key)
+    if reply is not None:
+        reply_cache.record_latency(True, time.perf_counter() - started)
+    return reply
+
+
+def _reply_content(resp) -> str:
+    content = resp.choices[0].message.content
+    if not content:
+        return EMPTY_COMPLETION_REPLY
+    return content.strip()
+
+
+def _fallback_reply(crisis: bool) -> str:
+    import traceback
+    print("[GPT ERROR] Exception during completion:")
+    traceback.print_exc()
+
+    if crisis:
+        return CRISIS_FALLBACK_REPLY
+    return FALLBACK_REPLY
+
 
 def generate_reply(
         user_text: str,
@@ -131,195 +388,140 @@ def generate_reply(
         is_first: bool = False,
         history: list[dict] | None = None,
     persona: str | None = None,
+        summary: str | None = None,
     ) -> str:
     """Generate a therapist-style reply from user input with memory support."""
 
     if not user_text or not user_text.strip():
-        return "I’m here with you. What would you like to share?"
+        return EMPTY_INPUT_REPLY
 
+    if not llm_provider.configured:
+        return UNCONFIGURED_REPLY
 
-    if crisis:
-        system_prompt = CRISIS_PERSONA
-    elif persona and persona.lower() in PERSONA_MAP and persona.lower() not in ("crisis", "greeting"):
-        system_prompt = PERSONA_MAP[persona.lower()]
-    elif is_first:
-        system_prompt = GREETING_PERSONA
-    else:
-        system_prompt = BASE_PERSONA
-
-    if not settings.HF_TOKEN:
-        return "I’m here with you. What feels heaviest right now?"
+    started = time.perf_counter()
+    key = _cache_key(user_text, crisis=crisis, is_first=is_first, history=history, persona=persona)
+    cached = _cached_reply(key, started)
+    if cached is not None:
+        return cached
 
     try:
         client = _get_client()
+        with span("prompt"):
+            messages = _build_messages(
+                user_text, crisis=crisis, is_first=is_first, history=history, persona=persona, summary=summary
+            )
+        with span("llm"):
+            resp = client.chat.completions.create(
+                model=settings.HF_MODEL,
+                messages=messages,
+            )
+        reply = _reply_content(resp)
+        if reply != EMPTY_COMPLETION_REPLY:
+            _remember_reply(key, reply, started, history, summary)
+        return reply
 
-        def _should_probe(txt: str) -> bool:
-            stripped = txt.strip().lower()
-            if len(stripped.split()) <= 6: 
-                trigger_words = {"sad", "down", "low", "empty", "numb", "tired", "drained", "exhausted"}
-                if any(w in stripped for w in trigger_words):
-                    return True
-            return False
+    except Exception:
+        return _fallback_reply(crisis)
 
-        probe = _should_probe(user_text)
 
-        adaptive_tail = "" if not probe else (
-            " If the user's message is very brief and only names a difficult feeling, respond with: (1) a precise empathic reflection, (2) ONE gentle, open question to understand context (e.g., what feels most heavy about it or when it started)."
-        )
+async def generate_reply_async(
+        user_text: str,
+        *,
+        crisis: bool = False,
+        is_first: bool = False,
+        history: list[dict] | None = None,
+        persona: str | None = None,
+        summary: str | None = None,
+    ) -> str:
+    """Async variant of generate_reply; never blocks the event loop."""
 
-        base_system = system_prompt + (
-            " Always remember user-provided details (like their name, family, or preferences). "
-            "If the user asks about them later, recall them from the conversation history." + adaptive_tail
-        )
-        long_term = None
-        if history:
-            long_term = get_summary(history[0].get('session_id','')) if False else None 
-        # We cannot retrieve session_id from history items (not stored), so just grab summary via caller if needed.
-        # Provide hook: pass summary in history as synthetic system message with role 'system' and key 'summary'.
-        messages = [{"role": "system", "content": base_system}]
-
-        # --- Lightweight memory synthesis (rule-based) ---
-        if history:
-            # Extract structured cues from history
-            name: Optional[str] = None
-            age: Optional[str] = None
-            location: Optional[str] = None
-            goals: Set[str] = set()
-            preferences: Set[str] = set()
-            concerns: Set[str] = set()
-            relations: Set[str] = set()
-
-            # Precompile small regex patterns
-            name_patterns = [
-                re.compile(r"\bmy name is ([A-Z][a-zA-Z\-']{1,30})\b", re.IGNORECASE),
-                re.compile(r"\bcall me ([A-Z][a-zA-Z\-']{1,30})\b", re.IGNORECASE),
-                re.compile(r"\bi am ([A-Z][a-zA-Z\-']{1,30})\b", re.IGNORECASE),
-                re.compile(r"^i'm ([A-Z][a-zA-Z\-']{1,30})\b", re.IGNORECASE),
-            ]
-            age_pattern = re.compile(r"\bI(?:'m| am) (\d{1,2})\b")
-            location_patterns = [
-                re.compile(r"\bI live in ([A-Z][A-Za-z\s]{1,40})", re.IGNORECASE),
-                re.compile(r"\bI'm from ([A-Z][A-Za-z\s]{1,40})", re.IGNORECASE),
-            ]
-            goal_patterns = [
-                re.compile(r"\bI want to ([^.]{3,80})", re.IGNORECASE),
-                re.compile(r"\bmy goal is to ([^.]{3,80})", re.IGNORECASE),
-                re.compile(r"\bI hope to ([^.]{3,80})", re.IGNORECASE),
-            ]
-            pref_patterns = [
-                re.compile(r"\bI like ([^.]{3,60})", re.IGNORECASE),
-                re.compile(r"\bI love ([^.]{3,60})", re.IGNORECASE),
-                re.compile(r"\bI enjoy ([^.]{3,60})", re.IGNORECASE),
-            ]
-            concern_patterns = [
-                re.compile(r"\bI feel ([^.]{3,80})", re.IGNORECASE),
-                re.compile(r"\bI'm feeling ([^.]{3,80})", re.IGNORECASE),
-                re.compile(r"\bI have been feeling ([^.]{3,80})", re.IGNORECASE),
-                re.compile(r"\bI'm (anxious|depressed|stressed|overwhelmed|tired)\b", re.IGNORECASE),
-            ]
-            relation_keywords = {"mom","mother","dad","father","sister","brother","friend","friends","partner","wife","husband","girlfriend","boyfriend","fiancé","fiancee","child","son","daughter"}
-
-            for m in history:
-                if not isinstance(m, dict):
-                    continue
-                role = m.get("role")
-                if role != "user":
-                    continue
-                text: str = m.get("content", "")
-                if not text:
-                    continue
-    
-                if not name:
-                    for pat in name_patterns:
-                        nm = pat.search(text)
-                        if nm:
-                            cand = nm.group(1).strip().strip(",.;!?")
-                           
-                            if len(cand) > 1:
-                                name = cand[0].upper() + cand[1:]
-                                break
-         
-                if not age:
-                    ag = age_pattern.search(text)
-                    if ag:
-                        age_val = ag.group(1)
-                        if 4 <= len(age_val) <= 2:  
-                            pass
-                        else:
-                            age = age_val
-    
-                if not location:
-                    for pat in location_patterns:
-                        loc = pat.search(text)
-                        if loc:
-                            loc_val = loc.group(1).strip().rstrip('.').title()
-                            if len(loc_val.split()) <= 5:
-                                location = loc_val
-                                break
-      
-                for pat in goal_patterns:
-                    g = pat.search(text)
-                    if g:
-                        goals.add(g.group(1).strip().rstrip('.'))
-      
-                for pat in pref_patterns:
-                    p = pat.search(text)
-                    if p:
-                        preferences.add(p.group(1).strip().rstrip('.'))
-       
-                for pat in concern_patterns:
-                    c = pat.search(text)
-                    if c:
-                        concerns.add(c.group(c.lastindex or 1).strip().rstrip('.'))
-
-                lowered = text.lower()
-                for kw in relation_keywords:
-                    if kw in lowered:
-                        relations.add(kw)
-
-            fact_chunks: List[str] = []
-            if name:
-                fact_chunks.append(f"Name: {name}")
-            if age:
-                fact_chunks.append(f"Age: {age}")
-            if location:
-                fact_chunks.append(f"Location: {location}")
-            if goals:
-                fact_chunks.append("Goals: " + "; ".join(sorted(goals))[:120])
-            if preferences:
-                fact_chunks.append("Likes: " + "; ".join(sorted(preferences))[:120])
-            if concerns:
-                fact_chunks.append("Concerns: " + "; ".join(sorted(concerns))[:160])
-            if relations:
-                fact_chunks.append("Mentioned relations: " + ", ".join(sorted(relations)))
-
-            if fact_chunks:
-                memory_summary = "Key user details (recent turns): " + " | ".join(fact_chunks)
-                messages.append({"role": "system", "content": memory_summary})
-
-
-            messages.extend(history)
-
-       
-
-        resp = client.chat.completions.create(
-            model=settings.HF_MODEL,
-            messages=messages,
-        )
-        content = resp.choices[0].message.content
-        if not content:
-            return "I’m here with you. Could you tell me a bit more about what you’re feeling?"
-        return content.strip()
+    if not user_text or not user_text.strip():
+        return EMPTY_INPUT_REPLY
+
+    if not llm_provider.configured:
+        return UNCONFIGURED_REPLY
+
+    started = time.perf_counter()
+    key = _cache_key(user_text, crisis=crisis, is_first=is_first, history=history, persona=persona)
+    cached = _cached_reply(key, started)
+    if cached is not None:
+        return cached
+
+    try:
+        with span("prompt"):
+            messages = _build_messages(
+                user_text, crisis=crisis, is_first=is_first, history=history, persona=persona, summary=summary
+            )
+        with span("llm"):
+            async with _llm_slot(crisis):
+                content = await _get_llm().complete(messages, crisis=crisis)
+        if not content.strip():
+            return EMPTY_COMPLETION_REPLY
+        reply = content.strip()
+        _remember_reply(key, reply, started, history, summary)
+        return reply
 
     except Exception:
-        import traceback
-        print("[GPT ERROR] Exception during completion:")
-        traceback.print_exc()
-
-        if crisis:
-            return (
-                "I’m really glad you told me. You’re not alone. "
-                "If you’re in immediate danger, please contact your local emergency number. "
-                "Would it help to share what feels most urgent right now?"
+        return _fallback_reply(crisis)
+
+
+async def stream_reply(
+        user_text: str,
+        *,
+        crisis: bool = False,
+        is_first: bool = False,
+        history: list[dict] | None = None,
+        persona: str | None = None,
+        summary: str | None = None,
+    ) -> AsyncIterator[str]:
+    """Stream a reply as text deltas using the provider's stream=True mode.
+
+    Canned and fallback replies are yielded as a single chunk. If the
+    provider fails after some tokens were already sent, the partial reply
+    is kept (it is already on the user's screen) and the stream just ends.
+    """
+
+    if not user_text or not user_text.strip():
+        yield EMPTY_INPUT_REPLY
+        return
+
+    if not llm_provider.configured:
+        yield UNCONFIGURED_REPLY
+        return
+
+    started = time.perf_counter()
+    key = _cache_key(user_text, crisis=crisis, is_first=is_first, history=history, persona=persona)
+    cached = _cached_reply(key, started)
+    if cached is not None:
+        yield cached
+        return
+
+    emitted = False
+    parts: list[str] = []
+    try:
+        with span("prompt"):
+            messages = _build_messages(
+                user_text, crisis=crisis, is_first=is_first, history=history, persona=persona, summary=summary
             )
-        return "I’m here with you. What feels heaviest at the moment?"
\ No newline at end of file
+        llm_started = time.perf_counter()
+        async with _llm_slot(crisis):
+            async for delta in _get_llm().stream(messages, crisis=crisis):
+                if not emitted:
+                    delta = delta.lstrip()
+                    if not delta:
+                        continue
+                    record("llm_first_token", time.perf_counter() - llm_started)
+                emitted = True
+                parts.append(delta)
+                yield delta
+
+        record("llm", time.perf_counter() - llm_started)
+        if not emitted:
+            yield EMPTY_COMPLETION_REPLY
+        else:
+            _remember_reply(key, "".join(parts).strip(), started, history, summary)
+
+    except Exception:
+        fallback = _fallback_reply(crisis)
+        if not emitted:
+            yield fallback
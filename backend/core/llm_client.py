@@ -0,0 +1,521 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import TYPE_CHECKING, AsyncIterator, List, Optional, Sequence
+
+import httpx
+
+from config import settings
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+
+class LLMUnavailable(Exception):
+    """No endpoint could serve the request (circuit open or retries exhausted)."""
+
+
+class LLMOverloaded(LLMUnavailable):
+    """Every eligible endpoint is at its in-flight limit; the request was shed."""
+
+
+def _retryable(exc: BaseException) -> bool:
+    """Timeouts, dropped connections, 429 and 5xx are worth another attempt; other 4xx are not."""
+    import openai
+
+    if isinstance(exc, (asyncio.TimeoutError, httpx.TransportError, openai.APIConnectionError)):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code == 429 or exc.status_code >= 500
+    return False
+
+
+def make_http_client() -> httpx.AsyncClient:
+    """Pooled HTTP client shared by every request to one endpoint."""
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.LLM_POOL_SIZE,
+            max_keepalive_connections=settings.LLM_POOL_SIZE,
+            keepalive_expiry=settings.LLM_KEEPALIVE_SECONDS,
+        ),
+        timeout=httpx.Timeout(
+            connect=settings.LLM_CONNECT_TIMEOUT_SECONDS,
+            read=settings.LLM_READ_TIMEOUT_SECONDS,
+            write=settings.LLM_CONNECT_TIMEOUT_SECONDS,
+            pool=settings.LLM_CONNECT_TIMEOUT_SECONDS,
+        ),
+    )
+
+
+def make_async_client(base_url: str, api_key: str) -> "AsyncOpenAI":
+    from openai import AsyncOpenAI
+
+    # Retries are ours (per-attempt timeouts, breaker), so the SDK's are off
+    return AsyncOpenAI(base_url=base_url, api_key=api_key or "missing", max_retries=0, http_client=make_http_client())
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open -> half-open (one trial call) -> closed.
+
+    While open, calls are refused immediately instead of waiting on a
+    provider that is known to be failing.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        """Whether ``allow()`` could currently succeed (no side effects)."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open":
+                return time.monotonic() - self.opened_at >= self.reset_seconds
+            return not self._trial
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = "half_open"
+                self._trial = False
+            if self.state == "half_open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._trial = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._trial = False
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.trips += 1
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Give back a half-open trial that ended with no verdict (cancelled, lost a hedge race)."""
+        with self._lock:
+            self._trial = False
+
+
+class LLMEndpoint:
+    """One OpenAI-compatible endpoint + model with its breaker and routing signals.
+
+    Latency and error rate are tracked as EWMAs (``alpha``); first-token
+    latency (streams) and full-response latency (plain completions) are
+    kept apart since they differ by the length of the reply.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            client,
+            model: str,
+            breaker: Optional[CircuitBreaker] = None,
+            *,
+            max_inflight: int = 0,
+            reserved: bool = False,
+            alpha: float = 0.2,
+        ):
+        self.name = name
+        self.client = client
+        self.model = model
+        self.breaker = breaker or CircuitBreaker(settings.LLM_BREAKER_FAILURES, settings.LLM_BREAKER_RESET_SECONDS)
+        self.max_inflight = max_inflight
+        self.reserved = reserved
+        self.alpha = alpha
+        self.first_token = deque(maxlen=200)
+        self.ewma = {"stream": None, "complete": None}
+        self.error_rate = 0.0
+        self.inflight = 0
+        self.requests = 0
+        self.errors = 0
+
+    def first_token_p95(self) -> Optional[float]:
+        samples = sorted(self.first_token)
+        if len(samples) < 20:
+            return None
+        return samples[int(0.95 * (len(samples) - 1))]
+
+    def saturated(self) -> bool:
+        return bool(self.max_inflight) and self.inflight >= self.max_inflight
+
+    def observe(self, kind: str, latency: Optional[float], error: bool = False) -> None:
+        """Fold one attempt into the EWMAs; a failed attempt counts with the time it wasted."""
+        if latency is not None:
+            prev = self.ewma[kind]
+            self.ewma[kind] = latency if prev is None else prev + self.alpha * (latency - prev)
+        self.error_rate += self.alpha * ((1.0 if error else 0.0) - self.error_rate)
+
+    def expected_latency(self, kind: str) -> Optional[float]:
+        value = self.ewma[kind]
+        if value is None:
+            other = self.ewma["complete" if kind == "stream" else "stream"]
+            return other
+        return value
+
+    async def complete(self, messages: List[dict]) -> str:
+        self.inflight += 1
+        try:
+            resp = await asyncio.wait_for(
+                self.client.chat.completions.create(model=self.model, messages=messages),
+                settings.LLM_ATTEMPT_TIMEOUT_SECONDS,
+            )
+        finally:
+            self.inflight -= 1
+        content = resp.choices[0].message.content if resp.choices else None
+        return content or ""
+
+    async def deltas(self, messages: List[dict]) -> AsyncIterator[str]:
+        """Non-empty text deltas of a streamed completion."""
+        self.inflight += 1
+        try:
+            stream = await self.client.chat.completions.create(model=self.model, messages=messages, stream=True)
+            try:
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        yield delta
+            finally:
+                close = getattr(stream, "close", None)
+                if close is not None:
+                    await close()
+        finally:
+            self.inflight -= 1
+
+    def stats(self) -> dict:
+        p95 = self.first_token_p95()
+
+        def ms(value: Optional[float]) -> Optional[float]:
+            return round(value * 1000, 1) if value is not None else None
+
+        return {
+            "model": self.model,
+            "breaker": self.breaker.state,
+            "breaker_trips": self.breaker.trips,
+            "requests": self.requests,
+            "errors": self.errors,
+            "inflight": self.inflight,
+            "max_inflight": self.max_inflight or None,
+            "reserved": self.reserved,
+            "ewma_first_token_ms": ms(self.ewma["stream"]),
+            "ewma_complete_ms": ms(self.ewma["complete"]),
+            "error_rate": round(self.error_rate, 4),
+            "first_token_p95_ms": ms(p95),
+        }
+
+
+class ResilientLLM:
+    """Routes requests across endpoints with retries, breakers, load shedding and hedging.
+
+    Each attempt goes to the eligible endpoint with the lowest expected
+    latency: its EWMA latency, inflated by its EWMA error rate and by how
+    full it is. Endpoints whose breaker is open or that are at
+    ``max_inflight`` are skipped; if every one is full the request is shed
+    (LLMOverloaded) rather than queued. A small ``explore`` share of
+    traffic goes to another endpoint so recovered ones are noticed.
+
+    Crisis turns try ``crisis_endpoint`` first, may use ``reserved``
+    endpoints and are never shed. Retries (exponential backoff, up to
+    ``max_attempts``) prefer an endpoint that has not failed this request.
+    Streams are only retried before the first token; if that is later
+    than ``hedge_after`` (default: the endpoint's rolling p95) a duplicate
+    goes to the next-best endpoint and whichever answers first is kept.
+    """
+
+    def __init__(
+            self,
+            endpoints: Sequence[LLMEndpoint],
+            *,
+            crisis_endpoint: Optional[str] = None,
+            max_attempts: int = 3,
+            backoff: float = 0.2,
+            backoff_max: float = 2.0,
+            first_token_timeout: float = 8.0,
+            hedge: bool = True,
+            hedge_after: float = 0.0,
+            explore: float = 0.0,
+            prior_latency: float = 1.0,
+        ):
+        self.endpoints = list(endpoints)
+        self.crisis_endpoint = crisis_endpoint
+        self.max_attempts = max(1, max_attempts)
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.first_token_timeout = first_token_timeout
+        self.hedge = hedge and len(self.endpoints) > 1
+        self.hedge_after = hedge_after
+        self.explore = explore
+        self.prior_latency = prior_latency
+        self.decisions = deque(maxlen=100)
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.rejected = 0
+        self.shed = 0
+        self._rng = random.Random()
+
+    def _score(self, endpoint: LLMEndpoint, kind: str) -> float:
+        latency = endpoint.expected_latency(kind)
+        if latency is None:
+            latency = self.prior_latency
+        load = endpoint.inflight / endpoint.max_inflight if endpoint.max_inflight else 0.0
+        return latency * (1.0 + 4.0 * endpoint.error_rate) * (1.0 + load)
+
+    def _ranked(self, kind: str, crisis: bool, exclude: Sequence[LLMEndpoint] = ()) -> List[LLMEndpoint]:
+        candidates = [
+            ep for ep in self.endpoints
+            if ep not in exclude and ep.breaker.available() and (crisis or not ep.reserved)
+        ]
+        if not crisis:
+            open_slots = [ep for ep in candidates if not ep.saturated()]
+            if candidates and not open_slots:
+                raise LLMOverloaded("all LLM endpoints are at capacity")
+            candidates = open_slots
+        ranked = sorted(candidates, key=lambda ep: self._score(ep, kind))
+        if crisis and self.crisis_endpoint:
+            ranked.sort(key=lambda ep: ep.name != self.crisis_endpoint)
+        elif len(ranked) > 1 and self._rng.random() < self.explore:
+            i = self._rng.randrange(1, len(ranked))
+            ranked[0], ranked[i] = ranked[i], ranked[0]
+        return ranked
+
+    def _pick(self, kind: str, crisis: bool, failed: Sequence[LLMEndpoint]) -> Optional[LLMEndpoint]:
+        try:
+            ranked = self._ranked(kind, crisis, failed) or self._ranked(kind, crisis)
+        except LLMOverloaded:
+            self.shed += 1
+            self._decide(None, kind, crisis, "shed")
+            raise
+        for endpoint in ranked:
+            if endpoint.breaker.allow():
+                self._decide(endpoint, kind, crisis, "retry" if failed else "route")
+                return endpoint
+        self.rejected += 1
+        self._decide(None, kind, crisis, "rejected")
+        return None
+
+    def _decide(self, endpoint: Optional[LLMEndpoint], kind: str, crisis: bool, reason: str) -> None:
+        self.decisions.append({
+            "at": round(time.time(), 3),
+            "endpoint": endpoint.name if endpoint else None,
+            "kind": kind,
+            "crisis": crisis,
+            "reason": reason,
+            "scores_ms": {ep.name: round(self._score(ep, kind) * 1000, 1) for ep in self.endpoints},
+        })
+
+    def _hedge_delay(self, endpoint: LLMEndpoint) -> Optional[float]:
+        if not self.hedge:
+            return None
+        if self.hedge_after > 0:
+            return self.hedge_after
+        p95 = endpoint.first_token_p95()
+        return p95 if p95 is not None else self.first_token_timeout / 2
+
+    async def _sleep_backoff(self, attempt: int) -> None:
+        self.retries += 1
+        # Full jitter so retries from many sessions don't arrive in lockstep
+        await asyncio.sleep(random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt)))
+
+    def _failed(self, endpoint: LLMEndpoint, kind: str, exc: BaseException, latency: Optional[float]) -> None:
+        endpoint.errors += 1
+        if _retryable(exc):
+            endpoint.breaker.record_failure()
+            endpoint.observe(kind, latency, error=True)
+        else:
+            # The endpoint answered; the request itself was bad
+            endpoint.breaker.record_success()
+
+    async def complete(self, messages: List[dict], *, crisis: bool = False) -> str:
+        last_error: Optional[BaseException] = None
+        failed: List[LLMEndpoint] = []
+        for attempt in range(self.max_attempts):
+            if attempt:
+                await self._sleep_backoff(attempt - 1)
+            endpoint = self._pick("complete", crisis, failed)
+            if endpoint is None:
+                break
+            endpoint.requests += 1
+            started = time.perf_counter()
+            try:
+                reply = await endpoint.complete(messages)
+            except Exception as e:
+                self._failed(endpoint, "complete", e, time.perf_counter() - started)
+                last_error = e
+                if not _retryable(e):
+                    raise
+                failed.append(endpoint)
+                continue
+            except BaseException:
+                # Cancelled: no verdict, but a half-open breaker must get its trial back
+                endpoint.breaker.release()
+                raise
+            endpoint.breaker.record_success()
+            endpoint.observe("complete", time.perf_counter() - started)
+            return reply
+        raise LLMUnavailable(str(last_error or "all LLM endpoints are unavailable"))
+
+    async def _first(self, endpoint: LLMEndpoint, messages: List[dict]):
+        """Open a stream and wait for its first delta; returns (endpoint, delta, iterator)."""
+        endpoint.requests += 1
+        started = time.perf_counter()
+        deltas = endpoint.deltas(messages)
+        try:
+            delta = await deltas.__anext__()
+        except BaseException:
+            await deltas.aclose()
+            raise
+        latency = time.perf_counter() - started
+        endpoint.first_token.append(latency)
+        endpoint.observe("stream", latency)
+        return endpoint, delta, deltas
+
+    async def _race(self, endpoint: LLMEndpoint, messages: List[dict], crisis: bool):
+        """First delta from ``endpoint``, hedged to the next-best endpoint if it is slow."""
+        started = time.monotonic()
+        tasks = {asyncio.create_task(self._first(endpoint, messages)): endpoint}
+        deadline = started + self.first_token_timeout
+        error: Optional[BaseException] = None
+        winner = None
+        pending = set(tasks)
+        try:
+            delay = self._hedge_delay(endpoint)
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=min(delay, self.first_token_timeout))
+                if not done:
+                    try:
+                        backups = self._ranked("stream", crisis, exclude=[endpoint])
+                    except LLMOverloaded:
+                        backups = []
+                    backup = next((ep for ep in backups if ep.breaker.allow()), None)
+                    if backup is not None:
+                        self.hedges += 1
+                        self._decide(backup, "stream", crisis, "hedge")
+                        task = asyncio.create_task(self._first(backup, messages))
+                        tasks[task] = backup
+                        pending.add(task)
+
+            while pending and winner is None:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    # Stalled before the first token: counts against the endpoint
+                    for task in pending:
+                        self._failed(tasks[task], "stream", asyncio.TimeoutError(), self.first_token_timeout)
+                    break
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        self._failed(tasks[task], "stream", error, time.monotonic() - started)
+                    elif winner is None:
+                        winner = task.result()
+                    else:
+                        tasks[task].breaker.release()
+                        await task.result()[2].aclose()
+        finally:
+            for task in pending:
+                task.cancel()
+                # Cancelled before any verdict: a half-open breaker gets its trial back
+                tasks[task].breaker.release()
+                # The loser's latency is at least this long
+                if winner is not None:
+                    tasks[task].observe("stream", time.monotonic() - started)
+
+        if winner is None:
+            raise error or asyncio.TimeoutError()
+        if winner[0] is not endpoint:
+            self.hedge_wins += 1
+        return winner
+
+    async def stream(self, messages: List[dict], *, crisis: bool = False) -> AsyncIterator[str]:
+        last_error: Optional[BaseException] = None
+        failed: List[LLMEndpoint] = []
+        for attempt in range(self.max_attempts):
+            if attempt:
+                await self._sleep_backoff(attempt - 1)
+            endpoint = self._pick("stream", crisis, failed)
+            if endpoint is None:
+                break
+            try:
+                source, first, deltas = await self._race(endpoint, messages, crisis)
+            except Exception as e:
+                last_error = e
+                if not _retryable(e):
+                    raise
+                failed.append(endpoint)
+                continue
+
+            try:
+                yield first
+                async for delta in deltas:
+                    yield delta
+            except Exception:
+                source.errors += 1
+                source.breaker.record_failure()
+                raise
+            except BaseException:
+                # Abandoned by the caller (disconnect, cancellation): no verdict
+                source.breaker.release()
+                raise
+            finally:
+                await deltas.aclose()
+            source.breaker.record_success()
+            return
+        raise LLMUnavailable(str(last_error or "all LLM endpoints are unavailable"))
+
+    def stats(self) -> dict:
+        return {
+            "endpoints": {ep.name: ep.stats() for ep in self.endpoints},
+            "crisis_endpoint": self.crisis_endpoint,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "rejected": self.rejected,
+            "shed": self.shed,
+        }
+
+
+def endpoints_from_config(spec: str) -> List[LLMEndpoint]:
+    """Endpoints from a JSON list (LLM_ENDPOINTS), e.g.
+
+    [{"name": "fireworks", "base_url": "https://router.huggingface.co/v1",
+      "model": "openai/gpt-oss-20b:fireworks-ai", "api_key_env": "HF_TOKEN",
+      "max_inflight": 32, "reserved": false}]
+
+    ``api_key_env`` names the environment variable holding the key
+    (default HF_TOKEN) so secrets stay out of the list itself.
+    """
+    endpoints = []
+    for i, item in enumerate(json.loads(spec)):
+        endpoints.append(LLMEndpoint(
+            item.get("name") or f"endpoint{i}",
+            make_async_client(item["base_url"], os.getenv(item.get("api_key_env", "HF_TOKEN"), "")),
+            item["model"],
+            max_inflight=int(item.get("max_inflight", 0)),
+            reserved=bool(item.get("reserved", False)),
+            alpha=settings.LLM_ROUTER_EWMA_ALPHA,
+        ))
+    return endpoints
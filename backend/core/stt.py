@@ -1,48 +1,415 @@
 # backend/core/stt.py
 
-import os
-import tempfile
-import speech_recognition as sr
+import asyncio
+import io
+import json
+import subprocess
+import time
+from abc import ABC, abstractmethod
+from typing import BinaryIO, Callable, Iterator, Optional
+
 from fastapi import UploadFile
-from pydub import AudioSegment
+from config import settings
+from service.concurrency import run_blocking
+from service.metrics import span
+from service.providers import register
 
+# Format handed to the recognizer: mono, 16kHz, 16-bit PCM
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
 
-def transcribe_audio(file: UploadFile) -> str | None:
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+def read_upload(fileobj: BinaryIO, limit: int = 0) -> bytes:
+    """Read an upload into memory, refusing anything over ``limit`` bytes (0 = no cap)."""
+    if not limit:
+        return fileobj.read()
+    data = fileobj.read(limit + 1)
+    if len(data) > limit:
+        raise UploadTooLarge(f"upload exceeds {limit} bytes")
+    return data
+
+
+def _audio_segment():
+    # Imported on first decode: pydub probes the system for ffmpeg at import
+    from pydub import AudioSegment
+
+    return AudioSegment
+
+
+def decode_pcm(data: bytes) -> bytes:
     """
-    Convert uploaded audio file into text using Google STT (via speech_recognition).
-    Returns recognized text or None if transcription fails.
+    Decode any ffmpeg-readable audio to raw mono 16kHz s16le PCM, in memory.
+    ffmpeg reads stdin and writes stdout, so nothing touches the filesystem
+    and resampling happens in the same pass as decoding. Containers ffmpeg
+    cannot demux from a pipe (or a missing ffmpeg for plain WAV) fall back
+    to pydub on an in-memory buffer.
     """
+    cmd = [
+        _audio_segment().converter, "-hide_banner", "-loglevel", "error",
+        "-i", "pipe:0",
+        "-f", "s16le", "-acodec", "pcm_s16le", "-ac", "1", "-ar", str(SAMPLE_RATE),
+        "pipe:1",
+    ]
+    try:
+        proc = subprocess.run(cmd, input=data, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+        if proc.stdout:
+            return proc.stdout
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"[STT] ffmpeg pipe decode failed, falling back to pydub: {type(e).__name__}")
 
-    recognizer = sr.Recognizer()
-    wav_path = None
+    # pydub reads WAV natively; other formats go through ffprobe/ffmpeg
+    fmt = "wav" if data[:4] == b"RIFF" and data[8:12] == b"WAVE" else None
+    audio = _audio_segment().from_file(io.BytesIO(data), format=fmt)
+    audio = audio.set_frame_rate(SAMPLE_RATE).set_channels(1).set_sample_width(SAMPLE_WIDTH)
+    return audio.raw_data
 
-    try:
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_wav:
-            # Force standard format: mono, 16kHz, PCM
-            audio = AudioSegment.from_file(file.file)
-            audio = audio.set_frame_rate(16000).set_channels(1).set_sample_width(2)
-            audio.export(tmp_wav.name, format="wav")
-            wav_path = tmp_wav.name
-
- 
-        with sr.AudioFile(wav_path) as source:
-            audio_data = recognizer.record(source)
 
-        try:
-            text = recognizer.recognize_google(audio_data)
-            return text
-        except sr.UnknownValueError:
-            print("[STT] Google could not understand audio")
+def pcm_chunks(pcm: bytes, seconds: float) -> Iterator[memoryview]:
+    """Split PCM into windows of ``seconds`` (the whole buffer if 0), without copying."""
+    view = memoryview(pcm)
+    step = int(seconds * SAMPLE_RATE) * SAMPLE_WIDTH if seconds else len(view)
+    for start in range(0, len(view), step or 1):
+        yield view[start:start + step]
+
+
+def pcm_seconds(pcm: bytes) -> float:
+    return len(pcm) / (SAMPLE_RATE * SAMPLE_WIDTH)
+
+
+class STTStream:
+    """
+    Incremental recognition of one utterance, fed PCM as it arrives.
+    This default suits providers without streaming support: it buffers
+    the audio, reports no partials and recognizes everything in finish().
+    """
+
+    def __init__(self, provider: "STTProvider"):
+        self._provider = provider
+        self._buffer = bytearray()
+
+    def feed(self, pcm: bytes) -> Optional[str]:
+        """Add audio; returns the updated partial transcript, or None if unchanged."""
+        self._buffer += pcm
+        return None
+
+    def finish(self) -> Optional[str]:
+        """Final transcript of everything fed so far."""
+        return self._provider.transcribe(bytes(self._buffer))
+
+    async def feed_async(self, pcm: bytes) -> Optional[str]:
+        return await run_blocking("stt", self.feed, pcm)
+
+    async def finish_async(self) -> Optional[str]:
+        return await run_blocking("stt", self.finish)
+
+
+class STTProvider(ABC):
+    name: str = ""
+
+    @abstractmethod
+    def transcribe(self, pcm: bytes) -> Optional[str]:
+        """Transcript of a complete mono 16kHz s16le clip, or None."""
+
+    def stream(self) -> STTStream:
+        return STTStream(self)
+
+
+class GoogleSTT(STTProvider):
+    """Google Web Speech via speech_recognition (remote, whole clips only)."""
+
+    name = "google"
+
+    def __init__(self):
+        import speech_recognition
+
+        self.sr = speech_recognition
+
+    def transcribe(self, pcm: bytes) -> Optional[str]:
+        # One request per chunk; chunks with no speech are skipped
+        sr = self.sr
+        recognizer = sr.Recognizer()
+        parts = []
+        for chunk in pcm_chunks(pcm, settings.STT_CHUNK_SECONDS):
+            frame = pcm if len(chunk) == len(pcm) else bytes(chunk)
+            audio_data = sr.AudioData(frame, SAMPLE_RATE, SAMPLE_WIDTH)
+            try:
+                parts.append(recognizer.recognize_google(audio_data))
+            except sr.UnknownValueError:
+                print("[STT] Google could not understand audio")
+            except sr.RequestError as e:
+                print(f"[STT] Could not request results from Google; {e}")
+                return None
+        return " ".join(parts) if parts else None
+
+
+class _VoskStream(STTStream):
+    def __init__(self, provider: "VoskSTT"):
+        super().__init__(provider)
+        from vosk import KaldiRecognizer
+
+        self._recognizer = KaldiRecognizer(provider.model, SAMPLE_RATE)
+        self._segments: list = []
+        self._last = ""
+
+    def feed(self, pcm: bytes) -> Optional[str]:
+        if self._recognizer.AcceptWaveform(bytes(pcm)):
+            text = json.loads(self._recognizer.Result()).get("text", "")
+            if text:
+                self._segments.append(text)
+            partial = ""
+        else:
+            partial = json.loads(self._recognizer.PartialResult()).get("partial", "")
+        current = " ".join(self._segments + ([partial] if partial else []))
+        if current == self._last:
             return None
-        except sr.RequestError as e:
-            print(f"[STT] Could not request results from Google; {e}")
+        self._last = current
+        return current
+
+    def finish(self) -> Optional[str]:
+        text = json.loads(self._recognizer.FinalResult()).get("text", "")
+        if text:
+            self._segments.append(text)
+        return " ".join(self._segments) or None
+
+
+class VoskSTT(STTProvider):
+    """Offline, CPU-only recognition with Vosk (``pip install vosk`` plus a model directory)."""
+
+    name = "vosk"
+
+    def __init__(self, model_path: str):
+        from vosk import Model, SetLogLevel
+
+        SetLogLevel(-1)
+        self.model = Model(model_path)
+
+    def stream(self) -> STTStream:
+        return _VoskStream(self)
+
+    def transcribe(self, pcm: bytes) -> Optional[str]:
+        stream = self.stream()
+        for chunk in pcm_chunks(pcm, 0.5):
+            stream.feed(chunk)
+        return stream.finish()
+
+
+class _StubStream(STTStream):
+    def __init__(self, provider: "StubSTT"):
+        super().__init__(provider)
+        self._seconds = 0.0
+        self._shown = 0
+
+    def feed(self, pcm: bytes) -> Optional[str]:
+        stub: StubSTT = self._provider
+        seconds = pcm_seconds(pcm)
+        time.sleep(seconds * stub.realtime_factor)
+        self._seconds += seconds
+        # Reveal roughly one word per WORD_SECONDS of audio
+        shown = min(len(stub.words), int(self._seconds / stub.WORD_SECONDS))
+        if shown == self._shown:
             return None
+        self._shown = shown
+        return " ".join(stub.words[:shown])
+
+    def finish(self) -> Optional[str]:
+        stub: StubSTT = self._provider
+        time.sleep(stub.latency)
+        return stub.transcript if self._seconds else None
+
+
+class StubSTT(STTProvider):
+    """
+    Offline stand-in for tests and load runs: always hears ``transcript``.
+    Processing costs ``realtime_factor`` seconds per second of audio, plus
+    a fixed ``latency`` per recognition (for streams, only at finish).
+    """
+
+    name = "stub"
+    WORD_SECONDS = 0.35
+
+    def __init__(self, transcript: str, latency: float = 0.0, realtime_factor: float = 0.0):
+        self.transcript = transcript
+        self.words = transcript.split()
+        self.latency = latency
+        self.realtime_factor = realtime_factor
+
+    def stream(self) -> STTStream:
+        return _StubStream(self)
+
+    def transcribe(self, pcm: bytes) -> Optional[str]:
+        time.sleep(self.latency + pcm_seconds(pcm) * self.realtime_factor)
+        return self.transcript if pcm else None
+
+
+def _create_provider() -> STTProvider:
+    if settings.STT_PROVIDER == "vosk":
+        provider = VoskSTT(settings.STT_VOSK_MODEL)
+    elif settings.STT_PROVIDER == "stub":
+        provider = StubSTT(settings.STT_STUB_TRANSCRIPT)
+    else:
+        provider = GoogleSTT()
+    print(f"[STT] Using {provider.name} provider")
+    return provider
+
+
+stt_provider = register("stt", _create_provider)
+
+
+def get_provider() -> STTProvider:
+    """The configured provider (``STT_PROVIDER``), created on first use."""
+    return stt_provider.get()
+
+
+class PCMPassthrough:
+    """Decoder interface for input that already is mono 16kHz s16le PCM."""
+
+    def __init__(self, max_chunks: int = 32):
+        # Bounded, so write() waits when recognition falls behind
+        self._queue: asyncio.Queue = asyncio.Queue(max_chunks)
+        self._eof = False
+
+    async def start(self) -> None:
+        pass
+
+    async def write(self, data: bytes) -> None:
+        await self._queue.put(data)
+
+    async def end(self) -> None:
+        await self._queue.put(b"")
+
+    async def read(self) -> bytes:
+        """Next block of PCM; b"" once the input has ended."""
+        if self._eof:
+            return b""
+        data = await self._queue.get()
+        self._eof = not data
+        return data
+
+    async def close(self) -> None:
+        pass
+
+
+class FfmpegDecoder:
+    """
+    Incremental decode of a compressed stream (e.g. WebM/Opus chunks from
+    MediaRecorder) through one long-lived ffmpeg process per utterance.
+    Pipe buffers are bounded, so a slow reader stalls write().
+    """
+
+    READ_SIZE = int(0.1 * SAMPLE_RATE) * SAMPLE_WIDTH  # 100ms of PCM
+
+    def __init__(self, input_format: Optional[str] = None):
+        self._input_format = input_format
+        self._proc: Optional[asyncio.subprocess.Process] = None
+
+    async def start(self) -> None:
+        demuxer = ["-f", self._input_format] if self._input_format else []
+        self._proc = await asyncio.create_subprocess_exec(
+            _audio_segment().converter, "-hide_banner", "-loglevel", "error",
+            # Start decoding as soon as the container header has arrived
+            "-probesize", "4096", "-analyzeduration", "0", "-fflags", "nobuffer",
+            *demuxer, "-i", "pipe:0",
+            "-f", "s16le", "-acodec", "pcm_s16le", "-ac", "1", "-ar", str(SAMPLE_RATE),
+            "-flush_packets", "1", "pipe:1",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+
+    async def write(self, data: bytes) -> None:
+        self._proc.stdin.write(data)
+        await self._proc.stdin.drain()
+
+    async def end(self) -> None:
+        self._proc.stdin.close()
+
+    async def read(self) -> bytes:
+        return await self._proc.stdout.read(self.READ_SIZE)
+
+    async def close(self) -> None:
+        if self._proc and self._proc.returncode is None:
+            self._proc.kill()
+            await self._proc.wait()
+
+
+# Live input formats: MediaRecorder's WebM/Opus, or raw PCM
+LIVE_FORMATS = {"webm": "matroska", "ogg": "ogg", "pcm": None}
+
+
+class LiveTranscriber:
+    """
+    One utterance arriving in chunks: decoder -> STT stream, with partial
+    transcripts passed to ``on_partial`` as they change. write() only
+    returns once the chunk fits in the pipeline, which is what pushes
+    back on a client sending faster than recognition keeps up.
+    """
+
+    def __init__(self, input_format: str, on_partial: Callable[[str], None]):
+        if input_format == "pcm":
+            self._decoder = PCMPassthrough()
+        else:
+            self._decoder = FfmpegDecoder(LIVE_FORMATS[input_format])
+        self._on_partial = on_partial
+        self._stream = get_provider().stream()
+        self._pump: Optional[asyncio.Task] = None
+
+    async def start(self) -> "LiveTranscriber":
+        await self._decoder.start()
+        self._pump = asyncio.create_task(self._run())
+        return self
+
+    async def _run(self) -> None:
+        while pcm := await self._decoder.read():
+            partial = await self._stream.feed_async(pcm)
+            if partial is not None:
+                self._on_partial(partial)
+
+    async def write(self, data: bytes) -> None:
+        if self._pump.done():
+            # Decoder or STT failed; surface it instead of blocking forever
+            self._pump.result()
+        await self._decoder.write(data)
+
+    async def finish(self) -> Optional[str]:
+        """Flush the decoder and return the final transcript.
+
+        Timed as the "stt" stage: what is left after the user stops speaking.
+        """
+        try:
+            with span("stt"):
+                await self._decoder.end()
+                await self._pump
+                return await self._stream.finish_async()
+        finally:
+            await self._decoder.close()
+
+    async def close(self) -> None:
+        if self._pump:
+            self._pump.cancel()
+        await self._decoder.close()
+
+
+def transcribe_audio(file: UploadFile) -> str | None:
+    """
+    Convert uploaded audio file into text with the configured STT provider
+    (Google STT via speech_recognition by default).
+    Returns recognized text or None if transcription fails.
+    """
+
+    try:
+        data = read_upload(file.file, settings.STT_MAX_UPLOAD_BYTES)
+        return get_provider().transcribe(decode_pcm(data))
 
     except Exception as e:
         print(f"[STT] General error: {type(e).__name__} - {e}")
         return None
 
-    finally:
-        if wav_path and os.path.exists(wav_path):
-            os.remove(wav_path)
+
+async def transcribe_audio_async(file: UploadFile) -> str | None:
+    """Run transcribe_audio (decode + STT) on the bounded STT thread pool."""
+    with span("stt"):
+        return await run_blocking("stt", transcribe_audio, file)
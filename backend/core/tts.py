@@ -1,35 +1,240 @@
+import base64
+import binascii
 import os
-from sarvamai import SarvamAI
+import re
+import subprocess
+from functools import lru_cache
+from typing import Optional
 from dotenv import load_dotenv
+from config import settings
+from service.concurrency import run_blocking
+from service.metrics import span
+from service.providers import ProviderUnavailable, register
+from service.tts_cache import cache_key, tts_cache
 
 load_dotenv()
-SARVAM_KEY = os.getenv("SARVAM_API_KEY")
 
-if not SARVAM_KEY:
-    raise ValueError("SARVAM_API_KEY not found in environment!")
 
+def _sarvam_missing() -> Optional[str]:
+    return None if os.getenv("SARVAM_API_KEY") else "SARVAM_API_KEY not found in environment"
 
-sarvam_client = SarvamAI(api_subscription_key=SARVAM_KEY)
+
+def _create_sarvam():
+    # Imported here: the SDK (and its HTTP stack) is slow to import and only TTS needs it
+    from sarvamai import SarvamAI
+
+    return SarvamAI(api_subscription_key=os.getenv("SARVAM_API_KEY"))
+
+
+# Built on first use; without a key replies are text-only instead of the app failing to start
+tts_provider = register("tts", _create_sarvam, _sarvam_missing)
+
+AUDIO_MEDIA_TYPES = {"wav": "audio/wav", "opus": "audio/webm"}
+_WEBM_MAGIC = b"\x1a\x45\xdf\xa3"
+
+# Voice parameters sent with every request; part of the TTS cache key.
+TTS_VOICE = {
+    "target_language_code": "hi-IN",
+    "speaker": "manisha",
+    "pitch": 0.3,
+    "pace": 0.9,
+    "loudness": 0.5,
+    "speech_sample_rate": 22050,
+    "enable_preprocessing": True,
+    "model": "bulbul:v2",
+}
+
+# Sentence end: terminal punctuation (incl. Devanagari danda), optional
+# closing quote/bracket, then whitespace so "3.5" or "..." mid-token never split.
+_SENTENCE_END = re.compile(r"[.!?।]+[\"')\]]*\s+")
+
+
+def _convert(text: str) -> str | None:
+    """Call SarvamAI; returns base64-encoded audio or None if failed."""
+    try:
+        tts_response = tts_provider.get().text_to_speech.convert(text=text, **TTS_VOICE)
+        return tts_response.audios[0]
+    except ProviderUnavailable:
+        # No key: text-only replies (see /health "providers")
+        return None
+    except Exception as e:
+        print(f"[TTS] Error: {e}")
+        return None
+
+
+def _decode(audio_base64: str) -> bytes | None:
+    try:
+        return base64.b64decode(audio_base64)
+    except (binascii.Error, ValueError) as e:
+        print(f"[TTS] Invalid audio payload: {e}")
+        return None
+
+
+def audio_media_type(audio: bytes | str | None) -> str:
+    """Media type of a clip (raw or base64) from its header; a clip that failed to encode is still WAV."""
+    if isinstance(audio, str):
+        try:
+            audio = base64.b64decode(audio[:8])
+        except (binascii.Error, ValueError):
+            return AUDIO_MEDIA_TYPES["wav"]
+    return AUDIO_MEDIA_TYPES["opus"] if audio and audio.startswith(_WEBM_MAGIC) else AUDIO_MEDIA_TYPES["wav"]
+
+
+# --- Output codec ---
+
+@lru_cache(maxsize=None)
+def _opus_encoder() -> str | None:
+    """Path of an ffmpeg that can encode Opus, or None (checked once; clips then stay WAV)."""
+    # Imported here: pydub probes the system for ffmpeg at import
+    from pydub import AudioSegment
+
+    try:
+        encoders = subprocess.run(
+            [AudioSegment.converter, "-hide_banner", "-encoders"], capture_output=True, text=True, check=True
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        encoders = ""
+    if "libopus" not in encoders:
+        print("[TTS] ffmpeg with libopus not found, sending WAV")
+        return None
+    return AudioSegment.converter
+
+
+def encode_opus(wav: bytes, bitrate_kbps: float) -> bytes | None:
+    """WAV to Opus in a WebM container, through one ffmpeg process (pipes, no temp files)."""
+    ffmpeg = _opus_encoder()
+    if ffmpeg is None:
+        return None
+    cmd = [
+        ffmpeg, "-hide_banner", "-loglevel", "error",
+        "-i", "pipe:0",
+        "-c:a", "libopus", "-b:a", f"{bitrate_kbps:g}k", "-application", "voip",
+        "-f", "webm", "pipe:1",
+    ]
+    try:
+        proc = subprocess.run(cmd, input=wav, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"[TTS] Opus encode failed: {type(e).__name__}")
+        return None
+    return proc.stdout or None
+
+
+def _encoded_key(text: str) -> str:
+    return cache_key(text, {**TTS_VOICE, "codec": "opus", "bitrate_kbps": settings.TTS_OPUS_BITRATE_KBPS})
+
+
+def _cached_or_synthesized(text: str) -> tuple[bytes | None, bool]:
+    """(clip, already encoded): the cached encoded clip, else the WAV."""
+    # One logical lookup: a miss here is counted by the WAV lookup below
+    encoded = tts_cache.get(_encoded_key(text), count_miss=False)
+    if encoded is not None:
+        return encoded, True
+    return synthesize_speech_bytes(text), False
+
+
+def _encode_and_cache(text: str, wav: bytes) -> bytes:
+    data = encode_opus(wav, settings.TTS_OPUS_BITRATE_KBPS)
+    if data is None:
+        return wav
+    tts_cache.put(_encoded_key(text), data)
+    return data
 
 
 def synthesize_speech(text: str) -> str | None:
     """
     Convert text → speech using SarvamAI.
     Returns base64-encoded audio (string), or None if failed.
+    Identical (text, voice) requests are served from the TTS cache.
     """
-    try:
-        tts_response = sarvam_client.text_to_speech.convert(
-            text=text,
-            target_language_code="hi-IN",
-            speaker="manisha",
-            pitch=0.3,
-            pace=0.9,
-            loudness=0.5,
-            speech_sample_rate=22050,
-            enable_preprocessing=True,
-            model="bulbul:v2"
-        )
-        return tts_response.audios[0]  
-    except Exception as e:
-        print(f"[TTS] Error: {e}")
-        return None
\ No newline at end of file
+    key = cache_key(text, TTS_VOICE)
+    cached = tts_cache.get(key)
+    if cached is not None:
+        return base64.b64encode(cached).decode("ascii")
+
+    audio_base64 = _convert(text)
+    if audio_base64 is not None:
+        data = _decode(audio_base64)
+        if data is not None:
+            tts_cache.put(key, data)
+    return audio_base64
+
+
+def synthesize_speech_bytes(text: str) -> bytes | None:
+    """Like synthesize_speech, but returns the decoded WAV bytes."""
+    key = cache_key(text, TTS_VOICE)
+    cached = tts_cache.get(key)
+    if cached is not None:
+        return cached
+
+    audio_base64 = _convert(text)
+    if audio_base64 is None:
+        return None
+    data = _decode(audio_base64)
+    if data is not None:
+        tts_cache.put(key, data)
+    return data
+
+
+async def synthesize_speech_async(text: str) -> str | None:
+    """Run synthesize_speech on the bounded TTS thread pool (base64 in TTS_OUTPUT_CODEC)."""
+    if settings.TTS_OUTPUT_CODEC != "opus":
+        with span("tts"):
+            return await run_blocking("tts", synthesize_speech, text)
+    audio = await synthesize_speech_bytes_async(text)
+    return base64.b64encode(audio).decode("ascii") if audio is not None else None
+
+
+async def synthesize_speech_bytes_async(text: str) -> bytes | None:
+    """Run synthesize_speech_bytes on the bounded TTS thread pool.
+
+    With TTS_OUTPUT_CODEC=opus the WAV is then encoded on the "encode"
+    stage (at most TTS_ENCODE_WORKERS ffmpeg processes, never on the event
+    loop) and the encoded clip is cached next to the WAV.
+    """
+    if settings.TTS_OUTPUT_CODEC != "opus":
+        with span("tts"):
+            return await run_blocking("tts", synthesize_speech_bytes, text)
+    with span("tts"):
+        audio, encoded = await run_blocking("tts", _cached_or_synthesized, text)
+    if encoded or audio is None:
+        return audio
+    with span("encode"):
+        return await run_blocking("encode", _encode_and_cache, text, audio)
+
+
+async def prewarm_tts(phrases) -> None:
+    """Synthesize known canned phrases into the TTS cache ahead of time."""
+    if not tts_provider.configured:
+        return
+    for phrase in phrases:
+        if cache_key(phrase, TTS_VOICE) not in tts_cache:
+            await synthesize_speech_bytes_async(phrase)
+
+
+class SentenceChunker:
+    """Accumulates streamed LLM text and emits complete sentences for TTS.
+
+    Sentences shorter than ``min_chars`` are merged with the next one so we
+    don't pay a provider round-trip for "Hi." on its own.
+    """
+
+    def __init__(self, min_chars: int = 24):
+        self.min_chars = min_chars
+        self._buf = ""
+
+    def feed(self, delta: str) -> list[str]:
+        self._buf += delta
+        sentences = []
+        start = 0
+        for m in _SENTENCE_END.finditer(self._buf):
+            if m.end() - start < self.min_chars:
+                continue
+            sentences.append(self._buf[start:m.end()].strip())
+            start = m.end()
+        self._buf = self._buf[start:]
+        return sentences
+
+    def flush(self) -> str | None:
+        rest = self._buf.strip()
+        self._buf = ""
+        return rest or None
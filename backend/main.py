@@ -1,11 +1,23 @@
-from fastapi import FastAPI
+import asyncio
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from config import settings
 from fastapi.middleware.cors import CORSMiddleware
 from config import Settings
-from api import chat
+from api import admin, chat
+from core.gpt import gpt_status
+from core.tts import prewarm_tts
+from service import concurrency
+from service.admission import Rejected, admission, session_turns
+from service.cache import get_store
+from service.metrics import TracingMiddleware, metrics
+from service.providers import provider_status, warm_providers
+from service.reply_cache import reply_cache
+from service.tts_cache import tts_cache
 
 MODE = "normal"
 
+_background_tasks = set()
 
 
 app = FastAPI(
@@ -20,12 +32,61 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so request timings include every other middleware
+app.add_middleware(TracingMiddleware)
 
 
+@app.exception_handler(Rejected)
+async def rejected(request: Request, exc: Rejected):
+    """Admission control refusals: 503 (server full) or 429 (session busy), both with Retry-After."""
+    return JSONResponse(
+        {"detail": exc.detail},
+        status_code=exc.status_code,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 
 @app.get("/health")
 async def home():
-    return {"status": "up" , "mode": Settings.MODE}
+    return {
+        "status": "up",
+        "mode": Settings.MODE,
+        "sessions": get_store().stats(),
+        "tts_cache": tts_cache.stats(),
+        "reply_cache": reply_cache.stats(),
+        "llm": gpt_status(),
+        "providers": provider_status(),
+        "admission": {**admission.stats(), **session_turns.stats()},
+        "stages": metrics.summary(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Per-stage and per-route latency histograms in Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.on_event("startup")
+async def startup():
+    # Both run in the background so the app accepts traffic immediately
+    if settings.PROVIDERS_PREWARM:
+        _in_background(warm_providers())
+    if settings.TTS_CACHE_PREWARM:
+        _in_background(prewarm_tts(chat.CANNED_REPLIES))
+
+
+def _in_background(coro) -> None:
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    concurrency.shutdown()
+    get_store().close()
 
 
-app.include_router(chat.router)
\ No newline at end of file
+app.include_router(chat.router)
+app.include_router(admin.router)
\ No newline at end of file
@@ -0,0 +1,338 @@
+import asyncio
+import math
+import time
+import weakref
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, Hashable, Optional
+
+from config import settings
+
+
+class Rejected(Exception):
+    """A turn refused before any work started (HTTP 429/503 with Retry-After)."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """One admitted turn; ``release()`` may be called more than once."""
+
+    __slots__ = ("_queue", "_started", "_released")
+
+    def __init__(self, queue: "AdmissionQueue"):
+        self._queue = queue
+        self._started = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._queue._release(time.monotonic() - self._started)
+
+
+class AdmissionQueue:
+    """Global cap on turns in progress, with a bounded FIFO wait in front of it.
+
+    Up to ``max_active`` turns run at once and up to ``max_queue`` more wait
+    at most ``queue_timeout`` seconds for a slot; anything beyond that is
+    refused at once (503), so a spike costs a fast rejection instead of
+    unbounded upstream LLM/TTS calls. Priority (crisis) turns never wait and
+    are never refused: they take a slot even above the cap.
+    """
+
+    def __init__(self, max_active: int, max_queue: int, queue_timeout: float, alpha: float = 0.2):
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.alpha = alpha
+        self.active = 0
+        self.turn_seconds = 1.0  # EWMA of slot hold time, for Retry-After
+        self.admitted = 0
+        self.priority = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    def retry_after(self) -> int:
+        """Whole seconds until a slot is likely free (at least 1)."""
+        ahead = 1 + len(self._waiters) / max(1, self.max_active)
+        return max(1, math.ceil(self.turn_seconds * ahead))
+
+    async def acquire(self, priority: bool = False) -> Ticket:
+        """Wait for a slot; raises Rejected when the queue is full or the wait times out."""
+        if priority or not self.max_active or (self.active < self.max_active and not self._waiters):
+            self.active += 1
+            self.admitted += 1
+            self.priority += priority
+            return Ticket(self)
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise Rejected(503, "Server busy, please retry shortly", self.retry_after())
+
+        self.queued += 1
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout or None)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise Rejected(503, "Server busy, please retry shortly", self.retry_after())
+        except BaseException:
+            # Cancelled after the slot was handed over: give it back
+            if waiter.done() and not waiter.cancelled():
+                self._release(None)
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        self.admitted += 1
+        return Ticket(self)
+
+    def _release(self, held: Optional[float]) -> None:
+        if held is not None:
+            self.turn_seconds += self.alpha * (held - self.turn_seconds)
+        self.active -= 1
+        # Hand the slot straight to the longest waiter
+        while self._waiters and self.active < self.max_active:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self.active += 1
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "waiting": len(self._waiters),
+            "max_active": self.max_active,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "priority": self.priority,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "turn_seconds": round(self.turn_seconds, 3),
+        }
+
+
+class _Turn:
+    """Events of one in-flight turn, replayed to every request that follows it.
+
+    At most ``limit`` events are buffered: once full, events every follower
+    has read are dropped and the producer waits for the slowest follower,
+    so a stalled client holds back the turn instead of buffering all of it.
+    A request can only join while the first event is still buffered.
+    """
+
+    __slots__ = ("admitted", "events", "base", "limit", "positions", "done", "error", "task", "_changed", "_drained")
+
+    def __init__(self, limit: int):
+        # Resolves once the turn has an admission slot (or fails with Rejected)
+        self.admitted: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.events: Deque[object] = deque()
+        self.base = 0  # index of events[0] in the whole turn
+        self.limit = max(1, limit)
+        self.positions: Dict[object, int] = {}  # follower -> index of its next event
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+        self._drained = asyncio.Event()
+
+    @property
+    def joinable(self) -> bool:
+        return not self.done and self.base == 0
+
+    async def push(self, item) -> None:
+        while len(self.events) >= self.limit:
+            # Make room by dropping what every follower has read, else wait for the slowest
+            slowest = min(self.positions.values(), default=self.base)
+            while self.base < slowest and len(self.events) >= self.limit:
+                self.events.popleft()
+                self.base += 1
+            if len(self.events) < self.limit:
+                break
+            self._drained.clear()
+            await self._drained.wait()
+        self.events.append(item)
+        self._changed.set()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self.done = True
+        self.error = error
+        self._changed.set()
+
+    def follow(self) -> AsyncIterator:
+        """Events from the start of the turn; the follower counts from this call, not its first read."""
+        follower = object()
+        self.positions[follower] = self.base
+        events = self._follow(follower)
+        # Also leave if the iterator is dropped without ever being read
+        weakref.finalize(events, self._leave, follower)
+        return events
+
+    async def _follow(self, follower) -> AsyncIterator:
+        try:
+            while True:
+                index = self.positions[follower]
+                if index < self.base + len(self.events):
+                    self.positions[follower] = index + 1
+                    self._drained.set()
+                    yield self.events[index - self.base]
+                elif self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                else:
+                    self._changed.clear()
+                    await self._changed.wait()
+        finally:
+            self._leave(follower)
+
+    def _leave(self, follower) -> None:
+        if self.positions.pop(follower, None) is None:
+            return
+        self._drained.set()
+        # Nobody is listening any more (client went away): stop the work
+        if not self.positions and not self.done and self.task:
+            self.task.cancel()
+
+
+class _SessionState:
+    __slots__ = ("lock", "pending", "turns")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.pending = 0
+        self.turns: Dict[Hashable, _Turn] = {}
+
+
+class SessionTurns:
+    """Per-session serialization and coalescing of turns.
+
+    Turns on one session run one at a time in arrival order, so history is
+    never interleaved. A request identical to a turn still in flight on the
+    same session (a double submit) follows that turn's events instead of
+    paying for another LLM+TTS round. At most ``max_pending`` distinct turns
+    may be running or queued per session; more get a 429. Each distinct
+    turn takes an admission slot before it is queued on the session, and
+    buffers at most ``max_buffered`` events ahead of its slowest reader.
+    """
+
+    def __init__(self, admission: AdmissionQueue, max_pending: int, max_buffered: int = 64):
+        self.admission = admission
+        self.max_pending = max_pending
+        self.max_buffered = max_buffered
+        self.coalesced = 0
+        self.rejected = 0
+        self._sessions: Dict[str, _SessionState] = {}
+
+    async def stream(
+            self,
+            session_id: str,
+            key: Optional[Hashable],
+            events: Callable[[], AsyncIterator],
+            *,
+            priority: bool = False,
+        ) -> AsyncIterator:
+        """Admit a turn and return an iterator over its events.
+
+        ``events`` produces the turn; ``key`` identifies duplicates (None
+        never coalesces). Raises Rejected before any work starts.
+        """
+        state = self._sessions.get(session_id)
+        turn = state.turns.get(key) if state and key is not None else None
+        if turn is not None and turn.joinable:
+            # Shares the original's fate in the admission queue too
+            await asyncio.shield(turn.admitted)
+            if turn.base == 0:
+                self.coalesced += 1
+                return turn.follow()
+            # Already past what it can replay: runs as a turn of its own
+            state = self._sessions.get(session_id)
+        if state and state.pending >= self.max_pending and not priority:
+            self.rejected += 1
+            raise Rejected(
+                429, "Still answering the previous message for this session", self.admission.retry_after()
+            )
+
+        state = self._sessions.setdefault(session_id, _SessionState())
+        state.pending += 1
+        turn = _Turn(self.max_buffered)
+        if key is not None:
+            state.turns[key] = turn
+        try:
+            ticket = await self.admission.acquire(priority)
+        except BaseException as e:
+            refusal = e if isinstance(e, Rejected) else Rejected(503, "Request abandoned", 1)
+            turn.admitted.set_exception(refusal)
+            turn.admitted.exception()  # retrieved, even when nobody followed this turn
+            turn.finish(refusal)
+            self._forget(session_id, state, key, turn)
+            raise
+        turn.admitted.set_result(None)
+        turn.task = asyncio.create_task(self._produce(session_id, state, key, turn, events, ticket))
+        return turn.follow()
+
+    async def run(
+            self,
+            session_id: str,
+            key: Optional[Hashable],
+            compute: Callable[[], Awaitable],
+            *,
+            priority: bool = False,
+        ):
+        """Like ``stream`` for a turn with a single result."""
+        async def once() -> AsyncIterator:
+            yield await compute()
+
+        result = None
+        async for result in await self.stream(session_id, key, once, priority=priority):
+            pass
+        return result
+
+    async def _produce(self, session_id, state, key, turn, events, ticket) -> None:
+        error = None
+        try:
+            async with state.lock:
+                produced = events()
+                try:
+                    async for item in produced:
+                        await turn.push(item)
+                finally:
+                    await produced.aclose()
+        except asyncio.CancelledError as e:
+            error = e
+        except Exception as e:
+            print(f"[TURN] {session_id}: {type(e).__name__} - {e}")
+            error = e
+        finally:
+            ticket.release()
+            turn.finish(error)
+            self._forget(session_id, state, key, turn)
+
+    def _forget(self, session_id: str, state: _SessionState, key, turn: _Turn) -> None:
+        if key is not None and state.turns.get(key) is turn:
+            del state.turns[key]
+        state.pending -= 1
+        if not state.pending and self._sessions.get(session_id) is state:
+            del self._sessions[session_id]
+
+    def stats(self) -> dict:
+        return {
+            "sessions_busy": len(self._sessions),
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+        }
+
+
+admission = AdmissionQueue(
+    settings.ADMISSION_MAX_ACTIVE,
+    settings.ADMISSION_MAX_QUEUE,
+    settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+)
+session_turns = SessionTurns(admission, settings.SESSION_MAX_PENDING)
@@ -0,0 +1,112 @@
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from config import settings
+
+# Synthesized clips waiting to be fetched via /chat/audio/{id}. Clips are
+# short-lived: the client fetches them right after receiving the reply.
+# Memory is per process; with several workers set AUDIO_STORE_DIR (shared by
+# the workers on one host) or route each client to the same worker.
+AUDIO_TTL_SECONDS = 300
+_SWEEP_INTERVAL_SECONDS = 60
+_ID = re.compile(r"[0-9a-f]{32}")
+
+_clips: "OrderedDict[str, Tuple[float, bytes, str]]" = OrderedDict()
+_bytes = 0
+_lock = threading.Lock()
+_last_sweep = 0.0
+
+
+def _evict(now: float) -> None:
+    global _bytes
+    while _clips:
+        oldest_id, (expires_at, data, _) = next(iter(_clips.items()))
+        if expires_at > now and _bytes <= settings.AUDIO_STORE_MAX_BYTES:
+            break
+        _clips.pop(oldest_id)
+        _bytes -= len(data)
+
+
+def _path(audio_id: str) -> str:
+    return os.path.join(settings.AUDIO_STORE_DIR, f"{audio_id}.clip")
+
+
+def _write_disk(audio_id: str, data: bytes, media_type: str) -> None:
+    # Write-then-rename so another worker never reads a partial clip
+    try:
+        os.makedirs(settings.AUDIO_STORE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=settings.AUDIO_STORE_DIR, suffix=".tmp")
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(media_type.encode("ascii") + b"\n")
+            fh.write(data)
+        os.replace(tmp_path, _path(audio_id))
+    except OSError as e:
+        print(f"[AudioStore] Disk write failed: {e}")
+
+
+def _read_disk(audio_id: str) -> Optional[Tuple[bytes, str]]:
+    path = _path(audio_id)
+    try:
+        if os.path.getmtime(path) + AUDIO_TTL_SECONDS <= time.time():
+            os.remove(path)
+            return None
+        with open(path, "rb") as fh:
+            media_type = fh.readline().rstrip(b"\n").decode("ascii")
+            return fh.read(), media_type
+    except OSError:
+        return None
+
+
+def _sweep_disk() -> None:
+    """Remove expired clip files, at most once per _SWEEP_INTERVAL_SECONDS."""
+    global _last_sweep
+    now = time.time()
+    if now - _last_sweep < _SWEEP_INTERVAL_SECONDS:
+        return
+    _last_sweep = now
+    try:
+        with os.scandir(settings.AUDIO_STORE_DIR) as entries:
+            for entry in entries:
+                if entry.name.endswith((".clip", ".tmp")) and entry.stat().st_mtime + AUDIO_TTL_SECONDS <= now:
+                    os.remove(entry.path)
+    except OSError as e:
+        print(f"[AudioStore] Sweep failed: {e}")
+
+
+def put_audio(data: bytes, media_type: str) -> str:
+    """Store a clip and return its id."""
+    global _bytes
+    audio_id = uuid.uuid4().hex
+    now = time.monotonic()
+    with _lock:
+        if len(data) <= settings.AUDIO_STORE_MAX_BYTES:
+            _clips[audio_id] = (now + AUDIO_TTL_SECONDS, data, media_type)
+            _bytes += len(data)
+        _evict(now)
+    if settings.AUDIO_STORE_DIR:
+        _write_disk(audio_id, data, media_type)
+        _sweep_disk()
+    return audio_id
+
+
+def get_audio(audio_id: str) -> Optional[Tuple[bytes, str]]:
+    """Return (bytes, media_type) for a stored clip, or None if unknown/expired."""
+    if not _ID.fullmatch(audio_id):
+        return None
+    with _lock:
+        entry = _clips.get(audio_id)
+        if entry is not None:
+            expires_at, data, media_type = entry
+            if expires_at > time.monotonic():
+                return data, media_type
+            _evict(time.monotonic())
+    if settings.AUDIO_STORE_DIR:
+        # Stored by another worker, or evicted from this one's memory
+        return _read_disk(audio_id)
+    return None
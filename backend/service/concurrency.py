@@ -0,0 +1,55 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict
+
+from config import settings
+
+# Max in-flight work per pipeline stage. Blocking providers (STT/TTS SDKs)
+# run on a dedicated thread pool of the same size so one slow stage can
+# never starve the event loop or the other stages.
+STAGE_LIMITS: Dict[str, int] = {
+    "llm": settings.LLM_CONCURRENCY,
+    "tts": settings.TTS_CONCURRENCY,
+    "stt": settings.STT_CONCURRENCY,
+    "encode": settings.TTS_ENCODE_WORKERS,
+}
+
+_semaphores: Dict[str, asyncio.Semaphore] = {}
+_executors: Dict[str, ThreadPoolExecutor] = {}
+
+
+def stage_limit(stage: str) -> asyncio.Semaphore:
+    """Return the semaphore bounding concurrent work for a stage."""
+    sem = _semaphores.get(stage)
+    if sem is None:
+        sem = _semaphores[stage] = asyncio.Semaphore(STAGE_LIMITS[stage])
+    return sem
+
+
+def _get_executor(stage: str) -> ThreadPoolExecutor:
+    executor = _executors.get(stage)
+    if executor is None:
+        executor = _executors[stage] = ThreadPoolExecutor(
+            max_workers=STAGE_LIMITS[stage],
+            thread_name_prefix=f"{stage}-worker",
+        )
+    return executor
+
+
+async def run_blocking(stage: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking provider call on the stage's thread pool.
+
+    Waiting happens on the stage semaphore (cancellable, in the event loop)
+    rather than inside the executor queue.
+    """
+    loop = asyncio.get_running_loop()
+    async with stage_limit(stage):
+        return await loop.run_in_executor(_get_executor(stage), partial(fn, *args, **kwargs))
+
+
+def shutdown() -> None:
+    """Stop all stage thread pools (called on app shutdown)."""
+    for executor in _executors.values():
+        executor.shutdown(wait=False, cancel_futures=True)
+    _executors.clear()
@@ -0,0 +1,236 @@
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config import settings
+
+# Upper bounds (seconds) shared by every histogram; +Inf is implicit
+BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+
+class Histogram:
+    """Prometheus-style histogram: per-bucket counts plus sum and count."""
+
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (coarse, for summaries)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS + (float("inf"),), self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Trace:
+    """Spans recorded while handling one request (or one WebSocket turn)."""
+
+    __slots__ = ("route", "started", "spans", "fields")
+
+    def __init__(self, route: str):
+        self.route = route
+        self.started = time.perf_counter()
+        self.spans: List[Tuple[str, float]] = []
+        self.fields: Dict[str, object] = {}
+
+
+class Metrics:
+    """Per-stage latency histograms and per-route request histograms/counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages: Dict[str, Histogram] = {}
+        self.requests: Dict[str, Histogram] = {}
+        self.statuses: Dict[Tuple[str, str], int] = {}
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            hist = self.stages.get(stage)
+            if hist is None:
+                hist = self.stages[stage] = Histogram()
+            hist.observe(seconds)
+
+    def observe_request(self, route: str, status: str, seconds: float) -> None:
+        with self._lock:
+            hist = self.requests.get(route)
+            if hist is None:
+                hist = self.requests[route] = Histogram()
+            hist.observe(seconds)
+            key = (route, status)
+            self.statuses[key] = self.statuses.get(key, 0) + 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stages.clear()
+            self.requests.clear()
+            self.statuses.clear()
+
+    def render(self) -> str:
+        """Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            _render_histograms(
+                lines, "ai_therapist_stage_seconds", "Time spent per pipeline stage.", "stage", self.stages
+            )
+            _render_histograms(
+                lines, "ai_therapist_request_seconds", "Request (or voice turn) latency by route.", "route", self.requests
+            )
+            lines.append("# HELP ai_therapist_requests_total Requests by route and status.")
+            lines.append("# TYPE ai_therapist_requests_total counter")
+            for (route, status), n in sorted(self.statuses.items()):
+                lines.append(f'ai_therapist_requests_total{{route="{route}",status="{status}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> dict:
+        """Count, mean and coarse p50/p99 per stage (for /health and benchmarks)."""
+        with self._lock:
+            return {
+                stage: {
+                    "count": h.count,
+                    "mean_ms": round(h.sum / h.count * 1000, 2) if h.count else None,
+                    "p50_le_ms": _ms(h.quantile(0.5)),
+                    "p99_le_ms": _ms(h.quantile(0.99)),
+                }
+                for stage, h in sorted(self.stages.items())
+            }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None or seconds == float("inf") else round(seconds * 1000, 2)
+
+
+def _render_histograms(lines: List[str], name: str, help_text: str, label: str, hists: Dict[str, Histogram]) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for key, hist in sorted(hists.items()):
+        cumulative = 0
+        for bound, n in zip(BUCKETS, hist.counts):
+            cumulative += n
+            lines.append(f'{name}_bucket{{{label}="{key}",le="{bound:g}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{label}="{key}",le="+Inf"}} {hist.count}')
+        lines.append(f'{name}_sum{{{label}="{key}"}} {hist.sum:.6f}')
+        lines.append(f'{name}_count{{{label}="{key}"}} {hist.count}')
+
+
+metrics = Metrics()
+
+_current: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+
+
+def record(stage: str, seconds: float) -> None:
+    """Record a measured stage duration into the histograms and the current trace."""
+    if not settings.METRICS_ENABLED:
+        return
+    metrics.observe(stage, seconds)
+    trace = _current.get()
+    if trace is not None:
+        trace.spans.append((stage, seconds))
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time the enclosed block as ``stage`` (works around awaits too)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+def annotate(**fields) -> None:
+    """Attach fields (e.g. session_id) to the current trace's JSON log line."""
+    trace = _current.get()
+    if trace is not None:
+        trace.fields.update(fields)
+
+
+def start_trace(route: str):
+    """Begin a trace in the current context; returns a token for ``end_trace``."""
+    return _current.set(Trace(route))
+
+
+def end_trace(token, status: str = "ok", route: Optional[str] = None) -> None:
+    trace = _current.get()
+    _current.reset(token)
+    if trace is None or not settings.METRICS_ENABLED:
+        return
+    elapsed = time.perf_counter() - trace.started
+    route = route or trace.route
+    metrics.observe_request(route, status, elapsed)
+    if settings.METRICS_LOG_JSON:
+        stages: Dict[str, float] = {}
+        for stage, seconds in trace.spans:
+            stages[stage] = stages.get(stage, 0.0) + seconds
+        print(json.dumps({
+            "event": "request",
+            "route": route,
+            "status": status,
+            "ms": round(elapsed * 1000, 2),
+            "stages_ms": {k: round(v * 1000, 2) for k, v in stages.items()},
+            **trace.fields,
+        }, ensure_ascii=False))
+
+
+@contextmanager
+def trace(route: str) -> Iterator[None]:
+    """One traced unit of work outside the HTTP middleware (e.g. a WebSocket turn)."""
+    token = start_trace(route)
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        end_trace(token, status)
+
+
+class TracingMiddleware:
+    """ASGI middleware: one trace per HTTP request, ended when the body is fully sent.
+
+    The route label is the matched path template (``/chat/audio/{audio_id}``),
+    so ids never become label values.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        token = start_trace(scope.get("path", ""))
+        status = "500"
+
+        async def traced_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, traced_send)
+        finally:
+            route = scope.get("route")
+            end_trace(token, status, route=getattr(route, "path", None) or "unmatched")
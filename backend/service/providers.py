@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import time
+from typing import Callable, Dict, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class ProviderUnavailable(RuntimeError):
+    """The provider is not configured, or building its client failed."""
+
+
+class Provider(Generic[T]):
+    """An external client (LLM, TTS, STT) built on first use instead of at import.
+
+    ``configured`` returns None when the provider can be built, or the
+    reason it cannot (e.g. a missing key); it is re-checked on every use
+    until the client exists, so fixing the environment needs no restart.
+    A failed build is retried on the next use.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], T], configured: Optional[Callable[[], Optional[str]]] = None):
+        self.name = name
+        self._factory = factory
+        self._configured = configured or (lambda: None)
+        self._lock = threading.Lock()
+        self._instance: Optional[T] = None
+        self.state = "idle"
+        self.error: Optional[str] = None
+        self.init_ms: Optional[float] = None
+
+    def get(self) -> T:
+        instance = self._instance
+        if instance is not None:
+            return instance
+        with self._lock:
+            if self._instance is None:
+                missing = self._configured()
+                if missing:
+                    self.state, self.error = "unconfigured", missing
+                    raise ProviderUnavailable(f"{self.name}: {missing}")
+                self.state = "starting"
+                start = time.perf_counter()
+                try:
+                    self._instance = self._factory()
+                except Exception as e:
+                    self.state, self.error = "failed", f"{type(e).__name__}: {e}"
+                    raise ProviderUnavailable(f"{self.name}: {self.error}") from e
+                self.init_ms = round((time.perf_counter() - start) * 1000, 1)
+                self.state, self.error = "ready", None
+            return self._instance
+
+    def peek(self) -> Optional[T]:
+        """The client if it has been built, without building it."""
+        return self._instance
+
+    def set(self, instance: T) -> None:
+        """Install a client directly (stubs, tests)."""
+        with self._lock:
+            self._instance = instance
+            self.state, self.error = "ready", None
+
+    def reset(self) -> None:
+        """Drop the client; the next use builds a new one."""
+        with self._lock:
+            self._instance = None
+            self.state, self.error, self.init_ms = "idle", None, None
+
+    @property
+    def configured(self) -> bool:
+        return self._instance is not None or not self._configured()
+
+    def status(self) -> dict:
+        if self._instance is None and self.state in ("idle", "unconfigured"):
+            # Report a missing key even before anything has tried to use it
+            missing = self._configured()
+            self.state, self.error = ("unconfigured", missing) if missing else ("idle", None)
+        return {"ready": self._instance is not None, "state": self.state, "error": self.error, "init_ms": self.init_ms}
+
+    async def warm(self) -> None:
+        """Build the client off the event loop; failures are logged, not raised."""
+        try:
+            await asyncio.to_thread(self.get)
+        except ProviderUnavailable as e:
+            print(f"[PROVIDERS] {e}")
+
+
+_providers: Dict[str, Provider] = {}
+
+
+def register(name: str, factory: Callable[[], T], configured: Optional[Callable[[], Optional[str]]] = None) -> Provider[T]:
+    provider = _providers[name] = Provider(name, factory, configured)
+    return provider
+
+
+def provider_status() -> dict:
+    """Per-provider readiness, for /health."""
+    return {name: provider.status() for name, provider in _providers.items()}
+
+
+async def warm_providers() -> None:
+    """Build every registered client concurrently (run as a startup background task)."""
+    await asyncio.gather(*(provider.warm() for provider in _providers.values()))
@@ -0,0 +1,137 @@
+import hashlib
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+from config import settings
+
+_PUNCT = re.compile(r"[^\w\s']+")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_input(text: str) -> str:
+    """Lowercase, drop punctuation/emoji and collapse whitespace ("Sad..." == "sad")."""
+    text = text.lower().replace("’", "'")
+    return _SPACE.sub(" ", _PUNCT.sub(" ", text)).strip()
+
+
+def history_bucket(history: Optional[List[dict]]) -> str:
+    """Coarse conversation stage: how many earlier user turns, bucketed."""
+    turns = sum(1 for m in history or [] if m.get("role") == "user") - 1
+    if turns <= 0:
+        return "0"
+    if turns == 1:
+        return "1"
+    return "2-4" if turns <= 4 else "5+"
+
+
+def reply_key(user_text: str, persona: str, history: Optional[List[dict]]) -> str:
+    payload = "\x1f".join((persona, history_bucket(history), normalize_input(user_text)))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _Entry:
+    __slots__ = ("replies", "fills", "created")
+
+    def __init__(self, now: float):
+        self.replies: List[str] = []
+        self.fills = 0
+        self.created = now
+
+
+class ReplyCache:
+    """LRU of reply pools for short, generic turns (greetings, one-word feelings).
+
+    Each key collects up to ``pool_size`` distinct LLM replies. The first
+    ``pool_size`` lookups miss, so the LLM keeps adding variety; after that
+    a random reply from the pool is served. Entries expire ``ttl_seconds``
+    after their first reply.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, pool_size: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.pool_size = max(1, pool_size)
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.stores = 0
+        self._latency = {"hit": [0, 0.0], "miss": [0, 0.0]}
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry.created > self.ttl_seconds:
+                del self._entries[key]
+                self.expired += 1
+                entry = None
+            if entry is None or entry.fills < self.pool_size:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._rng.choice(entry.replies)
+
+    def put(self, key: str, reply: str) -> None:
+        if self.max_entries <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or now - entry.created > self.ttl_seconds:
+                entry = self._entries[key] = _Entry(now)
+            self._entries.move_to_end(key)
+            entry.fills += 1
+            if reply not in entry.replies and len(entry.replies) < self.pool_size:
+                entry.replies.append(reply)
+                self.stores += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def record_latency(self, hit: bool, seconds: float) -> None:
+        """Time to produce a reply, split by whether the cache served it."""
+        with self._lock:
+            bucket = self._latency["hit" if hit else "miss"]
+            bucket[0] += 1
+            bucket[1] += seconds
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            latency = {
+                f"{name}_ms_avg": round(total / count * 1000, 2) if count else None
+                for name, (count, total) in self._latency.items()
+            }
+            return {
+                "enabled": settings.REPLY_CACHE_ENABLED,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "pool_size": self.pool_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                **latency,
+            }
+
+
+reply_cache = ReplyCache(
+    settings.REPLY_CACHE_MAX_ENTRIES,
+    settings.REPLY_CACHE_TTL_SECONDS,
+    settings.REPLY_CACHE_POOL_SIZE,
+)
@@ -0,0 +1,281 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from service.session_store import WINDOW
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock on the directory
+    fcntl = None
+
+# Recovered session: [messages (role, content), facts JSON, facts dirty, summary, last write (epoch)]
+SessionState = list
+
+
+def _new_state() -> SessionState:
+    return [deque(maxlen=WINDOW), None, False, None, 0.0]
+
+
+def _apply(state: Dict[str, SessionState], record: list) -> None:
+    kind, session_id = record[0], record[1]
+    if kind == "m":
+        session = state.get(session_id)
+        if session is None:
+            session = state[session_id] = _new_state()
+        session[0].append((record[2], record[3]))
+        session[4] = record[4]
+    elif kind == "f":
+        session = state.get(session_id)
+        if session is not None:
+            session[1], session[2] = record[2], record[3]
+            if record[4] is not None:
+                session[3] = record[4]
+            session[4] = record[5]
+    elif kind == "c":
+        state.pop(session_id, None)
+    elif kind == "s":
+        messages = deque(map(tuple, record[2]), maxlen=WINDOW)
+        state[session_id] = [messages, record[3], record[4], record[5], record[6]]
+
+
+class SessionJournal:
+    """Append-only log of session changes, so the memory store survives restarts.
+
+    Appends are buffered and written with one fsync per ``flush_interval``
+    (group commit); a crash loses at most that window. Once a log segment
+    holds ``snapshot_records`` records it is closed and folded, with the
+    previous snapshot, into a new snapshot by a background thread. Startup
+    loads the latest snapshot and replays the segments written after it.
+
+    Files in ``directory``: ``snapshot-N.jsonl`` covers every change up to
+    and including ``log-N.jsonl``. One process owns the directory at a time.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        ttl_seconds: float,
+        flush_interval: float = 0.05,
+        snapshot_records: int = 200_000,
+    ):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.flush_interval = flush_interval
+        self.snapshot_records = snapshot_records
+        self._dir_lock = self._lock_directory()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._pending: List[tuple] = []
+        snapshots, logs = self._files()
+        self._segment = max(logs + snapshots + [0]) + 1
+        self._segment_records = 0
+        self._file = open(self._path("log", self._segment), "a", encoding="utf-8")
+        self._compactor: Optional[threading.Thread] = None
+        self.written = 0
+        self.fsyncs = 0
+        self.corrupt = 0
+        self.snapshots = 0
+        self.recovered_sessions = 0
+        self.recovery_ms: Optional[float] = None
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name="session-journal", daemon=True)
+        self._flusher.start()
+
+    # --- files ---
+
+    def _lock_directory(self):
+        handle = open(os.path.join(self.directory, "lock"), "w")
+        if fcntl is not None:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                handle.close()
+                raise RuntimeError(f"{self.directory} is in use by another process")
+        return handle
+
+    def _path(self, kind: str, seq: int) -> str:
+        return os.path.join(self.directory, f"{kind}-{seq:06d}.jsonl")
+
+    def _files(self) -> Tuple[List[int], List[int]]:
+        snapshots, logs = [], []
+        for name in os.listdir(self.directory):
+            kind, _, rest = name.partition("-")
+            if rest.endswith(".jsonl") and rest[:-6].isdigit():
+                (snapshots if kind == "snapshot" else logs if kind == "log" else []).append(int(rest[:-6]))
+        return sorted(snapshots), sorted(logs)
+
+    def _records(self, path: str) -> Iterator[list]:
+        with open(path, encoding="utf-8") as fh:
+            while True:
+                lines = fh.readlines(1 << 22)
+                if not lines:
+                    return
+                if not lines[-1].endswith("\n"):
+                    # Torn final write from a crash
+                    lines.pop()
+                    self.corrupt += 1
+                try:
+                    # One decode per chunk is several times faster than one per line
+                    yield from json.loads("[" + ",".join(lines) + "]")
+                except ValueError:
+                    for line in lines:
+                        try:
+                            yield json.loads(line)
+                        except ValueError:
+                            self.corrupt += 1
+
+    def _load(self, upto: int) -> Tuple[Dict[str, SessionState], int]:
+        """Fold the latest snapshot and the logs after it, up to segment ``upto``."""
+        snapshots, logs = self._files()
+        base = max([s for s in snapshots if s <= upto], default=0)
+        state: Dict[str, SessionState] = {}
+        paths = ([self._path("snapshot", base)] if base else []) + [
+            self._path("log", seq) for seq in logs if base < seq <= upto
+        ]
+        for path in paths:
+            for record in self._records(path):
+                if record[0] == "m":
+                    # Messages are nearly every record: fold them inline
+                    session = state.get(record[1])
+                    if session is None:
+                        session = state[record[1]] = _new_state()
+                    session[0].append((record[2], record[3]))
+                    session[4] = record[4]
+                else:
+                    _apply(state, record)
+        return state, base
+
+    def recover(self) -> Dict[str, SessionState]:
+        """Sessions as of the last flushed change, without those idle past the TTL.
+
+        Also compacts what was replayed into one snapshot, in the background.
+        """
+        start = time.perf_counter()
+        upto = self._segment - 1
+        state, base = self._load(upto)
+        cutoff = time.time() - self.ttl_seconds
+        state = {sid: session for sid, session in state.items() if session[4] >= cutoff}
+        self.recovered_sessions = len(state)
+        self.recovery_ms = round((time.perf_counter() - start) * 1000, 1)
+        if upto > base:
+            self._start_compaction(upto, state)
+        return state
+
+    # --- writes (request path: one list append under a lock) ---
+
+    def message(self, session_id: str, role: str, content: str) -> None:
+        with self._lock:
+            self._pending.append(("m", session_id, role, content, time.time()))
+
+    def facts(self, session_id: str, facts: str, dirty: bool, summary: Optional[str]) -> None:
+        with self._lock:
+            self._pending.append(("f", session_id, facts, dirty, summary, time.time()))
+
+    def clear(self, session_id: str) -> None:
+        with self._lock:
+            self._pending.append(("c", session_id))
+
+    def _flush_loop(self) -> None:
+        while not self._closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"[SessionJournal] Flush failed: {e}")
+
+    def flush(self) -> None:
+        """Write everything pending with a single fsync."""
+        with self._write_lock:
+            with self._lock:
+                records, self._pending = self._pending, []
+            if not records:
+                return
+            dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+            self._file.write("".join([dumps(record) + "\n" for record in records]))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.written += len(records)
+            self.fsyncs += 1
+            self._segment_records += len(records)
+            if self._segment_records >= self.snapshot_records and not self._compacting():
+                self._rotate()
+
+    # --- compaction ---
+
+    def _rotate(self) -> None:
+        self._file.close()
+        closed = self._segment
+        self._segment += 1
+        self._segment_records = 0
+        self._file = open(self._path("log", self._segment), "a", encoding="utf-8")
+        self._start_compaction(closed)
+
+    def _compacting(self) -> bool:
+        return self._compactor is not None and self._compactor.is_alive()
+
+    def _start_compaction(self, upto: int, state: Optional[Dict[str, SessionState]] = None) -> None:
+        self._compactor = threading.Thread(
+            target=self._compact, args=(upto, state), name="session-journal-compact", daemon=True
+        )
+        self._compactor.start()
+
+    def _compact(self, upto: int, state: Optional[Dict[str, SessionState]]) -> None:
+        try:
+            if state is None:
+                state, _ = self._load(upto)
+            cutoff = time.time() - self.ttl_seconds
+            path = self._path("snapshot", upto)
+            with open(path + ".tmp", "w", encoding="utf-8") as fh:
+                dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+                for sid, (messages, facts, dirty, summary, ts) in state.items():
+                    if ts >= cutoff:
+                        fh.write(dumps(("s", sid, list(messages), facts, dirty, summary, ts)) + "\n")
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.replace(path + ".tmp", path)
+            self._sync_directory()
+            snapshots, logs = self._files()
+            for seq in snapshots:
+                if seq < upto:
+                    os.remove(self._path("snapshot", seq))
+            for seq in logs:
+                if seq <= upto:
+                    os.remove(self._path("log", seq))
+            self.snapshots += 1
+        except OSError as e:
+            print(f"[SessionJournal] Snapshot failed: {e}")
+
+    def _sync_directory(self) -> None:
+        if hasattr(os, "O_DIRECTORY"):
+            fd = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def close(self) -> None:
+        self._closed.set()
+        self._flusher.join(timeout=1)
+        self.flush()
+        if self._compactor is not None:
+            self._compactor.join()
+        self._file.close()
+        self._dir_lock.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "segment": self._segment,
+            "pending": pending,
+            "written": self.written,
+            "fsyncs": self.fsyncs,
+            "snapshots": self.snapshots,
+            "corrupt_records": self.corrupt,
+            "recovered_sessions": self.recovered_sessions,
+            "recovery_ms": self.recovery_ms,
+        }
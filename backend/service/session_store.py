@@ -0,0 +1,543 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Sequence
+from typing import Dict, Iterator, List, Optional, Tuple
+import sqlite3
+import threading
+import time
+
+import json
+
+from service.metrics import span
+from service.summary import empty_facts, extract_message_facts, format_summary, merge_facts
+
+# Keep last 10 message pairs (user+assistant) => 20 messages
+MAX_TURNS = 10
+WINDOW = 2 * MAX_TURNS
+
+# Roles are stored as one byte per message, indexing into ROLES
+ROLES = ("user", "assistant", "system")
+_ROLE_BYTES = {role: bytes((code,)) for code, role in enumerate(ROLES)}
+
+
+class HistoryView(Sequence):
+    """Read-only history window over a session's packed storage.
+
+    Shares the session's immutable role codes and contents instead of
+    copying them; the {'role','content'} dicts the chat API expects are
+    built one at a time while iterating, i.e. when the prompt is built.
+    A view never changes after it is taken, even if the session does.
+    """
+
+    __slots__ = ("_roles", "_contents")
+
+    def __init__(self, roles: bytes = b"", contents: Tuple[str, ...] = ()):
+        self._roles = roles
+        self._contents = contents
+
+    def __len__(self) -> int:
+        return len(self._contents)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return HistoryView(self._roles[index], self._contents[index])
+        return {"role": ROLES[self._roles[index]], "content": self._contents[index]}
+
+    def __iter__(self) -> Iterator[dict]:
+        # A list comprehension builds the dicts faster than a generator yields them
+        return iter([{"role": ROLES[code], "content": content} for code, content in zip(self._roles, self._contents)])
+
+    def pairs(self) -> Iterator[Tuple[str, str]]:
+        """(role, content) tuples, without building dicts."""
+        return zip(map(ROLES.__getitem__, self._roles), self._contents)
+
+    def __add__(self, other):
+        # Callers built on list histories do `history + [...]` / `[...] + history`
+        if isinstance(other, HistoryView):
+            return HistoryView(self._roles + other._roles, self._contents + other._contents)
+        if isinstance(other, (list, tuple)):
+            return list(self) + list(other)
+        return NotImplemented
+
+    def __radd__(self, other):
+        if isinstance(other, (list, tuple)):
+            return list(other) + list(self)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"HistoryView({list(self)!r})"
+
+
+class SessionStore(ABC):
+    """Per-session chat history plus the long-term summary built from it."""
+
+    @abstractmethod
+    def get_history(self, session_id: str) -> Sequence:
+        """Return the history window as a sequence of {'role','content'} dicts."""
+
+    @abstractmethod
+    def _append(self, session_id: str, role: str, content: str) -> None:
+        """Append a single message to the history window."""
+
+    @abstractmethod
+    def session_exists(self, session_id: str) -> bool:
+        """True if the session holds at least one message."""
+
+    @abstractmethod
+    def clear(self, session_id: str) -> None:
+        """Drop a session and its summary."""
+
+    @abstractmethod
+    def get_summary(self, session_id: str) -> Optional[str]:
+        """Return the long-term summary, if one was built."""
+
+    @abstractmethod
+    def _facts_state(self, session_id: str) -> Tuple[Optional[Dict[str, dict]], bool]:
+        """Return (fact index, whether it changed since the last summary)."""
+
+    @abstractmethod
+    def _save_facts(
+        self, session_id: str, facts: Dict[str, dict], dirty: bool, summary: Optional[str] = None
+    ) -> None:
+        """Store the fact index (and a rebuilt summary when given)."""
+
+    def append_message(self, session_id: str, role: str, content: str) -> None:
+        """Append a message; user messages are scanned for facts exactly once, here."""
+        if role not in _ROLE_BYTES:
+            raise ValueError(f"Unknown role: {role!r}")
+        with span("session"):
+            self._append(session_id, role, content)
+        if role != "user":
+            return
+        with span("facts"):
+            new_facts = extract_message_facts(content)
+            if not new_facts:
+                return
+            facts, dirty = self._facts_state(session_id)
+            if facts is None:
+                facts = empty_facts()
+            if merge_facts(facts, new_facts):
+                self._save_facts(session_id, facts, dirty=True)
+
+    def maybe_update_summary(self, session_id: str) -> None:
+        """Rebuild the summary string, only if the fact index changed."""
+        with span("facts"):
+            facts, dirty = self._facts_state(session_id)
+            if facts is None or not dirty:
+                return
+            summary_text = format_summary(facts)
+            self._save_facts(session_id, facts, dirty=False, summary=summary_text or None)
+
+    def close(self) -> None:
+        """Flush pending writes and release resources."""
+
+    def stats(self) -> dict:
+        return {}
+
+
+class _Session:
+    """One live session: the history window packed as role codes + contents.
+
+    Both are immutable and replaced on append (at most WINDOW pointers
+    copied), so readers get a HistoryView of them without copying or locking.
+    """
+
+    __slots__ = ("roles", "contents", "facts", "facts_dirty", "summary", "last_access")
+
+    def __init__(self, now: float):
+        self.roles = b""
+        self.contents: Tuple[str, ...] = ()
+        self.facts: Optional[Dict[str, dict]] = None
+        self.facts_dirty = False
+        self.summary: Optional[str] = None
+        self.last_access = now
+
+    def append(self, role: str, content: str) -> None:
+        if len(self.contents) < WINDOW:
+            self.roles += _ROLE_BYTES[role]
+            self.contents += (content,)
+        else:
+            self.roles = self.roles[1:] + _ROLE_BYTES[role]
+            self.contents = self.contents[1:] + (content,)
+
+    def view(self) -> HistoryView:
+        return HistoryView(self.roles, self.contents)
+
+
+class InMemorySessionStore(SessionStore):
+    """Process-local store with idle TTL and an LRU cap on live sessions.
+
+    Sessions are kept in access order, so expired and least-recently-used
+    sessions are always at the front and eviction is O(1) per session.
+    With a ``journal`` (service.session_journal.SessionJournal) every change
+    is also logged, and the sessions it holds are restored on startup.
+    """
+
+    def __init__(self, ttl_seconds: float, max_sessions: int, journal=None):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted_ttl = 0
+        self.evicted_lru = 0
+        self._journal = journal
+        if journal is not None:
+            self._restore(journal.recover())
+
+    def _restore(self, state: dict) -> None:
+        now, wall = time.monotonic(), time.time()
+        with self._lock:
+            # Oldest first, so eviction order survives the restart
+            for session_id, (messages, facts, dirty, summary, written) in sorted(
+                state.items(), key=lambda item: item[1][4]
+            ):
+                session = _Session(now - (wall - written))
+                session.roles = b"".join([_ROLE_BYTES[role] for role, _ in messages])
+                session.contents = tuple([content for _, content in messages])
+                session.facts = _load_facts(facts) if facts else None
+                session.facts_dirty = dirty
+                session.summary = summary
+                self._sessions[session_id] = session
+            self._evict(now)
+
+    def _touch(self, session_id: str, now: float) -> Optional[_Session]:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        if now - session.last_access > self.ttl_seconds:
+            del self._sessions[session_id]
+            self.evicted_ttl += 1
+            return None
+        session.last_access = now
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def _evict(self, now: float) -> None:
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.last_access > self.ttl_seconds:
+                self._sessions.popitem(last=False)
+                self.evicted_ttl += 1
+            elif len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evicted_lru += 1
+            else:
+                break
+
+    def get_history(self, session_id: str) -> HistoryView:
+        with self._lock:
+            session = self._touch(session_id, time.monotonic())
+            return session.view() if session else HistoryView()
+
+    def _append(self, session_id: str, role: str, content: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            session = self._touch(session_id, now)
+            if session is None:
+                session = self._sessions[session_id] = _Session(now)
+            session.append(role, content)
+            if self._journal is not None:
+                self._journal.message(session_id, role, content)
+            self._evict(now)
+
+    def session_exists(self, session_id: str) -> bool:
+        with self._lock:
+            session = self._touch(session_id, time.monotonic())
+            return bool(session and session.contents)
+
+    def clear(self, session_id: str) -> None:
+        with self._lock:
+            if self._sessions.pop(session_id, None) is not None and self._journal is not None:
+                self._journal.clear(session_id)
+
+    def get_summary(self, session_id: str) -> Optional[str]:
+        with self._lock:
+            session = self._touch(session_id, time.monotonic())
+            return session.summary if session else None
+
+    def _facts_state(self, session_id: str) -> Tuple[Optional[Dict[str, dict]], bool]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return (session.facts, session.facts_dirty) if session else (None, False)
+
+    def _save_facts(
+        self, session_id: str, facts: Dict[str, dict], dirty: bool, summary: Optional[str] = None
+    ) -> None:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return
+            session.facts = facts
+            session.facts_dirty = dirty
+            if summary is not None:
+                session.summary = summary
+            if self._journal is not None:
+                self._journal.facts(session_id, _dump_facts(facts), dirty, summary)
+
+    def close(self) -> None:
+        if self._journal is not None:
+            self._journal.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "evicted_ttl": self.evicted_ttl,
+                "evicted_lru": self.evicted_lru,
+            }
+        if self._journal is not None:
+            stats["journal"] = self._journal.stats()
+        return stats
+
+
+def _dump_facts(facts: Dict[str, dict]) -> str:
+    return json.dumps({category: list(values) for category, values in facts.items()}, ensure_ascii=False)
+
+
+def _load_facts(raw: str) -> Dict[str, dict]:
+    return {category: dict.fromkeys(values) for category, values in json.loads(raw).items()}
+
+
+class SQLiteSessionStore(SessionStore):
+    """Shared store for multi-worker deployments, backed by one SQLite file.
+
+    Appends and summary updates are buffered and written in one transaction
+    every ``flush_interval`` seconds (or once ``flush_batch`` writes are
+    pending). Reads merge the local buffer, so a worker always sees its own
+    writes; other workers see them after the next flush. A flush holds the
+    database lock from taking the buffer until its commit, and reads take
+    the buffer and query under that same lock, so a read never lands
+    between the two and misses (or double counts) an in-flight write.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS messages (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, seq);
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            summary TEXT,
+            facts TEXT,
+            facts_dirty INTEGER NOT NULL DEFAULT 0,
+            last_access REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access);
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl_seconds: float,
+        flush_interval: float = 0.05,
+        flush_batch: int = 64,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(self._SCHEMA)
+        self._db_lock = threading.RLock()
+        self._lock = threading.Lock()
+        self._pending_messages: List[Tuple[str, str, str]] = []
+        self._pending_facts: dict = {}
+        self._pending_touch: set = set()
+        self._last_sweep = 0.0
+        self._flush_needed = threading.Event()
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name="session-flush", daemon=True)
+        self._flusher.start()
+
+    # --- write buffering ---
+
+    def _flush_loop(self) -> None:
+        while not self._closed.is_set():
+            self._flush_needed.wait(self.flush_interval)
+            self._flush_needed.clear()
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"[SessionStore] Flush failed: {e}")
+
+    def flush(self) -> None:
+        """Write all pending changes in a single transaction."""
+        with self._db_lock:
+            with self._lock:
+                messages, self._pending_messages = self._pending_messages, []
+                facts, self._pending_facts = self._pending_facts, {}
+                touched, self._pending_touch = self._pending_touch, set()
+            if not (messages or facts or touched):
+                return
+
+            try:
+                self._write(messages, facts, touched, time.time())
+            except sqlite3.Error:
+                # Put the batch back in front of anything newer and retry on the next flush
+                with self._lock:
+                    self._pending_messages[:0] = messages
+                    for sid, (index, dirty, summary) in facts.items():
+                        newer = self._pending_facts.get(sid)
+                        if newer is None:
+                            self._pending_facts[sid] = (index, dirty, summary)
+                        elif newer[2] is None:
+                            self._pending_facts[sid] = (newer[0], newer[1], summary)
+                    self._pending_touch |= touched
+                raise
+
+    def _write(self, messages: list, facts: dict, touched: set, now: float) -> None:
+        cur = self._conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            cur.executemany(
+                "INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)", messages
+            )
+            cur.executemany(
+                "INSERT INTO sessions (session_id, last_access) VALUES (?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET last_access = excluded.last_access",
+                [(sid, now) for sid in touched],
+            )
+            cur.executemany(
+                "UPDATE sessions SET facts = ?, facts_dirty = ?, summary = COALESCE(?, summary) "
+                "WHERE session_id = ?",
+                [
+                    (_dump_facts(index), int(dirty), summary, sid)
+                    for sid, (index, dirty, summary) in facts.items()
+                ],
+            )
+            # Keep only the history window for the sessions written to
+            cur.executemany(
+                "DELETE FROM messages WHERE session_id = ? AND seq NOT IN "
+                "(SELECT seq FROM messages WHERE session_id = ? ORDER BY seq DESC LIMIT ?)",
+                [(sid, sid, WINDOW) for sid in {m[0] for m in messages}],
+            )
+            if now - self._last_sweep > 60:
+                self._sweep(cur, now)
+                self._last_sweep = now
+            cur.execute("COMMIT")
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+
+    def _sweep(self, cur: sqlite3.Cursor, now: float) -> None:
+        cutoff = now - self.ttl_seconds
+        cur.execute(
+            "DELETE FROM messages WHERE session_id IN "
+            "(SELECT session_id FROM sessions WHERE last_access < ?)",
+            (cutoff,),
+        )
+        cur.execute("DELETE FROM sessions WHERE last_access < ?", (cutoff,))
+
+    def _enqueue(self) -> None:
+        if len(self._pending_messages) + len(self._pending_facts) >= self.flush_batch:
+            self._flush_needed.set()
+
+    # --- reads ---
+
+    def _read(self, sql: str, params: tuple) -> list:
+        with self._db_lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _cutoff(self) -> float:
+        return time.time() - self.ttl_seconds
+
+    def get_history(self, session_id: str) -> HistoryView:
+        with self._db_lock:
+            with self._lock:
+                pending = [(role, content) for sid, role, content in self._pending_messages if sid == session_id]
+            rows = []
+            if len(pending) < WINDOW:
+                rows = self._read(
+                    "SELECT m.role, m.content FROM messages m JOIN sessions s USING (session_id) "
+                    "WHERE m.session_id = ? AND s.last_access >= ? ORDER BY m.seq DESC LIMIT ?",
+                    (session_id, self._cutoff(), WINDOW),
+                )
+                rows.reverse()
+        merged = (rows + pending)[-WINDOW:]
+        if merged:
+            with self._lock:
+                self._pending_touch.add(session_id)
+        return HistoryView(b"".join(_ROLE_BYTES[role] for role, _ in merged), tuple(c for _, c in merged))
+
+    def _append(self, session_id: str, role: str, content: str) -> None:
+        with self._lock:
+            self._pending_messages.append((session_id, role, content))
+            self._pending_touch.add(session_id)
+            self._enqueue()
+
+    def session_exists(self, session_id: str) -> bool:
+        with self._db_lock:
+            with self._lock:
+                if any(m[0] == session_id for m in self._pending_messages):
+                    return True
+            return bool(self._read(
+                "SELECT 1 FROM messages m JOIN sessions s USING (session_id) "
+                "WHERE m.session_id = ? AND s.last_access >= ? LIMIT 1",
+                (session_id, self._cutoff()),
+            ))
+
+    def clear(self, session_id: str) -> None:
+        with self._db_lock:
+            with self._lock:
+                self._pending_messages = [m for m in self._pending_messages if m[0] != session_id]
+                self._pending_facts.pop(session_id, None)
+                self._pending_touch.discard(session_id)
+            self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def _facts_state(self, session_id: str) -> Tuple[Optional[Dict[str, dict]], bool]:
+        with self._db_lock:
+            with self._lock:
+                if session_id in self._pending_facts:
+                    index, dirty, _ = self._pending_facts[session_id]
+                    return index, dirty
+            rows = self._read(
+                "SELECT facts, facts_dirty FROM sessions WHERE session_id = ? AND last_access >= ?",
+                (session_id, self._cutoff()),
+            )
+        if not rows or rows[0][0] is None:
+            return None, False
+        return _load_facts(rows[0][0]), bool(rows[0][1])
+
+    def _save_facts(
+        self, session_id: str, facts: Dict[str, dict], dirty: bool, summary: Optional[str] = None
+    ) -> None:
+        with self._lock:
+            previous = self._pending_facts.get(session_id)
+            if summary is None and previous is not None:
+                summary = previous[2]
+            self._pending_facts[session_id] = (facts, dirty, summary)
+            self._pending_touch.add(session_id)
+            self._enqueue()
+
+    def get_summary(self, session_id: str) -> Optional[str]:
+        with self._db_lock:
+            with self._lock:
+                pending = self._pending_facts.get(session_id)
+                if pending is not None and pending[2] is not None:
+                    return pending[2]
+            rows = self._read(
+                "SELECT summary FROM sessions WHERE session_id = ? AND last_access >= ?",
+                (session_id, self._cutoff()),
+            )
+        return rows[0][0] if rows else None
+
+    def close(self) -> None:
+        self._closed.set()
+        self._flush_needed.set()
+        self._flusher.join(timeout=1)
+        self.flush()
+        with self._db_lock:
+            self._conn.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = len(self._pending_messages) + len(self._pending_facts)
+        sessions = self._read("SELECT COUNT(*) FROM sessions", ())[0][0]
+        return {"backend": "sqlite", "sessions": sessions, "pending_writes": pending}
@@ -0,0 +1,65 @@
+from typing import Dict, List, Mapping
+
+from core.facts import summary_facts
+
+FACT_CATEGORIES = ("names", "locations", "goals", "likes", "concerns", "relations", "feelings")
+
+# Facts outlive the history window, so cap each category (oldest dropped first)
+MAX_FACTS_PER_CATEGORY = 12
+
+
+def empty_facts() -> Dict[str, dict]:
+    """Fact index: category -> insertion-ordered set (dict keys)."""
+    return {category: {} for category in FACT_CATEGORIES}
+
+
+def extract_message_facts(text: str) -> Dict[str, set]:
+    """Facts mentioned in a single user message (only non-empty categories)."""
+    return summary_facts(text)
+
+
+def merge_facts(index: Dict[str, dict], new: Mapping[str, set]) -> bool:
+    """Merge one message's facts into a session index; True if anything changed."""
+    changed = False
+    for category, values in new.items():
+        bucket = index.setdefault(category, {})
+        for value in values:
+            if value in bucket:
+                continue
+            bucket[value] = None
+            changed = True
+            if len(bucket) > MAX_FACTS_PER_CATEGORY:
+                del bucket[next(iter(bucket))]
+    return changed
+
+
+def extract_facts(history: List[dict]) -> Dict[str, set]:
+    """Facts across a whole history (full rescan; kept for one-off use)."""
+    facts = {category: set() for category in FACT_CATEGORIES}
+    for msg in history:
+        if msg.get("role") != "user":
+            continue
+        for category, values in extract_message_facts(msg.get("content", "")).items():
+            facts[category] |= values
+    return facts
+
+
+def format_summary(facts: Dict[str, set]) -> str:
+    parts = []
+    if facts["names"]:
+        parts.append("Names: " + ", ".join(sorted(facts["names"])) )
+    if facts["locations"]:
+        parts.append("Locations: " + ", ".join(sorted(facts["locations"])) )
+    if facts["goals"]:
+        parts.append("Goals: " + "; ".join(sorted(facts["goals"]))[:160])
+    if facts["likes"]:
+        parts.append("Likes: " + "; ".join(sorted(facts["likes"]))[:120])
+    if facts["feelings"]:
+        parts.append("Feelings: " + "; ".join(sorted(facts["feelings"]))[:160])
+    if facts["concerns"]:
+        parts.append("Concerns: " + "; ".join(sorted(facts["concerns"]))[:160])
+    if facts["relations"]:
+        parts.append("Relations: " + ", ".join(sorted(facts["relations"])) )
+    if not parts:
+        return ""
+    return "Long-term user context: " + " | ".join(parts)
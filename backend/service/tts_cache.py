@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from config import settings
+
+
+def cache_key(text: str, voice: dict) -> str:
+    """Content address of a clip: hash of the text plus every voice parameter."""
+    payload = json.dumps([text, voice], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """Byte-bounded in-memory LRU of synthesized clips with an optional disk tier.
+
+    Memory holds the hottest clips up to ``max_bytes``; when ``disk_dir`` is
+    set every clip is also written there (one file per key) so it survives
+    restarts and can be shared by workers on the same host. The directory
+    is kept under ``disk_max_bytes``: once over, the least recently used
+    files (by mtime, bumped on every disk hit) are deleted down to 90%.
+    """
+
+    def __init__(self, max_bytes: int, disk_dir: Optional[str] = None, disk_max_bytes: int = 256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir or None
+        self.disk_max_bytes = disk_max_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self._disk_bytes = 0
+        self._prune_lock = threading.Lock()
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._prune_disk()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.audio")
+
+    def get(self, key: str, count_miss: bool = True) -> Optional[bytes]:
+        """Cached clip or None; ``count_miss=False`` for a lookup that falls back to another key."""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+
+        if self.disk_dir:
+            try:
+                with open(self._path(key), "rb") as fh:
+                    data = fh.read()
+                os.utime(self._path(key))  # most recently used: pruned last
+            except OSError:
+                data = None
+            if data is not None:
+                self._remember(key, data)
+                with self._lock:
+                    self.disk_hits += 1
+                return data
+
+        if count_miss:
+            with self._lock:
+                self.misses += 1
+        return None
+
+    def put(self, key: str, data: bytes) -> None:
+        self._remember(key, data)
+        if self.disk_dir:
+            self._write_disk(key, data)
+
+    def _remember(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = data
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def _write_disk(self, key: str, data: bytes) -> None:
+        # Write-then-rename so concurrent readers never see a partial clip
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            print(f"[TTS cache] Disk write failed: {e}")
+            return
+        with self._lock:
+            self._disk_bytes += len(data)
+            over = self._disk_bytes > self.disk_max_bytes
+        if over:
+            self._prune_disk()
+
+    def _prune_disk(self) -> None:
+        """Recount the directory (other workers write to it too) and drop LRU files down to 90% of the cap."""
+        if not self._prune_lock.acquire(blocking=False):
+            return  # another thread is already pruning
+        try:
+            files = []
+            with os.scandir(self.disk_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".audio"):
+                        stat = entry.stat()
+                        files.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in files)
+            evicted = 0
+            if total > self.disk_max_bytes:
+                files.sort()
+                for _, size, path in files:
+                    if total <= self.disk_max_bytes * 0.9:
+                        break
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        continue
+                    total -= size
+                    evicted += 1
+            with self._lock:
+                self._disk_bytes = total
+                self.disk_evictions += evicted
+        except OSError as e:
+            print(f"[TTS cache] Disk prune failed: {e}")
+        finally:
+            self._prune_lock.release()
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            if key in self._entries:
+                return True
+        return bool(self.disk_dir) and os.path.exists(self._path(key))
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_bytes": self._disk_bytes if self.disk_dir else None,
+                "disk_max_bytes": self.disk_max_bytes if self.disk_dir else None,
+                "disk_evictions": self.disk_evictions,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+
+tts_cache = TTSCache(settings.TTS_CACHE_MAX_BYTES, settings.TTS_CACHE_DIR, settings.TTS_CACHE_DISK_MAX_BYTES)
@@ -0,0 +1,74 @@
+import asyncio
+
+from service.admission import AdmissionQueue, SessionTurns
+
+
+def _turns(max_buffered: int) -> SessionTurns:
+    return SessionTurns(AdmissionQueue(max_active=4, max_queue=4, queue_timeout=1), max_pending=2,
+                        max_buffered=max_buffered)
+
+
+def test_stalled_reader_holds_back_the_turn():
+    async def run():
+        produced = []
+
+        async def events():
+            for i in range(1000):
+                produced.append(i)
+                yield i
+
+        turns = _turns(max_buffered=4)
+        reader = await turns.stream("s1", "hello", events)
+        assert [await reader.__anext__() for _ in range(2)] == [0, 1]
+        await asyncio.sleep(0.05)  # the client stops reading
+
+        turn = turns._sessions["s1"].turns["hello"]
+        assert len(turn.events) <= 4
+        assert len(produced) <= 2 + 4 + 1
+
+        assert [i async for i in reader] == list(range(2, 1000))
+
+    asyncio.run(run())
+
+
+def test_duplicate_replays_the_turn_from_the_start():
+    async def run():
+        release = asyncio.Event()
+
+        async def events():
+            yield "first"
+            await release.wait()
+            yield "second"
+
+        turns = _turns(max_buffered=4)
+        original = await turns.stream("s1", "hello", events)
+        assert await original.__anext__() == "first"
+        duplicate = await turns.stream("s1", "hello", events)
+        release.set()
+
+        assert [e async for e in duplicate] == ["first", "second"]
+        assert [e async for e in original] == ["second"]
+        assert turns.coalesced == 1
+
+    asyncio.run(run())
+
+
+def test_dropped_reader_cancels_the_turn():
+    async def run():
+        cancelled = asyncio.Event()
+
+        async def events():
+            try:
+                for i in range(1000):
+                    yield i
+            finally:
+                cancelled.set()
+
+        turns = _turns(max_buffered=2)
+        reader = await turns.stream("s1", None, events)
+        await reader.__anext__()
+        await reader.aclose()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        assert turns.admission.active == 0
+
+    asyncio.run(run())
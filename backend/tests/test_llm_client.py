@@ -0,0 +1,94 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from core.llm_client import CircuitBreaker, LLMEndpoint, LLMUnavailable, ResilientLLM
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+class _Client:
+    """OpenAI-shaped client whose next calls fail, hang, or answer ``mode``."""
+
+    def __init__(self, mode: str = "ok"):
+        self.mode = mode
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, *, model, messages, stream=False):
+        if self.mode == "fail":
+            raise asyncio.TimeoutError()
+        if self.mode == "hang":
+            await asyncio.Event().wait()
+        if stream:
+            return _chunks(self.mode)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.mode))])
+
+
+async def _chunks(text: str):
+    for word in (text, " again"):
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word))])
+
+
+def _endpoint(name: str, client: _Client) -> LLMEndpoint:
+    return LLMEndpoint(name, client, "model", CircuitBreaker(failure_threshold=1, reset_seconds=0.0))
+
+
+async def _trip(llm: ResilientLLM, endpoint: LLMEndpoint) -> None:
+    mode, endpoint.client.mode = endpoint.client.mode, "fail"
+    with pytest.raises(LLMUnavailable):
+        await llm.complete(MESSAGES)
+    endpoint.client.mode = mode
+    assert endpoint.breaker.state == "open"
+
+
+def test_cancelled_half_open_trial_is_released():
+    async def run():
+        endpoint = _endpoint("a", _Client())
+        llm = ResilientLLM([endpoint], max_attempts=1, hedge=False)
+        await _trip(llm, endpoint)
+
+        endpoint.client.mode = "hang"
+        trial = asyncio.create_task(llm.complete(MESSAGES))
+        await asyncio.sleep(0.01)
+        assert endpoint.breaker.state == "half_open"
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+        endpoint.client.mode = "ok"
+        assert await llm.complete(MESSAGES) == "ok"
+        assert endpoint.breaker.state == "closed"
+
+    asyncio.run(run())
+
+
+def test_abandoned_half_open_stream_is_released():
+    async def run():
+        endpoint = _endpoint("a", _Client())
+        llm = ResilientLLM([endpoint], max_attempts=1, hedge=False)
+        await _trip(llm, endpoint)
+
+        stream = llm.stream(MESSAGES)
+        assert await stream.__anext__() == "ok"
+        await stream.aclose()  # client went away after the first token
+
+        assert endpoint.breaker.available()
+        assert [d async for d in llm.stream(MESSAGES)] == ["ok", " again"]
+
+    asyncio.run(run())
+
+
+def test_half_open_hedge_loser_is_released():
+    async def run():
+        primary, backup = _endpoint("a", _Client("hang")), _endpoint("b", _Client())
+        llm = ResilientLLM([primary, backup], max_attempts=1, hedge=True, hedge_after=0.01)
+        primary.breaker.record_failure()  # open, and half-open on the next call (reset_seconds=0)
+        backup.ewma["stream"] = 5.0  # rank the primary first
+
+        assert [d async for d in llm.stream(MESSAGES)] == ["ok", " again"]
+        assert llm.hedge_wins == 1
+        assert primary.breaker.state == "half_open"
+        assert primary.breaker.available()
+
+    asyncio.run(run())
@@ -0,0 +1,114 @@
+import sqlite3
+import threading
+
+import pytest
+
+from benchmarks.report_prompt_tokens import legacy_messages
+from service.session_store import HistoryView, InMemorySessionStore, SQLiteSessionStore
+
+
+def _store_with_turn(session_id: str = "s1") -> InMemorySessionStore:
+    store = InMemorySessionStore(ttl_seconds=60, max_sessions=10)
+    store.append_message(session_id, "user", "I can't sleep before exams.")
+    store.append_message(session_id, "assistant", "That sounds exhausting.")
+    return store
+
+
+def test_history_view_concatenates_like_a_list():
+    history = _store_with_turn().get_history("s1")
+    summary = {"role": "system", "content": "Exams coming up."}
+    latest = {"role": "user", "content": "It's worse tonight."}
+
+    assert [summary] + history == [summary] + list(history)
+    assert history + [latest] == list(history) + [latest]
+    assert isinstance(history + history, HistoryView)
+    assert list(history + history) == list(history) * 2
+
+
+def test_list_concatenating_caller_accepts_store_history():
+    history = _store_with_turn().get_history("s1")
+    messages = legacy_messages("It's worse tonight.", history, "Exams coming up.", "base")
+    assert {"role": "system", "content": "Exams coming up."} in messages
+    assert messages[-2:] == list(history)
+
+
+class _PausingLock:
+    """Wraps a store's database lock; the flushing thread stops before taking it."""
+
+    def __init__(self, lock, thread_name: str):
+        self._lock = lock
+        self._thread_name = thread_name
+        self.paused = threading.Event()
+        self.resume = threading.Event()
+
+    def __enter__(self):
+        if threading.current_thread().name == self._thread_name and not self.paused.is_set():
+            self.paused.set()
+            self.resume.wait(2)
+        return self._lock.__enter__()
+
+    def __exit__(self, *exc):
+        return self._lock.__exit__(*exc)
+
+
+def test_sqlite_reads_during_flush_see_in_flight_writes(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl_seconds=60, flush_interval=3600)
+    try:
+        store.append_message("s1", "user", "Hi, I'm Meera and I'm from Pune.")
+        store.append_message("s1", "assistant", "Hi Meera, it's good to meet you.")
+        assert store._facts_state("s1")[0] is not None
+
+        store._db_lock = lock = _PausingLock(store._db_lock, "test-flush")
+        flusher = threading.Thread(target=store.flush, name="test-flush")
+        flusher.start()
+        assert lock.paused.wait(2)
+
+        # The flush is in progress: its writes must be visible from the buffer or the database
+        assert store.session_exists("s1")
+        assert [m["role"] for m in store.get_history("s1")] == ["user", "assistant"]
+        assert store._facts_state("s1")[0] is not None
+
+        lock.resume.set()
+        flusher.join(2)
+        assert store._pending_messages == []
+        assert [m["role"] for m in store.get_history("s1")] == ["user", "assistant"]
+        assert store._facts_state("s1")[0] is not None
+    finally:
+        store.close()
+
+
+class _FailingConnection:
+    """sqlite3 connection whose next ``failures`` transactions fail to start."""
+
+    def __init__(self, conn, failures: int):
+        self._conn = conn
+        self.failures = failures
+
+    def cursor(self):
+        if self.failures:
+            self.failures -= 1
+            raise sqlite3.OperationalError("database is locked")
+        return self._conn.cursor()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def test_sqlite_failed_flush_is_retried(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl_seconds=60, flush_interval=3600)
+    try:
+        store.append_message("s1", "user", "Hi, I'm Meera and I'm from Pune.")
+        store.maybe_update_summary("s1")
+        store._conn = _FailingConnection(store._conn, failures=1)
+
+        with pytest.raises(sqlite3.OperationalError):
+            store.flush()
+        store.append_message("s1", "assistant", "Hi Meera, it's good to meet you.")
+        assert [m["role"] for m in store.get_history("s1")] == ["user", "assistant"]
+
+        store.flush()
+        assert store._pending_messages == [] and store._pending_facts == {}
+        assert [m["role"] for m in store.get_history("s1")] == ["user", "assistant"]
+        assert "Pune" in (store.get_summary("s1") or "")
+    finally:
+        store.close()
@@ -33,6 +33,7 @@ export default function ChatPanel({ active, onCrisis }) {
         role: 'assistant',
         text: reply.reply_text,
         reply_audio_base64: reply.reply_audio_base64,
+        reply_audio_media_type: reply.reply_audio_media_type,
         time: new Date(),
       }]);
 
@@ -68,6 +69,7 @@ export default function ChatPanel({ active, onCrisis }) {
         role: 'assistant',
         text: reply.reply_text,
         reply_audio_base64: reply.reply_audio_base64,
+        reply_audio_media_type: reply.reply_audio_media_type,
         time: new Date(),
       }]);
 
@@ -91,7 +93,8 @@ export default function ChatPanel({ active, onCrisis }) {
       audioRef.current = null;
       setPlayingAudioId(null);
     } else if (message.reply_audio_base64) {
-      const audio = new Audio(`data:audio/wav;base64,${message.reply_audio_base64}`);
+      const mediaType = message.reply_audio_media_type || 'audio/wav';
+      const audio = new Audio(`data:${mediaType};base64,${message.reply_audio_base64}`);
       audioRef.current = audio;
       setPlayingAudioId(message.id);
       audio.play();
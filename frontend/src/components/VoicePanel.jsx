@@ -1,19 +1,153 @@
 import React, { useState, useRef, useEffect } from "react";
 import { Mic } from "lucide-react";
 import useRecorder from "../hooks/useRecorder";
-import { transcribeAudio } from "../lib/apiClient";
+import { openVoiceSocket, transcribeAudio } from "../lib/apiClient";
 import Orb from "./Orb";
 import useSession from "../hooks/useSession";
 import MessageBubble from "./MessageBubble";
 
+// MediaRecorder chunk length while streaming to /chat/ws
+const CHUNK_MS = 250;
+
 export default function VoicePanel({ active, onCrisis }) {
   const [sessionId, setSessionId] = useSession();
   const [messages, setMessages] = useState([]);
   const [status, setStatus] = useState("idle");
+  const [partial, setPartial] = useState("");
   const [errorMessage, setErrorMessage] = useState("");
   const endRef = useRef(null);
+  const socketRef = useRef(null);
+  const pendingChunksRef = useRef([]);
+  const turnRef = useRef(null);
+  const audioQueueRef = useRef([]);
+  const playingRef = useRef(false);
+
+  function playNext() {
+    const blob = audioQueueRef.current.shift();
+    if (!blob) {
+      playingRef.current = false;
+      return;
+    }
+    playingRef.current = true;
+    const url = URL.createObjectURL(blob);
+    const audio = new Audio(url);
+    audio.onended = audio.onerror = () => {
+      URL.revokeObjectURL(url);
+      playNext();
+    };
+    audio.play().catch(() => playNext());
+  }
+
+  function handleEvent(msg) {
+    switch (msg.type) {
+      case "session":
+        setSessionId(msg.session_id);
+        break;
+      case "partial":
+        setPartial(msg.text);
+        break;
+      case "final":
+        setPartial("");
+        turnRef.current = { id: crypto.randomUUID(), text: "", crisis: false };
+        break;
+      case "meta":
+        if (turnRef.current) turnRef.current.crisis = msg.crisis;
+        break;
+      case "token": {
+        const turn = turnRef.current;
+        if (!turn) break;
+        turn.text += msg.text;
+        const botMsg = { id: turn.id, role: "assistant", text: turn.text, crisis: turn.crisis, time: new Date() };
+        setMessages((prev) =>
+          prev.some((m) => m.id === turn.id)
+            ? prev.map((m) => (m.id === turn.id ? botMsg : m))
+            : [...prev, botMsg]
+        );
+        break;
+      }
+      case "done": {
+        const turn = turnRef.current;
+        if (turn && !turn.text) {
+          setMessages((prev) => [
+            ...prev,
+            { id: turn.id, role: "assistant", text: msg.reply_text || "—", crisis: false, time: new Date() },
+          ]);
+        }
+        if (turn?.crisis) onCrisis?.(msg.reply_text);
+        turnRef.current = null;
+        setStatus("idle");
+        break;
+      }
+      case "busy":
+        setPartial("");
+        turnRef.current = null;
+        setStatus("idle");
+        setErrorMessage(`Server is busy. Please try again in ${msg.retry_after || 1} s.`);
+        break;
+      default:
+        break;
+    }
+  }
+
+  function ensureSocket() {
+    const current = socketRef.current;
+    if (current && current.readyState <= WebSocket.OPEN) return current;
+    const ws = openVoiceSocket({
+      sessionId,
+      isFirst: !sessionId,
+      onEvent: handleEvent,
+      onAudio: (blob) => {
+        audioQueueRef.current.push(blob);
+        if (!playingRef.current) playNext();
+      },
+    });
+    ws.onopen = () => {
+      pendingChunksRef.current.forEach((chunk) => ws.send(chunk));
+      pendingChunksRef.current = [];
+    };
+    ws.onclose = () => setStatus("idle");
+    socketRef.current = ws;
+    return ws;
+  }
+
+  useEffect(() => () => socketRef.current?.close(), []);
+
+  async function uploadTurn(blob) {
+    const isFirst = !sessionId;
+    const data = await transcribeAudio(blob, isFirst, sessionId);
+    setSessionId(data.session_id);
+
+    const botMsg = {
+      id: crypto.randomUUID(),
+      role: "assistant",
+      text: data.reply_text || "—",
+      crisis: data.crisis || false,
+      time: new Date(),
+    };
+
+    setMessages((prev) => [...prev, botMsg]);
+
+    if (data.crisis) {
+      onCrisis?.(data.reply_text);
+    }
+
+    if (data.reply_audio_base64) {
+      const audio = new Audio(
+        `data:${data.reply_audio_media_type || "audio/wav"};base64,${data.reply_audio_base64}`
+      );
+      audio.play();
+    } else {
+      setErrorMessage("No audio available for playback.");
+    }
+  }
 
   const { isRecording, error, toggleRecording } = useRecorder({
+    timeslice: CHUNK_MS,
+    onChunk: (chunk) => {
+      const ws = ensureSocket();
+      if (ws.readyState === WebSocket.OPEN) ws.send(chunk);
+      else pendingChunksRef.current.push(chunk);
+    },
     onStop: async (blob) => {
       if (!blob || blob.size === 0) {
         setErrorMessage("No audio recorded.");
@@ -21,33 +155,18 @@ export default function VoicePanel({ active, onCrisis }) {
       }
       setStatus("processing");
       setErrorMessage("");
-      try {
-        const isFirst = !sessionId;
-        const data = await transcribeAudio(blob, isFirst, sessionId);
-        setSessionId(data.session_id);
-
-        const botMsg = {
-          id: crypto.randomUUID(),
-          role: "assistant",
-          text: data.reply_text || "—",
-          crisis: data.crisis || false,
-          time: new Date(),
-        };
-
-        setMessages((prev) => [...prev, botMsg]);
-
-        if (data.crisis) {
-          onCrisis?.(data.reply_text);
-        }
 
-        if (data.reply_audio_base64) {
-          const audio = new Audio(
-            `data:audio/wav;base64,${data.reply_audio_base64}`
-          );
-          audio.play();
-        } else {
-          setErrorMessage("No audio available for playback.");
-        }
+      const ws = socketRef.current;
+      if (ws && ws.readyState === WebSocket.OPEN) {
+        // Streamed: the reply arrives as socket events
+        ws.send(JSON.stringify({ type: "end" }));
+        return;
+      }
+
+      // Socket unavailable: fall back to a one-shot upload
+      pendingChunksRef.current = [];
+      try {
+        await uploadTurn(blob);
       } catch (e) {
         console.error("Voice API error:", e);
         setErrorMessage("Failed to process audio. Try again.");
@@ -89,7 +208,7 @@ export default function VoicePanel({ active, onCrisis }) {
 
         <p className="text-gray-300 min-h-[24px] text-sm mb-6 text-center">
           {isRecording
-            ? "Listening…"
+            ? partial || "Listening…"
             : status === "processing"
             ? "Processing…"
             : "Tap mic to start"}
@@ -1,7 +1,7 @@
 import { useEffect, useRef, useState } from 'react'
 
 
-export default function useRecorder({ onStop }) {
+export default function useRecorder({ onStop, onChunk, timeslice }) {
     const [isRecording, setIsRecording] = useState(false)
     const [error, setError] = useState('')
     const mediaRecorderRef = useRef(null)
@@ -27,7 +27,11 @@ export default function useRecorder({ onStop }) {
             chunksRef.current = []
 
 
-            mr.ondataavailable = (e) => { if (e.data?.size) chunksRef.current.push(e.data) }
+            mr.ondataavailable = (e) => {
+                if (!e.data?.size) return
+                chunksRef.current.push(e.data)
+                onChunk && onChunk(e.data)
+            }
             mr.onstop = async () => {
                 const blob = new Blob(chunksRef.current, { type: mr.mimeType })
                 chunksRef.current = []
@@ -36,7 +40,8 @@ export default function useRecorder({ onStop }) {
             }
 
 
-            mr.start()
+            // With a timeslice, chunks arrive while recording (for streaming)
+            mr.start(timeslice)
             setIsRecording(true)
         } catch (e) {
             console.error(e)
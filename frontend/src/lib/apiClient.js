@@ -2,6 +2,7 @@ import axios from 'axios'
 
 
 const BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000'
+const WS_URL = BASE_URL.replace(/^http/, 'ws')
 
 
 
@@ -37,4 +38,30 @@ export async function transcribeAudio(blob, isFirst = false, sessionId = null) {
         console.error('Error transcribing audio:', error)
         throw error
     }
-}
\ No newline at end of file
+}
+
+
+// Persistent voice session over /chat/ws. Audio chunks go out with
+// ws.send(blob) and {"type": "end"} closes an utterance. Every JSON event
+// is passed to onEvent; each "audio" header is followed by a binary frame,
+// which is handed to onAudio as a Blob together with its header.
+export function openVoiceSocket({ sessionId, isFirst = false, onEvent, onAudio }) {
+    const params = new URLSearchParams({ is_first: isFirst ? 'true' : 'false' })
+    if (sessionId) params.set('session_id', sessionId)
+
+    const ws = new WebSocket(`${WS_URL}/chat/ws?${params}`)
+    ws.binaryType = 'blob'
+    let audioHeader = null
+
+    ws.onmessage = (e) => {
+        if (typeof e.data !== 'string') {
+            if (audioHeader) onAudio && onAudio(new Blob([e.data], { type: audioHeader.media_type }), audioHeader)
+            audioHeader = null
+            return
+        }
+        const msg = JSON.parse(e.data)
+        if (msg.type === 'audio' && msg.bytes) audioHeader = msg
+        onEvent && onEvent(msg)
+    }
+    return ws
+}